@@ -18,5 +18,7 @@
 #: file.
 __version__ = '0.6-sax'
 
-# make the following name available as part of the public API
+# make the following names available as part of the public API
+from .advisor import IndexAdvisor
+from .encoding import JSONEncoder
 from .manager import APIManager
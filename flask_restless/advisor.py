@@ -0,0 +1,178 @@
+"""
+    flask.ext.restless.advisor
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides a class which records the columns on which clients filter and sort
+    search results, and reports which of those columns are not indexed.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+import threading
+from collections import Counter
+
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.schema import UniqueConstraint
+
+
+def _resolve_column(model, fieldname):
+    """Returns the :class:`sqlalchemy.Column` object named by `fieldname`, or
+    ``None`` if there is no such column.
+
+    `fieldname` is the name of a column of `model`, or a path to a column of a
+    related model of the form ``<relationname>__<fieldname>`` (see
+    :ref:`search`).
+
+    """
+    try:
+        names = fieldname.split('__')
+        for name in names[:-1]:
+            model = getattr(model, name).property.mapper.class_
+        return getattr(model, names[-1]).property.columns[0]
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def _is_indexed(column):
+    """Returns ``True`` if and only if `column` is the leading column of an
+    index, a unique constraint, or the primary key of its table, so that the
+    database can use that index to filter or sort on `column` alone.
+
+    """
+    table = column.table
+    columnsets = list(table.indexes)
+    columnsets.extend(constraint for constraint in table.constraints
+                      if isinstance(constraint, UniqueConstraint))
+    columnsets.append(table.primary_key)
+    for columnset in columnsets:
+        leading = list(columnset.columns)[:1]
+        # compare by identity, since == on columns creates a SQL expression
+        if leading and leading[0] is column:
+            return True
+    return False
+
+
+class IndexAdvisor(object):
+    """Records how often each column is filtered and sorted on in searches,
+    along with the operators used in the filters, and compares that usage with
+    the indexes declared in the SQLAlchemy metadata.
+
+    An instance of this class can be provided as the `index_advisor` keyword
+    argument to :meth:`~flask.ext.restless.APIManager.create_api`, in which
+    case every search on that API is recorded. It is safe to use from multiple
+    threads.
+
+    """
+
+    def __init__(self):
+        """Instantiates this advisor with no recorded usage."""
+        # mapping from the table and name of a column to a list containing the
+        # Column object, the number of searches which filter on it, a Counter
+        # of the operators used in those filters, and the number of searches
+        # which sort on it
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, search_params):
+        """Records the columns filtered and sorted on by the search described
+        by `search_params` on `model`.
+
+        `search_params` is a :class:`~flask_restless.search.SearchParameters`
+        object. Filters on fields of related models are attributed to the
+        column of the related model. Fields which are not columns are ignored.
+
+        """
+        columns = {}
+        filtered = {}
+        for filt in search_params.filters:
+            column = _resolve_column(model, filt.fieldname)
+            if column is not None:
+                key = (column.table, column.name)
+                columns[key] = column
+                filtered.setdefault(key, []).append(filt.operator)
+        sorted_on = set()
+        for order_by in search_params.order_by:
+            column = _resolve_column(model, order_by.field)
+            if column is not None:
+                key = (column.table, column.name)
+                columns[key] = column
+                sorted_on.add(key)
+        with self._lock:
+            for key, column in columns.iteritems():
+                if key not in self._usage:
+                    self._usage[key] = [column, 0, Counter(), 0]
+                usage = self._usage[key]
+                if key in filtered:
+                    usage[1] += 1
+                    usage[2].update(filtered[key])
+                if key in sorted_on:
+                    usage[3] += 1
+
+    def report(self, model=None, unindexed_only=True):
+        """Returns a list of dictionaries describing the usage of each column
+        recorded so far, most used first.
+
+        If `model` is not ``None``, only the columns of the table of that model
+        are reported. If `unindexed_only` is ``True``, only the columns which
+        are not the leading column of any index are reported.
+
+        Each dictionary is of the form:
+
+        .. sourcecode:: python
+
+           {'table': 'person', 'column': 'age', 'indexed': False,
+            'filter_count': 10, 'order_by_count': 3,
+            'operators': {'gt': 8, 'eq': 2}}
+
+        where ``filter_count`` and ``order_by_count`` are the number of
+        searches which filtered and sorted on the column, respectively.
+
+        """
+        table = None
+        if model is not None:
+            table = class_mapper(model).mapped_table
+        with self._lock:
+            usage = [(column, count, dict(operators), order_count)
+                     for column, count, operators, order_count
+                     in self._usage.itervalues()]
+        result = []
+        for column, count, operators, order_count in usage:
+            if table is not None and column.table is not table:
+                continue
+            indexed = _is_indexed(column)
+            if indexed and unindexed_only:
+                continue
+            result.append(dict(table=column.table.name, column=column.name,
+                               indexed=indexed, filter_count=count,
+                               order_by_count=order_count,
+                               operators=operators))
+        result.sort(key=lambda d: (-(d['filter_count'] + d['order_by_count']),
+                                   d['table'], d['column']))
+        return result
+
+    def format_report(self, model=None, unindexed_only=True):
+        """Returns the report returned by :meth:`report` as a plain text
+        table, one line per column, suitable for printing from a shell or a
+        management command.
+
+        """
+        lines = ['%-30s %8s %8s  %s' % ('column', 'filters', 'order_by',
+                                         'operators')]
+        for row in self.report(model, unindexed_only):
+            operators = ', '.join('%s: %s' % item for item in
+                                  sorted(row['operators'].iteritems()))
+            name = '%s.%s' % (row['table'], row['column'])
+            if row['indexed']:
+                name += ' (indexed)'
+            lines.append('%-30s %8d %8d  %s' % (name, row['filter_count'],
+                                                 row['order_by_count'],
+                                                 operators))
+        return '\n'.join(lines)
+
+    def clear(self):
+        """Discards all recorded usage."""
+        with self._lock:
+            self._usage.clear()
@@ -0,0 +1,225 @@
+"""
+    flask.ext.restless.cache
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides simple in-process caches used by Flask-Restless to avoid
+    repeating expensive database queries.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """A mapping from keys to values in which each value expires a fixed
+    number of seconds after it was stored.
+
+    Keys must be hashable. At most `maxsize` values are held at once; when the
+    cache is full, expired values are discarded first, then the oldest ones.
+    It is safe to use from multiple threads.
+
+    """
+
+    def __init__(self, timeout, maxsize=1024):
+        """Instantiates this cache with the specified attributes.
+
+        `timeout` is the number of seconds for which a stored value remains
+        valid.
+
+        `maxsize` is the maximum number of values stored at once.
+
+        """
+        self.timeout = timeout
+        self.maxsize = maxsize
+        # mapping from key to two-tuple of expiration time and value
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of values currently stored, including those
+        which have expired but not yet been discarded.
+
+        """
+        return len(self._values)
+
+    def get(self, key, default=None):
+        """Returns the value stored for `key`, or `default` if there is no such
+        value or it has expired.
+
+        """
+        with self._lock:
+            try:
+                expires, value = self._values[key]
+            except KeyError:
+                return default
+            if expires < time.time():
+                self._values.pop(key, None)
+                return default
+            return value
+
+    def set(self, key, value):
+        """Stores `value` for `key`, replacing any existing value."""
+        with self._lock:
+            now = time.time()
+            if key not in self._values and len(self._values) >= self.maxsize:
+                self._prune(now)
+            self._values[key] = (now + self.timeout, value)
+
+    def delete(self, key):
+        """Removes the value stored for `key`, if any."""
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        """Removes all stored values."""
+        with self._lock:
+            self._values.clear()
+
+    def _prune(self, now):
+        """Discards all expired values and, if the cache is still full, the
+        value which will expire soonest.
+
+        The caller must hold the lock of this cache.
+
+        """
+        for key, (expires, value) in self._values.items():
+            if expires < now:
+                self._values.pop(key, None)
+        if len(self._values) >= self.maxsize:
+            oldest = min(self._values, key=lambda k: self._values[k][0])
+            self._values.pop(oldest, None)
+
+
+class LRUCache(object):
+    """A mapping from keys to values which holds at most `maxsize` values,
+    discarding the least recently used value when it is full.
+
+    This class has the same interface as :class:`TTLCache`, but stored values
+    never expire. It is safe to use from multiple threads.
+
+    """
+
+    def __init__(self, maxsize=1024):
+        """Instantiates this cache with the specified maximum number of
+        values.
+
+        """
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of values currently stored."""
+        return len(self._values)
+
+    def get(self, key, default=None):
+        """Returns the value stored for `key`, or `default` if there is no such
+        value, and marks the value as the most recently used one.
+
+        """
+        with self._lock:
+            try:
+                value = self._values.pop(key)
+            except KeyError:
+                return default
+            self._values[key] = value
+            return value
+
+    def set(self, key, value):
+        """Stores `value` for `key`, replacing any existing value."""
+        with self._lock:
+            self._values.pop(key, None)
+            if len(self._values) >= self.maxsize:
+                self._values.popitem(last=False)
+            self._values[key] = value
+
+    def delete(self, key):
+        """Removes the value stored for `key`, if any."""
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        """Removes all stored values."""
+        with self._lock:
+            self._values.clear()
+
+
+class ResponseCache(object):
+    """Stores the bodies of responses to :http:method:`get` requests, and
+    invalidates the stored bodies which depend on a table whenever that table
+    is written to.
+
+    Bodies are stored in `backend`, any object with ``get(key)`` and
+    ``set(key, value)`` methods taking string keys, like :class:`LRUCache` (the
+    default, holding at most `maxsize` bodies) or a client of a cache server
+    shared by several processes.
+
+    Each table has a generation token, stored in the backend along with the
+    bodies, which is part of the key of each body that depends on the table.
+    Invalidating a table replaces its token, so the bodies stored under the
+    old token are never read again and are eventually discarded by the
+    backend. If the backend discards a token, a new one is created, which
+    invalidates the table.
+
+    """
+
+    #: The prefix of all keys stored in the backend.
+    PREFIX = 'flask-restless:'
+
+    def __init__(self, backend=None, maxsize=1024):
+        """Instantiates this cache with the specified attributes.
+
+        `backend` is the object in which bodies are stored. If it is ``None``,
+        a new :class:`LRUCache` holding at most `maxsize` bodies is used.
+
+        """
+        if backend is None:
+            backend = LRUCache(maxsize)
+        self.backend = backend
+
+    def _generation(self, tablename):
+        """Returns the current generation token of the table with the
+        specified name, creating one if there is none.
+
+        """
+        key = '%sgeneration:%s' % (self.PREFIX, tablename)
+        token = self.backend.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set(key, token)
+        return token
+
+    def key(self, tablenames, *parts):
+        """Returns the key under which to store the body of a response which
+        depends on the tables with the specified names and is identified by
+        `parts`, a sequence of strings.
+
+        """
+        tokens = [self._generation(name) for name in sorted(tablenames)]
+        digest = hashlib.sha1(repr((tokens, parts))).hexdigest()
+        return '%sresponse:%s' % (self.PREFIX, digest)
+
+    def get(self, key):
+        """Returns the body stored for `key`, or ``None`` if there is none."""
+        return self.backend.get(key)
+
+    def set(self, key, body):
+        """Stores `body` for `key`."""
+        self.backend.set(key, body)
+
+    def invalidate(self, tablenames):
+        """Invalidates all stored bodies which depend on any of the tables with
+        the specified names.
+
+        """
+        for name in tablenames:
+            key = '%sgeneration:%s' % (self.PREFIX, name)
+            self.backend.set(key, uuid.uuid4().hex)
@@ -0,0 +1,141 @@
+"""
+    flask.ext.restless.compression
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides a class which compresses the bodies of responses with the content
+    coding preferred by the client: ``br`` (if the :mod:`brotli` module is
+    installed), ``gzip``, or ``deflate``.
+
+    Bodies smaller than a given size are sent uncompressed, since compressing
+    them saves little. Streamed bodies are compressed as they are generated,
+    and the compressed data is flushed after each chunk, so the client
+    receives it as soon as it would have received the uncompressed data.
+
+    The compressed bytes are deterministic (``gzip`` bodies carry no
+    modification time), so that entity tags computed from them are stable.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import zlib
+
+from flask import request
+
+# brotli is only an optional dependency, required for the br content coding
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#: The content codings supported by :class:`Compressor`, in order of
+#: preference when the client accepts more than one with the same quality.
+ENCODINGS = ('br', 'gzip', 'deflate') if brotli is not None \
+    else ('gzip', 'deflate')
+
+# the wbits argument to zlib.compressobj which produces each content coding:
+# a gzip header and trailer, or a zlib header and trailer (which is what
+# HTTP calls deflate)
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+class _BrotliCompressor(object):
+    """Wraps a :class:`brotli.Compressor` with the interface of the objects
+    returned by :func:`zlib.compressobj` used by :class:`Compressor`.
+
+    """
+
+    def __init__(self):
+        self.compressor = brotli.Compressor()
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self, mode=zlib.Z_FINISH):
+        if mode == zlib.Z_FINISH:
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+class Compressor(object):
+    """Compresses the bodies of responses, for use as a function called after
+    each request to an API (see :meth:`compress`).
+
+    """
+
+    def __init__(self, min_size=500, level=6):
+        """Instantiates this compressor with the specified attributes.
+
+        `min_size` is the minimum size in bytes of a body which is not
+        streamed for it to be compressed. Streamed bodies are always
+        compressed.
+
+        `level` is the ``gzip`` and ``deflate`` compression level, from 1
+        (fastest) to 9 (smallest).
+
+        """
+        self.min_size = min_size
+        self.level = level
+
+    def encoding(self):
+        """Returns the content coding of :data:`ENCODINGS` which the client
+        prefers in the :http:header:`Accept-Encoding` header of the current
+        request, or ``None`` if it accepts none of them.
+
+        """
+        return request.accept_encodings.best_match(ENCODINGS)
+
+    def _compressobj(self, encoding):
+        """Returns a new compression object for the specified content coding,
+        with the interface of the objects returned by
+        :func:`zlib.compressobj`.
+
+        """
+        if encoding == 'br':
+            return _BrotliCompressor()
+        return zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+
+    def _stream(self, encoding, chunks):
+        """Yields the compressed data of the iterable of strings `chunks`,
+        flushed after each chunk.
+
+        """
+        compressobj = self._compressobj(encoding)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield compressobj.compress(chunk) + \
+                        compressobj.flush(zlib.Z_SYNC_FLUSH)
+            yield compressobj.flush(zlib.Z_FINISH)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def compress(self, response):
+        """Compresses the body of `response`, a :class:`flask.Response`
+        object, with the content coding preferred by the client, and returns
+        `response`.
+
+        Responses without a body, and responses whose body is already encoded,
+        are returned unchanged.
+
+        """
+        if response.status_code in (204, 304) or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.encoding()
+        if encoding is None:
+            return response
+        if response.is_sequence:
+            data = response.data
+            if len(data) < self.min_size:
+                return response
+            compressobj = self._compressobj(encoding)
+            # this also sets the Content-Length header
+            response.data = compressobj.compress(data) + compressobj.flush()
+        else:
+            response.response = self._stream(encoding, response.response)
+            response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,122 @@
+"""
+    flask.ext.restless.encoding
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides the classes which encode the bodies of responses as JSON or, for
+    clients which request it, as MessagePack.
+
+    The JSON encoder writes compact JSON and handles :class:`datetime.date`,
+    :class:`datetime.datetime`, :class:`datetime.time` and
+    :class:`decimal.Decimal` objects itself. By default it uses the C
+    accelerated :mod:`simplejson` module if it is installed, and the
+    :mod:`json` module of the standard library otherwise; any other module
+    with a compatible ``dumps`` function may be plugged in instead.
+
+    The MessagePack encoder, which also decodes the bodies of requests,
+    requires the :mod:`msgpack` module, and handles the same objects.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import datetime
+import json
+from decimal import Decimal
+
+# simplejson is only an optional dependency, but it is faster than the json
+# module of the standard library and encodes decimals exactly
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+# msgpack is only an optional dependency, required for MessagePack request and
+# response bodies
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+#: The MIME types of MessagePack request and response bodies. Responses are
+#: sent with the first one.
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _default(obj):
+    """Returns a JSON-serializable representation of `obj`, for use as the
+    ``default`` function of the ``dumps`` function of a JSON module.
+
+    Dates, times, and dates with times are represented by strings in ISO 8601
+    format, and decimals by floating point numbers. Raises :exc:`TypeError`
+    for any other type of object.
+
+    """
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError('%r is not JSON serializable' % (obj, ))
+
+
+class JSONEncoder(object):
+    """Encodes Python objects as compact JSON strings.
+
+    An instance of this class (or any object with an :meth:`encode` method
+    with the same signature) can be provided as the `encoder` keyword argument
+    to :meth:`~flask.ext.restless.APIManager.create_api`.
+
+    """
+
+    def __init__(self, module=None):
+        """Instantiates this encoder with the specified JSON module.
+
+        `module` is a module whose ``dumps`` function takes the object to
+        encode along with the ``default`` and ``separators`` keyword arguments
+        of :func:`json.dumps`, for example :mod:`json` or :mod:`simplejson`. If
+        it is ``None``, :mod:`simplejson` is used if it is installed, and
+        :mod:`json` otherwise.
+
+        """
+        if module is None:
+            module = simplejson or json
+        self.module = module
+        options = dict(default=_default, separators=(',', ':'))
+        if module is simplejson:
+            # write decimals exactly instead of converting them to floats
+            options['use_decimal'] = True
+        self._options = options
+
+    def encode(self, obj):
+        """Returns the JSON string representing `obj`."""
+        return self.module.dumps(obj, **self._options)
+
+
+class MsgPackEncoder(object):
+    """Encodes Python objects as MessagePack, and decodes them from it.
+
+    This class requires the :mod:`msgpack` module. Both strings and byte
+    strings are written with the MessagePack ``str`` type, since the keys of
+    dictionaries and the ISO 8601 representations of dates are byte strings in
+    Python 2, and clients expect them to be decoded as text.
+
+    """
+
+    def encode(self, obj):
+        """Returns the MessagePack bytes representing `obj`."""
+        return msgpack.packb(obj, default=_default, use_bin_type=False)
+
+    def decode(self, data):
+        """Returns the object represented by the MessagePack bytes `data`.
+
+        Raises :exc:`ValueError` if `data` is not valid MessagePack.
+
+        """
+        return msgpack.unpackb(data, raw=False)
+
+
+#: The encoder used by views for which no other encoder was specified.
+DEFAULT_ENCODER = JSONEncoder()
+
+#: The encoder used by all views for clients which request MessagePack, or
+#: ``None`` if :mod:`msgpack` is not installed.
+MSGPACK_ENCODER = MsgPackEncoder() if msgpack is not None else None
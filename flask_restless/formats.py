@@ -0,0 +1,267 @@
+"""
+    flask.ext.restless.formats
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides functions which write the columns of the instances of a model
+    in tabular formats other than JSON: CSV, and, if :mod:`pyarrow` is
+    installed, the Arrow IPC stream format and Parquet.
+
+    The instances are given to the writers as batches of column values (one
+    list of values per column), so that the Arrow and Parquet writers build
+    one column array per batch without creating a dictionary for each
+    instance. Each writer is a generator which yields the bytes of the output
+    after each batch, so the output can be streamed to the client.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import csv
+import datetime
+from cStringIO import StringIO
+from decimal import Decimal
+
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.types import Boolean
+from sqlalchemy.types import Float
+from sqlalchemy.types import Integer
+from sqlalchemy.types import LargeBinary
+from sqlalchemy.types import Numeric
+from sqlalchemy.types import String
+
+from .encoding import MSGPACK_MIMETYPES
+
+# pyarrow is only an optional dependency, required for the Arrow and Parquet
+# formats
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+#: The MIME type of each format, keyed by the name of the format as given in
+#: the ``format`` query parameter.
+FORMATS = {
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+#: The names of the formats which require :mod:`pyarrow`.
+ARROW_FORMATS = frozenset(('arrow', 'parquet'))
+
+#: The maximum number of instances in each batch given to a writer, which is
+#: also the number of rows in each Arrow record batch and Parquet row group.
+BATCH_SIZE = 8192
+
+# mapping from MIME type to the name of the format
+_NAMES = dict((mimetype, name) for name, mimetype in FORMATS.iteritems())
+
+
+class FormatError(Exception):
+    """Raised by :func:`writer` when the requested format is unknown or not
+    available.
+
+    """
+    pass
+
+
+def requested_format(request):
+    """Returns the name of the format requested by the client in `request`, a
+    :class:`flask.Request`, or ``None`` if the client requested JSON.
+
+    The format is the value of the ``format`` query parameter if there is one.
+    Otherwise it is the format of :data:`FORMATS` whose MIME type has the
+    highest quality in the :http:header:`Accept` header, if that quality is
+    higher than those of JSON and MessagePack.
+
+    """
+    name = request.args.get('format')
+    if name is not None:
+        return None if name == 'json' else name
+    # JSON and MessagePack win if they have the same quality as another format
+    mimetypes = ['application/json'] + list(MSGPACK_MIMETYPES) + \
+        sorted(_NAMES)
+    return _NAMES.get(request.accept_mimetypes.best_match(mimetypes))
+
+
+def writer(name):
+    """Returns the function which writes the format with the specified name.
+
+    The function takes the model, the list of names of the columns to write,
+    and an iterable of batches, each of which is the list of the lists of
+    values of those columns, and yields the bytes of the output.
+
+    Raises :exc:`FormatError` if there is no such format, or if it requires
+    :mod:`pyarrow` but :mod:`pyarrow` is not installed.
+
+    """
+    if name not in FORMATS:
+        raise FormatError('Unknown format %s' % name)
+    if name in ARROW_FORMATS and pyarrow is None:
+        raise FormatError('The %s format is not available' % name)
+    return _WRITERS[name]
+
+
+def _csv_value(value):
+    """Returns the representation of `value` in a CSV file, as a string or a
+    number.
+
+    """
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def write_csv(model, columns, batches):
+    """Yields the bytes of the CSV file, encoded in UTF-8, whose header is
+    `columns` and whose rows contain the column values in `batches`.
+
+    """
+    buf = StringIO()
+    out = csv.writer(buf)
+    out.writerow(columns)
+    for batch in batches:
+        values = [[_csv_value(value) for value in column] for column in batch]
+        out.writerows(zip(*values))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    # the header is all that is written if there are no instances
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _arrow_column(columntype):
+    """Returns a two-tuple containing the Arrow type of the values of a column
+    of type `columntype`, and a function which converts its values to values
+    of that type, or ``None`` if they need no conversion.
+
+    """
+    if isinstance(columntype, Boolean):
+        return pyarrow.bool_(), None
+    if isinstance(columntype, Integer):
+        return pyarrow.int64(), None
+    if isinstance(columntype, Float):
+        return pyarrow.float64(), None
+    if isinstance(columntype, Numeric):
+        return pyarrow.float64(), float
+    if isinstance(columntype, DateTime):
+        return pyarrow.timestamp('us'), None
+    if isinstance(columntype, Date):
+        return pyarrow.date32(), None
+    if isinstance(columntype, String):
+        return pyarrow.string(), None
+    if isinstance(columntype, LargeBinary):
+        return pyarrow.binary(), None
+    # values of any other type are written as strings
+    return pyarrow.string(), _arrow_string
+
+
+def _arrow_string(value):
+    """Returns the string representation of `value`, written by the Arrow
+    writers for columns of types which have no corresponding Arrow type.
+
+    """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return unicode(value)
+
+
+class _Sink(object):
+    """A writable file-like object which keeps the bytes written to it until
+    they are taken with :meth:`take`.
+
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        """Returns the bytes written since the last call to this method."""
+        data = ''.join(self.chunks)
+        del self.chunks[:]
+        return data
+
+
+def _arrow_batches(model, columns, batches):
+    """Returns a two-tuple containing the Arrow schema of the specified
+    columns of `model`, and a generator of the Arrow record batches containing
+    the column values in `batches`.
+
+    """
+    mapper = class_mapper(model)
+    types = [_arrow_column(mapper.get_property(name).columns[0].type)
+             for name in columns]
+    fields = [pyarrow.field(name, arrowtype)
+              for name, (arrowtype, convert) in zip(columns, types)]
+    schema = pyarrow.schema(fields)
+
+    def generate():
+        for batch in batches:
+            arrays = []
+            for values, (arrowtype, convert) in zip(batch, types):
+                if convert is not None:
+                    values = [None if value is None else convert(value)
+                              for value in values]
+                arrays.append(pyarrow.array(values, type=arrowtype))
+            yield pyarrow.RecordBatch.from_arrays(arrays, columns)
+
+    return schema, generate()
+
+
+def write_arrow(model, columns, batches):
+    """Yields the bytes of the Arrow IPC stream containing one record batch
+    of the specified columns of `model` for each batch of column values in
+    `batches`.
+
+    """
+    schema, recordbatches = _arrow_batches(model, columns, batches)
+    sink = _Sink()
+    out = pyarrow.RecordBatchStreamWriter(pyarrow.PythonFile(sink, mode='w'),
+                                          schema)
+    for recordbatch in recordbatches:
+        out.write_batch(recordbatch)
+        yield sink.take()
+    out.close()
+    yield sink.take()
+
+
+def write_parquet(model, columns, batches):
+    """Yields the bytes of the Parquet file containing one row group of the
+    specified columns of `model` for each batch of column values in
+    `batches`.
+
+    """
+    schema, recordbatches = _arrow_batches(model, columns, batches)
+    sink = _Sink()
+    out = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode='w'),
+                                        schema)
+    for recordbatch in recordbatches:
+        out.write_table(pyarrow.Table.from_batches([recordbatch]))
+        yield sink.take()
+    out.close()
+    yield sink.take()
+
+
+# mapping from the name of each format to the function which writes it
+_WRITERS = {'csv': write_csv, 'arrow': write_arrow, 'parquet': write_parquet}
@@ -0,0 +1,281 @@
+"""
+    flask.ext.restless.guard
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides a guard which asks the database to explain the plan of a search
+    query before it is executed, and rejects searches which would scan entire
+    large tables.
+
+    Plans are obtained with the ``EXPLAIN`` statement of the dialect of the
+    database (``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN (FORMAT JSON)`` on
+    PostgreSQL, and ``EXPLAIN`` on MySQL). On other databases, no search is
+    rejected.
+
+    The sizes of the scanned tables are never counted, since that would scan
+    them too. They are read from the statistics which the database keeps
+    about its tables instead, and tables without statistics are not
+    considered large.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import re
+
+from flask import json
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import Alias
+from sqlalchemy.sql.expression import ClauseElement
+from sqlalchemy.sql.expression import Executable
+from sqlalchemy.sql.expression import TableClause
+
+from .cache import TTLCache
+from .search import search_shape
+
+#: The prefix of the statement which explains the plan of a query, keyed by
+#: the name of the SQLAlchemy dialect.
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN (FORMAT JSON) ',
+    'mysql': 'EXPLAIN '
+}
+
+# Matches the details of a step of a SQLite query plan which scans a whole
+# table without using an index. Versions of SQLite before 3.36 write "SCAN
+# TABLE <name> AS <alias>" where newer versions write "SCAN <alias>".
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\S+)(?: AS (\S+))?$')
+
+
+class QueryTooExpensive(Exception):
+    """Raised by :meth:`CostGuard.check` when a query would scan tables with
+    more rows than allowed.
+
+    """
+
+    def __init__(self, tables):
+        """Instantiates this exception with the list of names of the tables
+        which the query would scan.
+
+        """
+        super(QueryTooExpensive, self).__init__(tables)
+        self.tables = tables
+
+
+class ExplainError(Exception):
+    """Raised by :meth:`CostGuard.check` when the database fails to explain
+    the plan of a query, or explains it in a form which cannot be read.
+
+    """
+    pass
+
+
+class Explain(Executable, ClauseElement):
+    """A statement which explains the plan the database would use to execute
+    the wrapped statement, without executing it.
+
+    """
+
+    def __init__(self, statement):
+        """Instantiates this object with the specified statement, a
+        SQLAlchemy selectable.
+
+        """
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    """Compiles an :class:`Explain` statement to the ``EXPLAIN`` statement of
+    the dialect of `compiler` (see :data:`EXPLAIN_PREFIXES`).
+
+    """
+    prefix = EXPLAIN_PREFIXES.get(compiler.dialect.name, 'EXPLAIN ')
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def _table_names(statement):
+    """Returns a dictionary mapping the name (or alias) by which each table is
+    referred to in `statement` to the name of the table itself.
+
+    """
+    names = {}
+    for element in visitors.iterate(statement, {}):
+        if isinstance(element, Alias) and \
+                isinstance(element.original, TableClause):
+            names[element.name] = element.original.name
+        elif isinstance(element, TableClause):
+            names[element.name] = element.name
+    return names
+
+
+def _sqlite_scans(rows, names):
+    """Returns the list of names of tables scanned without an index according
+    to the rows of the result of ``EXPLAIN QUERY PLAN`` on SQLite, along with
+    ``None``, since the plan does not estimate the number of rows scanned.
+
+    """
+    scans = []
+    for row in rows:
+        match = _SQLITE_SCAN.match(row['detail'])
+        if match is not None:
+            name = match.group(1) if match.group(2) else \
+                names.get(match.group(1), match.group(1))
+            scans.append((name, None))
+    return scans
+
+
+def _postgresql_scans(rows, names):
+    """Returns the list of names of tables scanned sequentially according to
+    the result of ``EXPLAIN (FORMAT JSON)`` on PostgreSQL, along with ``None``,
+    since the plan estimates only the number of rows which remain after
+    filtering.
+
+    """
+    # rows of the result of a statement which is not a SELECT cannot be
+    # indexed by position, so convert it to a tuple first
+    plans = tuple(rows[0])[0]
+    if isinstance(plans, basestring):
+        plans = json.loads(plans)
+    scans = []
+    nodes = [plan['Plan'] for plan in plans]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            scans.append((node['Relation Name'], None))
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def _mysql_scans(rows, names):
+    """Returns the list of names of tables scanned in full according to the
+    result of ``EXPLAIN`` on MySQL, along with the estimated number of rows
+    scanned in each.
+
+    """
+    scans = []
+    for row in rows:
+        if row['type'] == 'ALL':
+            scans.append((names.get(row['table'], row['table']), row['rows']))
+    return scans
+
+
+#: The function which extracts the tables scanned in full, and possibly the
+#: estimated number of rows scanned, from the result of explaining a query,
+#: keyed by the name of the SQLAlchemy dialect.
+_SCANS = {'sqlite': _sqlite_scans, 'postgresql': _postgresql_scans,
+          'mysql': _mysql_scans}
+
+#: The statement which reads the estimated number of rows in the table named
+#: ``name`` from the statistics of the database, keyed by the name of the
+#: SQLAlchemy dialect. On SQLite, the statistics are only available once the
+#: ``ANALYZE`` statement has been run, and the first number of each row of
+#: ``sqlite_stat1`` is the number of rows in the table.
+_TABLE_ROWS = {
+    'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = :name',
+    'postgresql': ('SELECT reltuples FROM pg_class'
+                   ' WHERE oid = CAST(:name AS regclass)')
+}
+
+
+class CostGuard(object):
+    """Rejects search queries which the database plans to execute by scanning
+    entire tables with more than a given number of rows.
+
+    Searches which have been checked are remembered by their shape (see
+    :func:`~flask_restless.search.search_shape`) for `timeout` seconds,
+    whether they were rejected or not, so that repeating them costs nothing.
+    The estimated numbers of rows of tables are remembered for the same time.
+
+    """
+
+    def __init__(self, max_rows, timeout=300):
+        """Instantiates this guard with the specified attributes.
+
+        `max_rows` is the maximum number of rows a table may have for a query
+        to be allowed to scan all of it.
+
+        `timeout` is the number of seconds for which search shapes and
+        estimated numbers of rows of tables are remembered.
+
+        """
+        self.max_rows = max_rows
+        # mapping from search shape to the list of names of the large tables
+        # which the search would scan, which is empty if it was accepted
+        self.checked = TTLCache(timeout)
+        self.table_rows = TTLCache(timeout)
+
+    def _estimate_rows(self, session, bind, tablename):
+        """Returns the number of rows in the table with the specified name, as
+        estimated by the statistics of the database, or ``None`` if the
+        database keeps no statistics about the table.
+
+        """
+        rows = self.table_rows.get(tablename)
+        if rows is None:
+            query = _TABLE_ROWS.get(bind.dialect.name)
+            if query is None:
+                return None
+            stats = session.execute(text(query), dict(name=tablename),
+                                    bind=bind).fetchall()
+            if not stats:
+                return None
+            rows = stats[0][0]
+            if isinstance(rows, basestring):
+                rows = int(rows.split()[0])
+            self.table_rows.set(tablename, rows)
+        return rows
+
+    def _scanned_tables(self, session, bind, scans, statement):
+        """Returns the list of names of the tables with more than
+        :attr:`max_rows` rows which the database would scan in full to
+        execute `statement`, according to the function `scans` (see
+        :data:`_SCANS`).
+
+        """
+        rows = session.execute(Explain(statement), bind=bind).fetchall()
+        tables = []
+        for tablename, estimate in scans(rows, _table_names(statement)):
+            if estimate is None:
+                estimate = self._estimate_rows(session, bind, tablename)
+            if estimate is not None and estimate > self.max_rows and \
+                    tablename not in tables:
+                tables.append(tablename)
+        return tables
+
+    def check(self, session, model, query, search_params):
+        """Raises :exc:`QueryTooExpensive` if the database would execute
+        `query` by scanning an entire table with more than :attr:`max_rows`
+        rows.
+
+        `query` is the SQLAlchemy query created on `model` from
+        `search_params`, a :class:`~flask_restless.search.SearchParameters`
+        object. Searches with neither filters nor ordering are not checked,
+        since those only read the rows on the requested page.
+
+        Raises :exc:`ExplainError` if the database fails to explain the plan
+        of `query`, after rolling back `session`.
+
+        """
+        if not (search_params.filters or search_params.order_by):
+            return
+        shape = (model, search_shape(model, search_params))
+        tables = self.checked.get(shape)
+        if tables is None:
+            bind = session.get_bind(mapper=class_mapper(model))
+            scans = _SCANS.get(bind.dialect.name)
+            if scans is None:
+                return
+            try:
+                tables = self._scanned_tables(session, bind, scans,
+                                              query.statement)
+            except (SQLAlchemyError, LookupError, TypeError,
+                    ValueError), exception:
+                session.rollback()
+                raise ExplainError(exception)
+            self.checked.set(shape, tables)
+        if tables:
+            raise QueryTooExpensive(tables)
@@ -13,10 +13,22 @@
 """
 
 from flask import Blueprint
+from sqlalchemy.orm import ColumnProperty
 from sqlalchemy.orm import scoped_session
 
+from .cache import LRUCache
+from .cache import ResponseCache
+from .cache import TTLCache
+from .compression import Compressor
+from .guard import CostGuard
+from .search import RELATION_STRATEGIES
+from .serializer import serializer_for
 from .views import API
+from .views import ExportAPI
 from .views import FunctionAPI
+from .views import READ_MODES
+from .views import RELATION_LOADERS
+from .views import _get_columns
 from .views import _get_onetomany_relations
 from .views import _related_collection
 
@@ -105,6 +117,11 @@ class APIManager(object):
             apimanager = APIManager(app, flask_sqlalchemy_db=db)
 
         """
+        # the response caches of all APIs created by this manager, which are
+        # all invalidated when any of the APIs writes to the database
+        self._response_caches = []
+        # the response cache shared by APIs which use the default backend
+        self._default_response_cache = None
         self.init_app(app, session, flask_sqlalchemy_db)
 
     def _next_blueprint_name(self, basename):
@@ -206,7 +223,22 @@ class APIManager(object):
                              delete_form_preprocessor=None,
                              delete_form_postprocessor=None,
                              get_result_postprocessor=None,
-                             get_request_preprocessor=None):
+                             get_request_preprocessor=None,
+                             keyset_pagination=False,
+                             count_strategy=None,
+                             count_cache_timeout=None,
+                             stream_results=False,
+                             search_plan_cache_size=None,
+                             relation_filter_strategy='exists',
+                             normalize_filters=False, index_advisor=None,
+                             max_scan_rows=None, relation_loading=None,
+                             shallow=False, response_cache=None,
+                             version_column=None, last_modified_column=None,
+                             read_mode='orm', encoder=None,
+                             allow_export=False, compress_min_size=None,
+                             allow_post_many=False, post_chunk_size=None,
+                             response_cache_key=None,
+                             paginate_related_collections=False):
         """Creates an returns a ReSTful API interface as a blueprint, but does
         not register it on any :class:`flask.Flask` application.
 
@@ -343,6 +375,170 @@ class APIManager(object):
         `get_request_preprocessor` is a callback function which takes
         GET input and enhances it as required.
 
+        If `keyset_pagination` is ``True``, clients page through search results
+        using the opaque ``next_cursor`` token from each response instead of
+        page numbers, so that each page costs the same regardless of how deep
+        into the result set it is. For more information, see
+        :ref:`keysetpagination`.
+
+        `count_strategy` specifies how the ``num_results`` and ``total_pages``
+        mappings of paginated responses are computed: ``'query'`` makes a
+        separate ``COUNT(*)`` query over the filtered search, ``'window'``
+        computes ``COUNT(*) OVER ()`` in the same statement which fetches the
+        page, and ``None`` (the default) disables counting altogether. Either
+        strategy makes the database visit every row matching the search, not
+        only those on the requested page, unless the requested page is the
+        last one. For more information, see :ref:`pagination`.
+
+        If `count_cache_timeout` is a positive number, the counts are cached
+        for that many seconds, keyed on the filters of the search, so that
+        repeatedly requesting pages of the same search does not count the
+        results every time.
+
+        If `stream_results` is ``True`` and pagination has been disabled by
+        `results_per_page`, responses to searches are streamed to the client
+        as the results are fetched from the database, so that memory usage
+        stays constant regardless of the number of results. For more
+        information, see :ref:`pagination`.
+
+        If `search_plan_cache_size` is a positive integer, the queries built
+        for searches are cached, keyed on the shape of the search (the field
+        names, operators, and ordering, but not the values), and reused for
+        subsequent searches of the same shape with only the values substituted.
+        At most that many queries are cached.
+
+        `relation_filter_strategy` determines how filters on fields of related
+        models (like ``owner__company__name``) are translated into SQL. If it
+        is ``'exists'``, each relationship becomes a correlated ``EXISTS``
+        subquery. If it is ``'join'``, the related models are joined into the
+        query instead; relationships to collections are joined within a
+        subquery on the primary key, so that each instance appears only once
+        in the result. Choose whichever your database plans better for your
+        schema. Raises :exc:`IllegalArgumentError` if it is anything else.
+
+        If `normalize_filters` is ``True``, redundant filters in searches (for
+        example, overlapping ranges or repeated values in an ``in`` list) are
+        combined before the database is queried, and a search whose filters
+        contradict one another returns no results without querying the
+        database at all.
+
+        `index_advisor` is an :class:`~flask_restless.advisor.IndexAdvisor`
+        object on which the columns filtered and sorted on by each search are
+        recorded. The same advisor may be given to several APIs; call its
+        :meth:`~flask_restless.advisor.IndexAdvisor.report` method to list the
+        most used columns which are not indexed.
+
+        If `max_scan_rows` is a positive integer, the database is asked to
+        explain the plan of each search query before it is executed, and
+        searches which would scan every row of a table with more than that many
+        rows are rejected with :http:statuscode:`400`, including the searches
+        of the export endpoint (see `allow_export`). Searches which have been
+        checked are remembered by their shape for five minutes, so that
+        repeating them does not cost another ``EXPLAIN``. The numbers of rows
+        in tables are read from the statistics of the database. This is
+        supported on SQLite, PostgreSQL, and MySQL.
+
+        `relation_loading` is a dictionary mapping names of relations of
+        `model` to the strategy with which they are loaded when they are
+        included in a response: ``'subquery'`` (one additional query for all
+        the instances in the response), ``'joined'`` (a ``LEFT OUTER JOIN`` in
+        the same query), or ``'select'`` (one additional query per instance).
+        Relations not in the dictionary are loaded with ``'subquery'``, so a
+        page of instances with three relations takes four queries. Raises
+        :exc:`IllegalArgumentError` if a strategy is unknown.
+
+        If `shallow` is ``True``, responses to :http:method:`get` requests
+        include no relations of the instances of `model` unless the client asks
+        for them in the ``include`` query parameter. Otherwise, all relations
+        are included unless the client asks for only some of them. For more
+        information, see :ref:`includerelations`.
+
+        If `response_cache` is ``True``, the bodies of successful responses to
+        :http:method:`get` requests are cached in memory, keyed on the URL and
+        the normalized query parameters, and identical requests are answered
+        from the cache. The cached responses which depend on a model are
+        invalidated whenever any API created by this manager writes to that
+        model. Instead of ``True``, `response_cache` may be an object with
+        ``get(key)`` and ``set(key, value)`` methods taking string keys, in
+        which responses are stored instead (for example, a client of a cache
+        server shared by several processes). For more information, see
+        :ref:`responsecache`.
+
+        `response_cache_key` is a function which takes no arguments and
+        returns a string identifying the variant of a response which depends
+        on more than the request, for example the name of the current user.
+        Cached responses are keyed on that string as well, so that one user is
+        never served a response made for another. Since a
+        `get_result_postprocessor` may change responses according to the
+        user, this raises :exc:`IllegalArgumentError` if `response_cache` and
+        `get_result_postprocessor` are specified without
+        `response_cache_key`.
+
+        Responses to :http:method:`get` requests carry a weak entity tag, and
+        clients which send it back in the ``If-None-Match`` header receive a
+        :http:statuscode:`304` response if the representation has not changed.
+        By default, the entity tag is a hash of the body of the response. If
+        `version_column` is the name of a column of `model` which changes
+        whenever an instance changes (like a version counter), or
+        `last_modified_column` is the name of a column of `model` holding the
+        date and time of the last change to an instance, the entity tag of a
+        single instance which is represented without related instances (see
+        `shallow`) is computed from those columns instead, so that conditional
+        requests for an unmodified instance read only those columns from the
+        database. `last_modified_column` also provides the
+        ``Last-Modified`` header, against which the ``If-Modified-Since``
+        header is checked. Raises :exc:`IllegalArgumentError` if either is not
+        the name of a column of `model`. For more information, see
+        :ref:`conditionalrequests`.
+
+        If `read_mode` is ``'core'``, searches whose responses include no
+        relations (for example, with `shallow`) select only the needed columns
+        and convert the rows directly to JSON, without creating instances of
+        `model` in the session. If it is ``'orm'`` (the default), instances
+        are always loaded. Raises :exc:`IllegalArgumentError` if it is anything
+        else. For more information, see :ref:`readmode`.
+
+        `encoder` is an object whose ``encode(obj)`` method returns the JSON
+        string representing `obj`, used to encode the bodies of all responses
+        of the API. By default, a :class:`~flask.ext.restless.JSONEncoder`
+        using :mod:`simplejson` (if installed) is used. For more information,
+        see :ref:`encoders`.
+
+        If `allow_export` is ``True``, then requests to
+        :http:get:`/api/<collection_name>/export` will stream the JSON
+        representation of each instance of `model` matching the search in the
+        ``q`` query parameter, one per line, in order of primary key. For more
+        information, see :ref:`exports`. Warning: you must not use ``'export'``
+        as a string primary key of an instance of `model` if you set this
+        argument to ``True``.
+
+        If `compress_min_size` is not ``None``, the bodies of all responses
+        from the API are compressed with the ``br`` (if :mod:`brotli` is
+        installed), ``gzip``, or ``deflate`` content coding, as accepted by the
+        client, if they are at least this many bytes long. Streamed bodies are
+        always compressed, as they are generated. If `response_cache` is also
+        specified, compressed bodies are cached as well. For more information,
+        see :ref:`compression`.
+
+        If `allow_post_many` is ``True``, then requests to
+        :http:post:`/api/<collection_name>` whose body is a list of objects
+        will create an instance of `model` for each of them, and return the
+        list of their primary keys. The instances are written to the database
+        in batches, in a single transaction. If `post_chunk_size` is not
+        ``None``, each batch of that many instances is committed in its own
+        transaction instead, so that a validation error does not undo the
+        instances already committed. For more information, see
+        :ref:`allowpostmany`. Raises :exc:`IllegalArgumentError` if
+        `post_chunk_size` is not positive.
+
+        If `paginate_related_collections` is ``True``, then requests to the
+        endpoints of one-to-many relations, such as
+        :http:get:`/api/person/1/computers/`, may search, sort, and paginate
+        the related instances as for the collection endpoint, and receive a
+        page of results. Otherwise, the response contains all the related
+        instances as ``objects``. For more information, see
+        :ref:`relatedcollections`.
+
         .. versionadded:: 0.6
            This functionality was formerly in :meth:`create_api`, but the
            blueprint creation and registration have now been separated.
@@ -384,20 +580,84 @@ class APIManager(object):
         collection_endpoint = '/%s' % collection_name
         # the name of the API, for use in creating the view and the blueprint
         apiname = APIManager.APINAME_FORMAT % collection_name
+        # the cache of result counts must outlive the view instances, which
+        # are created anew for each request
+        count_cache = None
+        if count_cache_timeout:
+            count_cache = TTLCache(count_cache_timeout)
+        if relation_filter_strategy not in RELATION_STRATEGIES:
+            msg = ('relation_filter_strategy must be one of %s.'
+                   % ', '.join(RELATION_STRATEGIES))
+            raise IllegalArgumentError(msg)
+        for strategy in (relation_loading or {}).itervalues():
+            if strategy not in RELATION_LOADERS:
+                msg = ('relation_loading strategies must be one of %s.'
+                       % ', '.join(sorted(RELATION_LOADERS)))
+                raise IllegalArgumentError(msg)
+        columns = _get_columns(model)
+        for name in version_column, last_modified_column:
+            if name is not None and \
+                    not isinstance(columns.get(name), ColumnProperty):
+                msg = '%s is not a column of %s.' % (name, model.__name__)
+                raise IllegalArgumentError(msg)
+        # compile the serializer of the model now instead of on the first
+        # request
+        serializer = serializer_for(model)
+        if read_mode not in READ_MODES:
+            msg = 'read_mode must be one of %s.' % ', '.join(READ_MODES)
+            raise IllegalArgumentError(msg)
+        if response_cache and get_result_postprocessor and \
+                response_cache_key is None:
+            msg = ('If response_cache and get_result_postprocessor are'
+                   ' specified, so must response_cache_key.')
+            raise IllegalArgumentError(msg)
+        if post_chunk_size is not None and post_chunk_size < 1:
+            msg = 'post_chunk_size must be a positive integer.'
+            raise IllegalArgumentError(msg)
+        cost_guard = None
+        if max_scan_rows:
+            cost_guard = CostGuard(max_scan_rows)
+        plan_cache = None
+        if search_plan_cache_size:
+            plan_cache = LRUCache(search_plan_cache_size)
+        if response_cache is True:
+            if self._default_response_cache is None:
+                self._default_response_cache = ResponseCache()
+                self._response_caches.append(self._default_response_cache)
+            response_cache = self._default_response_cache
+        elif response_cache is not None:
+            response_cache = ResponseCache(response_cache)
+            self._response_caches.append(response_cache)
+        compressor = None
+        if compress_min_size is not None:
+            compressor = Compressor(compress_min_size)
+        # the arguments of the views for the API for this model
+        view_args = (self.session, model, authentication_required_for,
+                     authentication_function, include_columns, patch_columns,
+                     validation_exceptions, results_per_page,
+                     post_form_preprocessor, post_form_postprocessor,
+                     patch_form_preprocessor, patch_form_postprocessor,
+                     delete_form_preprocessor, delete_form_postprocessor,
+                     get_result_postprocessor, get_request_preprocessor)
+        view_kw = dict(keyset_pagination=keyset_pagination,
+                       count_strategy=count_strategy, count_cache=count_cache,
+                       stream_results=stream_results, plan_cache=plan_cache,
+                       relation_strategy=relation_filter_strategy,
+                       normalize_filters=normalize_filters,
+                       index_advisor=index_advisor, cost_guard=cost_guard,
+                       relation_loading=relation_loading, shallow=shallow,
+                       response_cache=response_cache,
+                       response_caches=self._response_caches,
+                       version_column=version_column,
+                       last_modified_column=last_modified_column,
+                       serializer=serializer, read_mode=read_mode,
+                       encoder=encoder, compressor=compressor,
+                       allow_post_many=allow_post_many,
+                       post_chunk_size=post_chunk_size,
+                       response_cache_key=response_cache_key)
+        view_kw['paginate_related_collections'] = paginate_related_collections
         # the view function for the API for this model
-        api_view = API.as_view(apiname, self.session, model,
-                               authentication_required_for,
-                               authentication_function, include_columns,
-                               patch_columns,
-                               validation_exceptions, results_per_page,
-                               post_form_preprocessor,
-                               post_form_postprocessor,
-                               patch_form_preprocessor,
-                               patch_form_postprocessor,
-                               delete_form_preprocessor,
-                               delete_form_postprocessor,
-                               get_result_postprocessor,
-                               get_request_preprocessor)
+        api_view = API.as_view(apiname, *view_args, **view_kw)
         # suffix an integer to apiname according to already existing blueprints
         blueprintname = self._next_blueprint_name(apiname)
         # add the URL rules to the blueprint: the first is for methods on the
@@ -407,11 +667,23 @@ class APIManager(object):
         # TODO what should the second argument here be?
         # TODO should the url_prefix be specified here or in register_blueprint
         blueprint = Blueprint(blueprintname, __name__, url_prefix=url_prefix)
+        # compress the responses of all the views of the blueprint, except
+        # those already compressed by the API view
+        if compressor is not None:
+            blueprint.after_request(compressor.compress)
         blueprint.add_url_rule(collection_endpoint,
                                methods=no_instance_methods, view_func=api_view)
         blueprint.add_url_rule(collection_endpoint, defaults={'instid': None},
                                methods=possibly_empty_instance_methods,
                                view_func=api_view)
+        # if exports are allowed, add an endpoint at /api/<collection>/export
+        # which streams the instances matching a search as newline-delimited
+        # JSON
+        if allow_export:
+            export_api_view = ExportAPI.as_view(apiname + 'export',
+                                                *view_args, **view_kw)
+            blueprint.add_url_rule(collection_endpoint + '/export',
+                                   methods=['GET'], view_func=export_api_view)
         # the per-instance endpoints will allow both integer and string primary
         # key accesses
         for converter in ('int', 'string'):
@@ -433,7 +705,7 @@ class APIManager(object):
         if allow_functions:
             eval_api_name = apiname + 'eval'
             eval_api_view = FunctionAPI.as_view(eval_api_name, self.session,
-                                                model)
+                                                model, encoder)
             eval_endpoint = '/eval' + collection_endpoint
             blueprint.add_url_rule(eval_endpoint, methods=['GET'],
                                    view_func=eval_api_view)
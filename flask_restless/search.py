@@ -14,21 +14,80 @@
 
 """
 import inspect
+from collections import OrderedDict
+
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import or_
+from sqlalchemy import tuple_
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.exc import NoResultFound
 
 from .helpers import unicode_keys_to_strings
 
-#: The mapping from operator name (as accepted by the search method) to a
-#: function which returns the SQLAlchemy expression corresponding to that
-#: operator.
-#:
-#: Each of these functions accepts either one, two, or three arguments. The
-#: first argument is the field object on which to apply the operator. The
-#: second argument, where it exists, is the second argument to the operator.
-#: The third argument, where it exists, is the name of the field.
+class Operator(object):
+    """Represents a search operator, a function which returns a SQLAlchemy
+    expression, along with the number of arguments it accepts.
+
+    The arity of the function is determined (and validated) once, when the
+    operator is created, so that it need not be inspected each time a filter
+    is created.
+
+    """
+
+    def __init__(self, function, arity=None):
+        """Instantiates this object with the specified attributes.
+
+        `function` accepts either one, two, or three arguments. The first
+        argument is the field object on which to apply the operator. The second
+        argument, where it exists, is the second argument to the operator. The
+        third argument, where it exists, is the name of the field on the
+        related model, if the first argument is a relationship.
+
+        `arity` is the number of arguments which `function` accepts. If it is
+        ``None``, it is determined by inspecting `function`, which must then be
+        a Python function (for example, not a :func:`functools.partial`
+        object).
+
+        Raises :exc:`ValueError` if the arity is not one, two, or three.
+
+        """
+        if arity is None:
+            # in Python 2.6 or later, this should be `argspec.args`
+            arity = len(inspect.getargspec(function)[0])
+        if arity not in (1, 2, 3):
+            raise ValueError('operator functions must accept one, two, or'
+                             ' three arguments, not {}'.format(arity))
+        self.function = function
+        self.arity = arity
+
+    def __call__(self, *args):
+        """Returns the SQLAlchemy expression created by applying the function
+        of this operator to `args`.
+
+        """
+        return self.function(*args)
+
+    def __repr__(self):
+        """Returns a string representation of this object."""
+        return '<Operator {}, {}>'.format(self.function, self.arity)
+
+
+#: The mapping from operator name (as accepted by the search method) to an
+#: :class:`Operator` object whose function returns the SQLAlchemy expression
+#: corresponding to that operator.
 #:
 #: Some operations have multiple names. For example, the equality operation can
 #: be described by the strings ``'=='``, ``'eq'``, ``'equals'``, etc.
-OPERATORS = {
+#:
+#: Use :func:`register_operator` to add operators to this mapping.
+OPERATORS = {}
+
+# The functions for the operators recognized by default. See the documentation
+# for the :class:`Operator` constructor for the meaning of their arguments.
+_BUILTIN_OPERATORS = {
     # Operators which accept a single argument.
     'is_null': lambda f: f == None,
     'is_not_null': lambda f: f != None,
@@ -67,6 +126,46 @@ OPERATORS = {
 }
 
 
+def register_operator(name, function, arity=None):
+    """Makes the operator described by `function` available in searches under
+    the specified name, replacing any existing operator with that name.
+
+    `name` is the string which clients provide as the value of ``op`` in a
+    filter (see :ref:`search`).
+
+    `function` and `arity` are as described in the documentation for the
+    :class:`Operator` constructor. For example, to add a case-insensitive
+    version of the ``like`` operator::
+
+        register_operator('ilike', lambda f, a: f.ilike(a))
+
+    Raises :exc:`ValueError` if the arity of `function` is not one, two, or
+    three.
+
+    """
+    OPERATORS[name] = Operator(function, arity)
+
+
+for name, function in _BUILTIN_OPERATORS.iteritems():
+    register_operator(name, function)
+del name, function
+
+
+#: The names of the strategies for filtering on fields of related models, as
+#: accepted by the `relation_strategy` argument of :func:`create_query`.
+#:
+#: ``'exists'`` translates each hop along a relationship into a correlated
+#: ``EXISTS`` subquery, using the ``has()`` or ``any()`` method of the
+#: relationship.
+#:
+#: ``'join'`` joins the related models into the query instead. Paths which
+#: contain only many-to-one (or one-to-one) relationships are joined directly,
+#: and joins along the same path are shared by all filters. Paths which contain
+#: a collection would repeat the rows of the model being searched, so they are
+#: joined inside a semi-join on its primary key (``WHERE pk IN (SELECT ...)``).
+RELATION_STRATEGIES = ('exists', 'join')
+
+
 class OrderBy(object):
     """Represents an "order by" in a SQL query expression."""
 
@@ -228,6 +327,208 @@ class SearchParameters(object):
                                 order_by=order_by)
 
 
+class ContradictionError(Exception):
+    """Raised by :func:`normalize_filters` when the filters of a search cannot
+    all be satisfied at once, so that the search would match no instances.
+
+    """
+    pass
+
+
+#: The canonical name of each operator which :func:`normalize_filters` knows
+#: how to combine with others applied to the same field, keyed by the names of
+#: the operators for which it may be substituted.
+_CANONICAL_OPERATORS = {}
+for canonical, names in (('==', ('==', 'eq', 'equals', 'equal_to')),
+                         ('!=', ('!=', 'ne', 'neq', 'not_equal_to',
+                                 'does_not_equal')),
+                         ('>', ('>', 'gt')), ('<', ('<', 'lt')),
+                         ('>=', ('>=', 'ge', 'gte', 'geq')),
+                         ('<=', ('<=', 'le', 'lte', 'leq')),
+                         ('in', ('in', )), ('not_in', ('not_in', ))):
+    for name in names:
+        _CANONICAL_OPERATORS[name] = canonical
+del canonical, names, name
+
+
+def _canonical_operator(filt):
+    """Returns the canonical name of the operator of `filt` (see
+    :data:`_CANONICAL_OPERATORS`), or ``None`` if `filt` cannot be combined
+    with other filters by :func:`normalize_filters`.
+
+    Only filters which compare a field of the searched model itself to a value
+    given by the client can be combined, and only if their operator has not
+    been replaced by :func:`register_operator`.
+
+    """
+    operator = filt.operator
+    if (not isinstance(filt.fieldname, basestring) or '__' in filt.fieldname
+            or filt.otherfield or filt.argument is None
+            or operator not in _CANONICAL_OPERATORS):
+        return None
+    if OPERATORS[operator].function is not _BUILTIN_OPERATORS[operator]:
+        return None
+    canonical = _CANONICAL_OPERATORS[operator]
+    if (canonical in ('in', 'not_in')) != isinstance(filt.argument, list):
+        return None
+    return canonical
+
+
+def _is_number(value):
+    """Returns ``True`` if and only if `value` is a number (but not a boolean
+    or NaN), which compares the same way in Python as in the database.
+
+    """
+    return (isinstance(value, (int, long, float))
+            and not isinstance(value, bool) and value == value)
+
+
+def _unique(values):
+    """Returns the list of distinct elements of `values`, in the order in which
+    they first appear.
+
+    """
+    result = []
+    for value in values:
+        if value not in result:
+            result.append(value)
+    return result
+
+
+def _normalize_field(fieldname, constraints):
+    """Returns a list of filters on the field named `fieldname` equivalent to
+    the conjunction of `constraints`, which is a list of two-tuples of
+    canonical operator name and argument.
+
+    If all the arguments are numbers, equalities and ``in`` lists are
+    intersected, ranges are collapsed to their tightest bounds, and excluded
+    values which are already excluded by another filter are dropped. Other
+    values (strings, for example) may compare differently in the database than
+    in Python, so only duplicate filters and duplicate ``in`` list values are
+    removed from them.
+
+    Raises :exc:`ContradictionError` if no value satisfies all of the
+    constraints.
+
+    """
+    values = []
+    for operator, argument in constraints:
+        if operator in ('in', 'not_in'):
+            values.extend(argument)
+        else:
+            values.append(argument)
+    if not all(_is_number(value) for value in values):
+        pairs = _unique((operator, _unique(argument)
+                         if operator in ('in', 'not_in') else argument)
+                        for operator, argument in constraints)
+        for operator, argument in pairs:
+            if operator == 'in' and not argument:
+                raise ContradictionError(fieldname)
+        return [Filter(fieldname, op, arg) for op, arg in pairs]
+    allowed = None
+    excluded = set()
+    has_exclusions = False
+    # each bound is a two-tuple of value and whether it is inclusive
+    lower = upper = None
+    for operator, argument in constraints:
+        if operator in ('==', 'in'):
+            if operator == '==':
+                argument = [argument]
+            if allowed is None:
+                allowed = set(argument)
+            else:
+                allowed &= set(argument)
+        elif operator in ('!=', 'not_in'):
+            if operator == '!=':
+                argument = [argument]
+            excluded.update(argument)
+            has_exclusions = True
+        elif operator in ('>', '>='):
+            bound = (argument, operator == '>=')
+            # at equal values, the exclusive bound is the tighter one
+            lower = max(lower or bound, bound, key=lambda b: (b[0], not b[1]))
+        else:
+            bound = (argument, operator == '<=')
+            # at equal values, the exclusive bound is the tighter one
+            upper = min(upper or bound, bound)
+
+    def in_range(value):
+        if lower and (value < lower[0] or value == lower[0] and not lower[1]):
+            return False
+        if upper and (value > upper[0] or value == upper[0] and not upper[1]):
+            return False
+        return True
+
+    if allowed is not None:
+        allowed = sorted(v for v in allowed
+                         if in_range(v) and v not in excluded)
+        if not allowed:
+            raise ContradictionError(fieldname)
+        if len(allowed) == 1:
+            return [Filter(fieldname, '==', allowed[0])]
+        return [Filter(fieldname, 'in', allowed)]
+    if lower and upper:
+        # the bounds cross, or meet at a value which one of them excludes
+        if lower[0] > upper[0] or (lower[0] == upper[0]
+                                   and not (lower[1] and upper[1])):
+            raise ContradictionError(fieldname)
+        if lower[0] == upper[0]:
+            if lower[0] in excluded:
+                raise ContradictionError(fieldname)
+            return [Filter(fieldname, '==', lower[0])]
+    result = []
+    if lower:
+        result.append(Filter(fieldname, '>=' if lower[1] else '>', lower[0]))
+    if upper:
+        result.append(Filter(fieldname, '<=' if upper[1] else '<', upper[0]))
+    excluded = sorted(v for v in excluded if in_range(v))
+    if len(excluded) == 1:
+        result.append(Filter(fieldname, '!=', excluded[0]))
+    elif excluded or (has_exclusions and not result):
+        # an empty exclusion list still excludes null values
+        result.append(Filter(fieldname, 'not_in', excluded))
+    return result
+
+
+def normalize_filters(filters):
+    """Returns a list of :class:`Filter` objects equivalent to the conjunction
+    of `filters`, with redundant filters combined or removed.
+
+    Filters which compare the same field of the searched model to values given
+    by the client (using the equality, inequality, comparison, ``in``, and
+    ``not_in`` operators) are combined as described in
+    :func:`_normalize_field`; for example, ``age >= 10``, ``age > 20``, and
+    ``age < 30`` become ``age > 20`` and ``age < 30``, and ``age == 3`` and
+    ``age in [1, 2, 3, 3]`` become ``age == 3``. All other filters are returned
+    unchanged. The combined filters for each field take the place of the
+    first filter on that field.
+
+    Raises :exc:`ContradictionError` if the filters contradict one another, so
+    that no instance could satisfy them all.
+
+    """
+    # mapping from field name to list of canonical operator and argument
+    constraints = OrderedDict()
+    # filters which are not combined, and placeholders for combined fields
+    result = []
+    for filt in filters:
+        canonical = _canonical_operator(filt)
+        if canonical is None:
+            result.append(filt)
+            continue
+        if filt.fieldname not in constraints:
+            constraints[filt.fieldname] = []
+            result.append(filt.fieldname)
+        constraints[filt.fieldname].append((canonical, filt.argument))
+    normalized = []
+    for item in result:
+        if isinstance(item, Filter):
+            normalized.append(item)
+        else:
+            normalized.extend(_normalize_field(item, constraints[item]))
+    return normalized
+
+
 class QueryBuilder(object):
     """Provides a static function for building a SQLAlchemy query object based
     on a :class:`SearchParameters` instance.
@@ -282,9 +583,7 @@ class QueryBuilder(object):
         """
         # raises KeyError if operator not in OPERATORS
         opfunc = OPERATORS[operator]
-        argspec = inspect.getargspec(opfunc)
-        # in Python 2.6 or later, this should be `argspec.args`
-        numargs = len(argspec[0])
+        numargs = opfunc.arity
         # raises AttributeError if `fieldname` or `relation` does not exist
         field = getattr(model, relation or fieldname)
         # each of these will raise a TypeError if the wrong number of argments
@@ -298,13 +597,123 @@ class QueryBuilder(object):
         return opfunc(field, argument, fieldname)
 
     @staticmethod
-    def _create_filters(model, search_params):
+    def _resolve_path(model, operator, fieldname):
+        """Splits `fieldname`, which may be a path of relationship names and a
+        field name separated by double underscores (for example,
+        ``'owner__company__name'``), into its parts.
+
+        Returns a three-tuple. The first element is the list of relationship
+        attributes to traverse, starting from `model`. The second element is
+        the name of the relationship to which the operator will be applied, or
+        ``None``. The third element is the name of the field on the last
+        related model.
+
+        The relationship to which the operator will be applied is the last one
+        in the path if the operator accepts the name of a field on the related
+        model, like ``has`` and ``any``; in that case it is not included in the
+        list of relationships to traverse.
+
+        Raises :exc:`KeyError` if the `operator` is unknown and
+        :exc:`AttributeError` if a relationship in the path does not exist.
+
+        """
+        # raises AttributeError if fieldname is not a string
+        names = fieldname.split('__')
+        fieldname = names.pop()
+        relation = None
+        # raises KeyError if operator not in OPERATORS
+        if names and OPERATORS[operator].arity == 3:
+            relation = names.pop()
+        attributes = []
+        for name in names:
+            # raises AttributeError if `name` is not a relationship
+            attribute = getattr(model, name)
+            attributes.append(attribute)
+            model = attribute.property.mapper.class_
+        return attributes, relation, fieldname
+
+    @staticmethod
+    def _create_exists_filter(model, operator, argument, attributes, relation,
+                              fieldname):
+        """Returns the filter which applies `operator` to the field or
+        relation at the end of the path described by `attributes`, `relation`,
+        and `fieldname` (see :meth:`_resolve_path`), nesting a correlated
+        ``EXISTS`` subquery for each relationship in `attributes`.
+
+        """
+        if attributes:
+            model = attributes[-1].property.mapper.class_
+        create_op = QueryBuilder._create_operation
+        expression = create_op(model, fieldname, operator, argument, relation)
+        for attribute in reversed(attributes):
+            if attribute.property.uselist:
+                expression = attribute.any(expression)
+            else:
+                expression = attribute.has(expression)
+        return expression
+
+    @staticmethod
+    def _create_join_filter(model, operator, argument, attributes, relation,
+                            fieldname, joins):
+        """Returns the filter which applies `operator` to the field or
+        relation at the end of the path described by `attributes`, `relation`,
+        and `fieldname` (see :meth:`_resolve_path`), joining the related models
+        along the way.
+
+        `joins` is an ordered dictionary mapping each path of relationship
+        names which has already been joined into the query to the two-tuple of
+        the alias of the related model and the relationship attribute on which
+        to join it. This method adds to it the joins required by paths which
+        contain only scalar relationships; the caller must apply those joins to
+        the query. Paths which contain a collection are joined inside a
+        semi-join on the primary key of `model` instead.
+
+        """
+        create_op = QueryBuilder._create_operation
+        if not any(attribute.property.uselist for attribute in attributes):
+            target = model
+            path = ()
+            for attribute in attributes:
+                path += (attribute.key, )
+                if path not in joins:
+                    alias = aliased(attribute.property.mapper.class_)
+                    joins[path] = (alias, getattr(target, attribute.key))
+                target = joins[path][0]
+            return create_op(target, fieldname, operator, argument, relation)
+        # joining a collection would repeat the rows of `model`, so select the
+        # matching primary keys in a subquery instead
+        mapper = class_mapper(model)
+        keys = [mapper.get_property_by_column(column).key
+                for column in mapper.primary_key]
+        target = aliased(model)
+        subquery = Query([getattr(target, key) for key in keys])
+        for attribute in attributes:
+            alias = aliased(attribute.property.mapper.class_)
+            subquery = subquery.join(alias, getattr(target, attribute.key))
+            target = alias
+        expression = create_op(target, fieldname, operator, argument, relation)
+        subquery = subquery.filter(expression).statement
+        if len(keys) == 1:
+            return getattr(model, keys[0]).in_(subquery)
+        return tuple_(*[getattr(model, key) for key in keys]).in_(subquery)
+
+    @staticmethod
+    def _create_filters(model, search_params, relation_strategy='exists',
+                        joins=None):
         """Returns the list of operations on `model` specified in the
         :attr:`filters` attribute on the `search_params` object.
 
         `search-params` is an instance of the :class:`SearchParameters` class
         whose fields represent the parameters of the search.
 
+        The name of the field in each filter may be a path through any number
+        of relationships, like ``'owner__company__name'``.
+        `relation_strategy` is one of :data:`RELATION_STRATEGIES`, and
+        determines how such filters are translated. If it is ``'join'``,
+        `joins` must be an ordered dictionary to which the joins required by
+        the returned filters are added, as described in
+        :meth:`_create_join_filter`.
+
         Raises one of :exc:`AttributeError`, :exc:`KeyError`, or
         :exc:`TypeError` if there is a problem creating the query. See the
         documentation for :func:`_create_operation` for more information.
@@ -312,23 +721,27 @@ class QueryBuilder(object):
         """
         filters = []
         for filt in search_params.filters:
-            fname = filt.fieldname
             val = filt.argument
-            # get the relationship from the field name, if it exists
-            relation = None
-            if '__' in fname:
-                relation, fname = fname.split('__')
             # get the other field to which to compare, if it exists
             if filt.otherfield:
                 val = getattr(model, filt.otherfield)
-            # for the sake of brevity...
-            create_op = QueryBuilder._create_operation
-            param = create_op(model, fname, filt.operator, val, relation)
+            # get the relationships from the field name, if they exist
+            path = QueryBuilder._resolve_path(model, filt.operator,
+                                              filt.fieldname)
+            if relation_strategy == 'join':
+                param = QueryBuilder._create_join_filter(model, filt.operator,
+                                                         val, *path,
+                                                         joins=joins)
+            else:
+                param = QueryBuilder._create_exists_filter(model,
+                                                           filt.operator, val,
+                                                           *path)
             filters.append(param)
         return filters
 
     @staticmethod
-    def create_query(session, model, search_params):
+    def create_query(session, model, search_params,
+                     relation_strategy='exists'):
         """Builds an SQLAlchemy query instance based on the search parameters
         present in ``search_params``, an instance of :class:`SearchParameters`.
 
@@ -340,6 +753,9 @@ class QueryBuilder(object):
         `search_params` is an instance of :class:`SearchParameters` which
         specify the filters, order, limit, offset, etc. of the query.
 
+        `relation_strategy` is one of :data:`RELATION_STRATEGIES`, and
+        determines how filters on fields of related models are translated.
+
         Building the query proceeds in this order:
         1. filtering the query
         2. ordering the query
@@ -349,12 +765,20 @@ class QueryBuilder(object):
         Raises one of :exc:`AttributeError`, :exc:`KeyError`, or
         :exc:`TypeError` if there is a problem creating the query. See the
         documentation for :func:`_create_operation` for more information.
+        Raises :exc:`ValueError` if `relation_strategy` is unknown.
 
         """
+        if relation_strategy not in RELATION_STRATEGIES:
+            raise ValueError('unknown relation strategy: {}'
+                             .format(relation_strategy))
         # Adding field filters
         query = session.query(model)
+        joins = OrderedDict()
         # may raise exception here
-        filters = QueryBuilder._create_filters(model, search_params)
+        filters = QueryBuilder._create_filters(model, search_params,
+                                               relation_strategy, joins)
+        for alias, onclause in joins.itervalues():
+            query = query.join(alias, onclause)
         for filt in filters:
             query = query.filter(filt)
 
@@ -371,8 +795,143 @@ class QueryBuilder(object):
             query = query.offset(search_params.offset)
         return query
 
+    @staticmethod
+    def _parametrize(model, search_params):
+        """Separates the shape of the search described by `search_params` from
+        the values provided in its filters.
+
+        This method returns a three-tuple. The first element is a hashable
+        object which identifies the shape of the search, that is, the field
+        names, operators, and ordering directives, along with the Python types
+        of the values, which determine the types of the bind parameters (see
+        :func:`_bind_type`), and so the number of values in each list
+        argument. The second element is a new
+        :class:`SearchParameters` object in which each value has been replaced
+        by a SQLAlchemy bind parameter and which has no limit or offset. The
+        third element is the dictionary mapping the names of those bind
+        parameters to the values they replace.
+
+        Two searches with the same shape produce equivalent parametrized
+        search parameters, so a query created from those can be reused for
+        either search by providing the appropriate values.
+
+        """
+        shape = []
+        filters = []
+        values = {}
+        for i, filt in enumerate(search_params.filters):
+            argument = filt.argument
+            # `None` arguments must remain so that missing arguments are
+            # reported by _create_operation
+            kind = None
+            if argument is not None and not filt.otherfield:
+                fieldtype = _field_type(model, filt.fieldname)
+                if isinstance(argument, (list, tuple)):
+                    names = ['arg%s_%s' % (i, j) for j in range(len(argument))]
+                    values.update(zip(names, argument))
+                    kind = tuple(type(v) for v in argument)
+                    argument = [bindparam(n, type_=_bind_type(fieldtype, v))
+                                for n, v in zip(names, argument)]
+                else:
+                    name = 'arg%s' % i
+                    values[name] = argument
+                    kind = type(argument)
+                    argument = bindparam(name,
+                                         type_=_bind_type(fieldtype, argument))
+            shape.append((filt.fieldname, filt.operator, kind,
+                          filt.otherfield))
+            filters.append(Filter(filt.fieldname, filt.operator, argument,
+                                  filt.otherfield))
+        order_by = search_params.order_by
+        parametrized = SearchParameters(filters, order_by=order_by)
+        order_by = tuple((o.field, o.direction) for o in order_by)
+        return (tuple(shape), order_by), parametrized, values
+
+    @staticmethod
+    def create_cached_query(session, model, search_params, plan_cache,
+                            relation_strategy='exists'):
+        """Returns a SQLAlchemy query equivalent to the one returned by
+        :meth:`create_query`, reusing a previously built query for a search of
+        the same shape if one exists in `plan_cache`.
+
+        Searches sent by clients tend to have only a few distinct shapes (see
+        :meth:`_parametrize`), so this saves parsing the operators and building
+        the SQLAlchemy expression for each filter on every request; only the
+        values of the bind parameters are substituted.
+
+        `plan_cache` is an object with ``get(key)`` and ``set(key, value)``
+        methods, like :class:`~flask_restless.cache.LRUCache`, in which the
+        queries are stored keyed on `model`, `relation_strategy`, and the shape
+        of the search.
+
+        Raises the same exceptions as :meth:`create_query`.
+
+        """
+        shape, parametrized, values = \
+            QueryBuilder._parametrize(model, search_params)
+        key = (model, relation_strategy, shape)
+        query = plan_cache.get(key)
+        if query is None:
+            query = QueryBuilder.create_query(session, model, parametrized,
+                                              relation_strategy)
+            # the cached query must not keep the session of this request alive
+            plan_cache.set(key, query.with_session(None))
+        # `session` may be a scoped session, in which case this resolves it to
+        # the session of the current scope
+        session = session.query(model).session
+        query = query.with_session(session).params(values)
+        if search_params.limit:
+            query = query.limit(search_params.limit)
+        if search_params.offset:
+            query = query.offset(search_params.offset)
+        return query
+
+
+def _field_type(model, fieldname):
+    """Returns the SQLAlchemy type of the column of `model` with the specified
+    name, or ``None`` if `fieldname` does not name a column of `model`.
+
+    `fieldname` may also be a path through relationships of `model`, as
+    described in :meth:`QueryBuilder._resolve_path`.
+
+    """
+    try:
+        names = fieldname.split('__')
+        for name in names[:-1]:
+            model = getattr(model, name).property.mapper.class_
+        return getattr(model, names[-1]).property.columns[0].type
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def _bind_type(fieldtype, value):
+    """Returns the SQLAlchemy type of the bind parameter which replaces `value`
+    in a comparison with a column of type `fieldtype`, or ``None`` if
+    `fieldtype` is ``None``.
+
+    This is the type which SQLAlchemy gives `value` itself when it is compared
+    with the column, which depends on the Python type of `value`; for example,
+    a string compared with a date column is bound as a string.
+
+    """
+    if fieldtype is None:
+        return None
+    return fieldtype._coerce_compared_value(None, value)
+
+
+def search_shape(model, search_params):
+    """Returns a hashable object which identifies the shape of the search on
+    `model` described by `search_params`, that is, everything about it except
+    the values provided in its filters, its limit, and its offset.
+
+    For more information, see :meth:`QueryBuilder._parametrize`.
+
+    """
+    return QueryBuilder._parametrize(model, search_params)[0]
+
 
-def create_query(session, model, searchparams):
+def create_query(session, model, searchparams, plan_cache=None,
+                 relation_strategy='exists', normalize=False, advisor=None):
     """Returns a SQLAlchemy query object on the given `model` where the search
     for the query is defined by `searchparams`.
 
@@ -388,13 +947,131 @@ def create_query(session, model, searchparams):
     the parameters of the query (as returned by
     :func:`SearchParameters.from_dictionary`, for example).
 
+    If `plan_cache` is not ``None``, queries are reused for searches of the
+    same shape as described in :meth:`QueryBuilder.create_cached_query`.
+
+    `relation_strategy` is one of :data:`RELATION_STRATEGIES`, and determines
+    how filters on fields of related models are translated into SQL.
+
+    If `normalize` is ``True``, redundant filters are combined before the
+    query is created, as described in :func:`normalize_filters`, and
+    :exc:`ContradictionError` is raised if the filters contradict one another.
+
+    If `advisor` is not ``None``, it is an
+    :class:`~flask_restless.advisor.IndexAdvisor` on which the columns used by
+    the search are recorded once the query has been created.
+
     """
     if isinstance(searchparams, dict):
         searchparams = SearchParameters.from_dictionary(searchparams)
-    return QueryBuilder.create_query(session, model, searchparams)
+    if normalize:
+        # may raise ContradictionError
+        filters = normalize_filters(searchparams.filters)
+        searchparams = SearchParameters(filters, searchparams.limit,
+                                        searchparams.offset,
+                                        searchparams.order_by)
+    if plan_cache is not None:
+        query = QueryBuilder.create_cached_query(session, model, searchparams,
+                                                 plan_cache, relation_strategy)
+    else:
+        query = QueryBuilder.create_query(session, model, searchparams,
+                                          relation_strategy)
+    if advisor is not None:
+        advisor.record(model, searchparams)
+    return query
+
+
+#: The names of the SQLAlchemy dialects of databases which sort ``NULL`` after
+#: all other values in ascending order (and before them in descending order).
+#: Other databases sort ``NULL`` before all other values in ascending order.
+NULLS_LAST_DIALECTS = frozenset(('postgresql', 'oracle'))
+
+
+def _keyset_after(field, value, descending, nulls_last, inclusive=False):
+    """Returns a SQLAlchemy expression which matches the values of `field`
+    which come strictly after `value` in ascending order, or in descending
+    order if `descending` is ``True``, or ``None`` if no value comes after it.
+
+    If `inclusive` is ``True``, the expression also matches `value` itself.
+
+    `value` may be ``None``, and ``NULL`` values of `field` are ordered as
+    described in :func:`create_keyset_filter`.
 
+    """
+    # whether NULL comes after all other values in the direction of the sort
+    nulls_after = nulls_last != descending
+    if value is None:
+        if inclusive:
+            return field == None if nulls_after else None
+        return None if nulls_after else field != None
+    if descending:
+        comparison = field <= value if inclusive else field < value
+    else:
+        comparison = field >= value if inclusive else field > value
+    if nulls_after:
+        return or_(comparison, field == None)
+    return comparison
+
+
+def create_keyset_filter(model, order_by, values, nulls_last=False):
+    """Returns a SQLAlchemy expression which matches exactly those instances
+    of `model` which come after the instance whose values of the ordering
+    fields are `values` in the ordering given by `order_by`.
+
+    This is the filter used for keyset (or "seek") pagination: instead of
+    skipping a number of rows with ``OFFSET``, the next page is requested with
+    a predicate equivalent to ``(field1, field2, ...) > (value1, value2,
+    ...)``. Since fields may be sorted in different directions, the predicate
+    is expanded into a disjunction of the form::
+
+        field1 >= value1 AND (field1 > value1
+                              OR (field1 = value1 AND field2 > value2)
+                              OR ...)
+
+    where ``>`` is replaced by ``<`` for fields sorted in descending
+    order. The leading redundant comparison allows the database to use an
+    index on the first field.
+
+    Since comparisons with ``NULL`` are never true, the values in `values`
+    which are ``None`` are compared with ``IS NULL`` and ``IS NOT NULL``
+    instead, and ``NULL`` values of the fields are matched according to the
+    position in which the database sorts them: after all other values in
+    ascending order if `nulls_last` is ``True`` (see
+    :data:`NULLS_LAST_DIALECTS`), or before them otherwise.
+
+    `order_by` is a list of :class:`OrderBy` objects, which should uniquely
+    determine the order of the instances of `model` (for example, by ending
+    with the primary key).
+
+    `values` is a list of the same length as `order_by` containing the values
+    of those fields on the last instance of the previous page.
+
+    Raises :exc:`AttributeError` if a field named in `order_by` does not exist
+    on `model`.
 
-def search(session, model, search_params):
+    """
+    fields = [getattr(model, o.field) for o in order_by]
+    descending = [o.direction == 'desc' for o in order_by]
+    disjuncts = []
+    for i, (field, value) in enumerate(zip(fields, values)):
+        comparison = _keyset_after(field, value, descending[i], nulls_last)
+        if comparison is None:
+            continue
+        # comparing with None creates an IS NULL expression
+        equalities = [f == v for f, v in zip(fields[:i], values[:i])]
+        disjuncts.append(and_(*(equalities + [comparison])))
+    if not disjuncts:
+        # no instance comes after the last one in the ordering
+        return and_(fields[0] == None, fields[0] != None)
+    first = _keyset_after(fields[0], values[0], descending[0], nulls_last,
+                          inclusive=True)
+    if first is None:
+        return or_(*disjuncts)
+    return and_(first, or_(*disjuncts))
+
+
+def search(session, model, search_params, plan_cache=None,
+           relation_strategy='exists', normalize=False, advisor=None):
     """Performs the search specified by the given parameters on the model
     specified in the constructor of this class.
 
@@ -419,12 +1096,22 @@ def search(session, model, search_params):
     :class:`SearchParameters` object when the :func:`create_query` function is
     called.
 
+    `plan_cache`, `relation_strategy`, `normalize`, and `advisor` are passed
+    directly to :func:`create_query`. If the filters are found to contradict
+    one another, the database is not queried at all.
+
     """
     # `is_single` is True when 'single' is a key in ``search_params`` and its
     # corresponding value is anything except those values which evaluate to
     # False (False, 0, the empty string, the empty list, etc.).
     is_single = search_params.get('single')
-    query = create_query(session, model, search_params)
+    try:
+        query = create_query(session, model, search_params, plan_cache,
+                             relation_strategy, normalize, advisor)
+    except ContradictionError:
+        if is_single:
+            raise NoResultFound('No row was found for one()')
+        return []
     if is_single:
         # may raise NoResultFound or MultipleResultsFound
         return query.one()
@@ -0,0 +1,411 @@
+"""
+    flask.ext.restless.serializer
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides a class which converts instances of a SQLAlchemy model to
+    dictionaries using a function generated for the columns of the model, so
+    that the mapper of the model is not inspected again for each instance.
+
+    The dictionaries are the same as those returned by
+    :func:`flask_restless.views._to_dict`. The same functions can also convert
+    instances to lists of values, for tables in which the names of the columns
+    are given only once.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import datetime
+import keyword
+import re
+from operator import attrgetter
+
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import ColumnProperty
+from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.types import Boolean
+from sqlalchemy.types import Integer
+from sqlalchemy.types import Interval
+from sqlalchemy.types import LargeBinary
+from sqlalchemy.types import Numeric
+from sqlalchemy.types import String
+from sqlalchemy.types import Time
+
+from .cache import LRUCache
+
+#: Types of columns whose values are never :class:`datetime.date` objects, and
+#: so never need to be converted to strings.
+PLAIN_TYPES = (Boolean, Integer, Interval, LargeBinary, Numeric, String, Time)
+
+#: The maximum number of functions compiled for different sets of columns which
+#: each serializer keeps.
+FUNCTION_CACHE_SIZE = 64
+
+# Matches the names of attributes which can be read with the dot operator.
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# mapping from model class to the serializer for that model
+_serializers = {}
+
+
+def _isoformat(value):
+    """Returns the ISO 8601 representation of `value`, a
+    :class:`datetime.date` object, or ``None`` if `value` is ``None``.
+
+    """
+    return None if value is None else value.isoformat()
+
+
+def _convert(value):
+    """Returns the ISO 8601 representation of `value` if it is a
+    :class:`datetime.date` object, or `value` itself otherwise.
+
+    """
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def serializer_for(model):
+    """Returns the :class:`Serializer` for `model`, creating it the first time
+    it is requested.
+
+    """
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers.setdefault(model, Serializer(model))
+    return serializer
+
+
+class Serializer(object):
+    """Converts instances of a SQLAlchemy model to dictionaries.
+
+    For each set of columns to include, the source code of a function which
+    reads those columns from an instance and returns the dictionary is
+    generated and compiled once, with the columns known to contain dates
+    converted to ISO 8601 strings. Columns of types which may or may not
+    contain dates (for example, custom types) are checked for each instance.
+
+    Use :func:`serializer_for` to get the serializer of a model instead of
+    instantiating this class, so that the compiled functions are shared.
+
+    """
+
+    def __init__(self, model):
+        """Instantiates this serializer for the specified model, compiling the
+        function which includes all columns.
+
+        """
+        self.model = model
+        mapper = class_mapper(model)
+        #: The names of the columns of the model, in the order of the mapper.
+        self.columns = []
+        #: The names of the columns whose values are always dates.
+        self.date_columns = set()
+        #: The names of the columns whose values are never dates.
+        self.plain_columns = set()
+        #: Mapping from the name of each relation of the model to the related
+        #: model.
+        self.relations = {}
+        for prop in mapper.iterate_properties:
+            if isinstance(prop, ColumnProperty):
+                self.columns.append(prop.key)
+                columntype = prop.columns[0].type
+                if isinstance(columntype, (Date, DateTime)):
+                    self.date_columns.add(prop.key)
+                elif isinstance(columntype, PLAIN_TYPES):
+                    self.plain_columns.add(prop.key)
+            elif isinstance(prop, RelationshipProperty):
+                self.relations[prop.key] = prop.mapper.class_
+        self._all = self._compile(self.columns)
+        # mapping from the frozen set of names of the columns to include, and
+        # whether to return lists instead of dictionaries, to the function
+        # which serializes them; since the sets are chosen by clients, only
+        # the most recently used functions are kept
+        self._functions = LRUCache(FUNCTION_CACHE_SIZE)
+        # mapping from the tuple of names of the columns in a row, and whether
+        # to return lists, to the function which serializes such rows
+        self._row_functions = LRUCache(FUNCTION_CACHE_SIZE)
+
+    def _compile(self, columns, rows=False, values=False):
+        """Returns a function which takes an instance of the model and returns
+        a dictionary mapping the name of each of the specified columns to its
+        value.
+
+        If `rows` is ``True``, the returned function takes a row (a tuple)
+        whose first items are the values of the specified columns, in order,
+        instead of an instance.
+
+        If `values` is ``True``, the returned function returns the list of the
+        values of the columns, in order, instead of a dictionary.
+
+        """
+        items = []
+        for index, name in enumerate(columns):
+            if rows:
+                getter = 'instance[%d]' % index
+            elif _IDENTIFIER.match(name) and not keyword.iskeyword(name):
+                getter = 'instance.%s' % name
+            else:
+                getter = 'getattr(instance, %r)' % name
+            if name in self.date_columns:
+                getter = '_isoformat(%s)' % getter
+            elif name not in self.plain_columns:
+                getter = '_convert(%s)' % getter
+            items.append(getter if values else '%r: %s' % (name, getter))
+        template = '[%s]' if values else '{%s}'
+        source = ('def serialize(instance):\n'
+                  '    return %s\n' % (template % ', '.join(items)))
+        namespace = dict(_isoformat=_isoformat, _convert=_convert)
+        code = compile(source, '<serializer for %s>' % self.model.__name__,
+                       'exec')
+        exec code in namespace
+        return namespace['serialize']
+
+    def _function(self, include, values=False):
+        """Returns the function which serializes the columns named in
+        `include`, or all columns if `include` is ``None``, compiling it if
+        necessary.
+
+        If `values` is ``True``, the function returns lists instead of
+        dictionaries, as described in :meth:`_compile`.
+
+        """
+        if include is None and not values:
+            return self._all
+        if include is not None:
+            include = frozenset(include).intersection(self.columns)
+        key = (include, values)
+        function = self._functions.get(key)
+        if function is None:
+            function = self._compile(self._included(include), values=values)
+            self._functions.set(key, function)
+        return function
+
+    def _included(self, include):
+        """Returns the list of names of the columns named in `include`, or of
+        all columns if `include` is ``None``, in the order of the mapper.
+
+        """
+        if include is None:
+            return self.columns
+        return [name for name in self.columns if name in include]
+
+    def _row_function(self, columns, values=False):
+        """Returns the function which serializes rows whose first items are
+        the values of the columns named in the tuple `columns`, compiling it
+        if necessary.
+
+        If `values` is ``True``, the function returns lists instead of
+        dictionaries, as described in :meth:`_compile`.
+
+        """
+        key = (columns, values)
+        function = self._row_functions.get(key)
+        if function is None:
+            function = self._compile(columns, rows=True, values=values)
+            self._row_functions.set(key, function)
+        return function
+
+    def rows(self, rows, columns):
+        """Returns the list of dictionary representations of each of the rows
+        in the iterable `rows`, as returned by executing a SQL query which
+        selects the columns of the model named in the list `columns`, followed
+        by any number of other values.
+
+        The dictionaries contain exactly the specified columns and are the same
+        as those returned for instances by :meth:`many`.
+
+        """
+        function = self._row_function(tuple(columns))
+        return [function(row) for row in rows]
+
+    def row_table(self, rows, columns):
+        """Returns a two-tuple containing the list `columns` and the list of
+        the lists of values of the specified columns in each of the rows in
+        the iterable `rows`, where `columns` and `rows` are as described in
+        :meth:`rows`.
+
+        The lists are the same as those returned for instances by
+        :meth:`table`.
+
+        """
+        function = self._row_function(tuple(columns), values=True)
+        return list(columns), [function(row) for row in rows]
+
+    def columnar(self, instances, columns, rows=False):
+        """Returns the list of the sequences of values of each of the columns
+        named in the list `columns`, in order, of the instances in the list
+        `instances`. The values are not converted.
+
+        If `rows` is ``True``, `instances` is a list of rows whose first items
+        are the values of the specified columns, as described in :meth:`rows`,
+        instead of instances.
+
+        """
+        if not instances:
+            return [[] for name in columns]
+        if rows:
+            return zip(*instances)[:len(columns)]
+        return [map(attrgetter(name), instances) for name in columns]
+
+    def __call__(self, instance, deep=None, include=None):
+        """Returns the dictionary representation of `instance`, as returned by
+        :func:`flask_restless.views._to_dict_include`.
+
+        `deep` is the dictionary which defines the depth of related instances
+        to include, as described in :func:`flask_restless.views._to_dict`.
+
+        `include`, if not ``None``, specifies the only columns and relations
+        which will be present in the returned dictionary. The other columns
+        are not read from `instance`.
+
+        """
+        serializer = self._serializer(instance)
+        return serializer._serialize(serializer._function(include), instance,
+                                     deep, include)
+
+    def many(self, instances, deep=None, include=None):
+        """Returns the list of dictionary representations of each of the
+        instances in the iterable `instances`.
+
+        This is faster than calling this object on each instance, since the
+        function which serializes the columns is looked up only once for each
+        class of instance. `deep` and `include` are as described in
+        :meth:`__call__`.
+
+        """
+        # mapping from class of instance to its serializer and function
+        functions = {self.model: (self, self._function(include))}
+        result = []
+        for instance in instances:
+            model = type(instance)
+            if model not in functions:
+                serializer = self._serializer(instance)
+                functions[model] = (serializer, serializer._function(include))
+            serializer, function = functions[model]
+            if deep:
+                result.append(serializer._serialize(function, instance, deep,
+                                                    include))
+            else:
+                result.append(function(instance))
+        return result
+
+    def _serializer(self, instance):
+        """Returns the serializer for the class of `instance`.
+
+        A query on a model with subclasses mapped by inheritance may return
+        instances of those subclasses, which have the columns and relations of
+        their own mappers in addition to those of this model.
+
+        """
+        model = type(instance)
+        if model is self.model:
+            return self
+        return serializer_for(model)
+
+    def table(self, instances, deep=None, include=None):
+        """Returns the table representation of the instances in the iterable
+        `instances`, a two-tuple containing the header of the table, as
+        returned by :meth:`header`, and the list of its rows.
+
+        Each row is the list of the values in the dictionary representation of
+        an instance (see :meth:`__call__`), in the order of the header. Since
+        all rows share the header, only the columns of this model are included
+        for instances of its subclasses. The
+        value of a relation to many instances is the list of the rows of the
+        related instances, and that of a relation to a single instance is the
+        row of that instance, or ``None``. `deep` and `include` are as
+        described in :meth:`__call__`.
+
+        """
+        relations = self._table_relations(deep, include)
+        return (self._header(include, relations),
+                self._table_rows(instances, include, relations))
+
+    def header(self, deep=None, include=None):
+        """Returns the header of the table representation of instances of the
+        model, as described in :meth:`table`.
+
+        The header is the list of the names of the included columns, in the
+        order of the mapper, followed by a dictionary for each included
+        relation, mapping the name of the relation to the header of the table
+        representation of the related instances.
+
+        """
+        return self._header(include, self._table_relations(deep, include))
+
+    def _table_relations(self, deep, include):
+        """Returns the sorted list of pairs of names of relations and
+        dictionaries which define the depth of the related instances, for the
+        relations in `deep` which are also in `include` (if it is not
+        ``None``).
+
+        """
+        return sorted((relation, rdeep)
+                      for relation, rdeep in (deep or {}).iteritems()
+                      if include is None or relation in include)
+
+    def _header(self, include, relations):
+        """Returns the header of the table of the columns in `include` and
+        the relations in the list `relations`, as returned by
+        :meth:`_table_relations`.
+
+        """
+        header = list(self._included(include))
+        for relation, rdeep in relations:
+            serializer = serializer_for(self.relations[relation])
+            header.append({relation: serializer.header(rdeep)})
+        return header
+
+    def _table_rows(self, instances, include, relations):
+        """Returns the list of the rows of the table of the columns in
+        `include` and the relations in the list `relations`, as returned by
+        :meth:`_table_relations`, of the instances in `instances`.
+
+        """
+        function = self._function(include, values=True)
+        if not relations:
+            return [function(instance) for instance in instances]
+        related = []
+        for relation, rdeep in relations:
+            serializer = serializer_for(self.relations[relation])
+            related.append((relation, serializer,
+                            serializer._table_relations(rdeep, None)))
+        rows = []
+        for instance in instances:
+            row = function(instance)
+            for relation, serializer, rrelations in related:
+                relatedvalue = getattr(instance, relation)
+                if relatedvalue is None:
+                    row.append(None)
+                elif isinstance(relatedvalue, list):
+                    row.append(serializer._table_rows(relatedvalue, None,
+                                                      rrelations))
+                else:
+                    row.append(serializer._table_rows([relatedvalue], None,
+                                                      rrelations)[0])
+            rows.append(row)
+        return rows
+
+    def _serialize(self, function, instance, deep, include):
+        """Returns the dictionary representation of `instance` whose columns
+        are serialized by `function`, with the related instances specified by
+        `deep` and `include` as described in :meth:`__call__`.
+
+        """
+        result = function(instance)
+        for relation, rdeep in (deep or {}).iteritems():
+            if include is not None and relation not in include:
+                continue
+            serializer = serializer_for(self.relations[relation])
+            relatedvalue = getattr(instance, relation)
+            if relatedvalue is None:
+                result[relation] = None
+            elif isinstance(relatedvalue, list):
+                result[relation] = serializer.many(relatedvalue, rdeep)
+            else:
+                result[relation] = serializer(relatedvalue, rdeep)
+        return result
@@ -16,47 +16,126 @@
       Provides a :http:method:`get` endpoint which returns the result of
       evaluating some function on the entire collection of a given model.
 
+    :class:`flask.ext.restless.views.ExportAPI`
+      Provides a :http:method:`get` endpoint which streams the instances of a
+      given model matching a search as newline-delimited JSON.
+
     :copyright: 2011 by Lincoln de Sousa <lincoln@comum.org>
     :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
     :license: GNU AGPLv3+ or BSD
 
 """
+import base64
 import datetime
+import hashlib
+import math
 
 from dateutil.parser import parse as parse_datetime
+from dateutil.tz import tzutc
 from flask import abort
+from flask import current_app
 from flask import json
-from flask import jsonify
 from flask import request
 from flask.views import MethodView
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import Integer
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import defer
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import lazyload
 from sqlalchemy.orm import ColumnProperty
 from sqlalchemy.orm import object_mapper
 from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.orm import subqueryload
+from sqlalchemy.orm import with_parent
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.properties import RelationshipProperty as RelProperty
 from sqlalchemy.orm.properties import ONETOMANY
 from sqlalchemy.sql import func
-
+# stream_with_context is available in Flask 0.9 or later
+try:
+    from flask import stream_with_context
+except ImportError:
+    stream_with_context = None
+
+from .encoding import DEFAULT_ENCODER
+from .encoding import MSGPACK_ENCODER
+from .encoding import MSGPACK_MIMETYPES
+from .formats import BATCH_SIZE as FORMAT_BATCH_SIZE
+from .formats import FormatError
+from .formats import FORMATS
+from .formats import requested_format
+from .formats import writer
+from .guard import ExplainError
+from .guard import QueryTooExpensive
 from .helpers import unicode_keys_to_strings
+from .search import ContradictionError
+from .search import create_keyset_filter
 from .search import create_query
-from .search import search
+from .search import NULLS_LAST_DIALECTS
+from .search import OrderBy
+from .search import SearchParameters
+from .serializer import serializer_for
+
+#: The query option which loads a relation with each strategy, keyed by the
+#: name of the strategy as accepted by the `relation_loading` argument to
+#: :meth:`APIManager.create_api`.
+#:
+#: ``'subquery'`` loads the relation for all the instances on a page with one
+#: additional query, ``'joined'`` loads it in the same query using a ``LEFT
+#: OUTER JOIN``, and ``'select'`` loads it with one additional query for each
+#: instance when it is accessed.
+RELATION_LOADERS = {'subquery': subqueryload, 'joined': joinedload,
+                    'select': lazyload}
+
+#: The strategy with which relations are loaded unless another one is
+#: specified for them.
+DEFAULT_RELATION_LOADING = 'subquery'
+
+#: The ways in which the instances found by searches can be read from the
+#: database, which may be provided as the `read_mode` keyword argument to
+#: :meth:`APIManager.create_api`.
+#:
+#: ``'orm'`` loads instances of the model through the session, and ``'core'``
+#: executes a SQL query selecting only the needed columns and converts the
+#: rows to dictionaries directly, without creating instances. Responses which
+#: include relations are always read through the session.
+READ_MODES = ('orm', 'core')
+
+#: The number of rows fetched from the database at a time when streaming
+#: search results (see :meth:`API._streamed`).
+STREAM_BATCH_SIZE = 100
+
+#: The number of instances created by a :http:method:`post` request for many
+#: instances which are written to the database at a time, unless another
+#: chunk size was specified (see :meth:`API._post_many`).
+POST_BATCH_SIZE = 1000
 
 
 def jsonify_status_code(status_code, *args, **kw):
     """Returns a jsonified response with the specified HTTP status code.
 
     The positional and keyword arguments are passed directly to the
-    :func:`flask.jsonify` function which creates the response.
+    :class:`dict` constructor to create the object which is encoded by
+    :data:`~flask_restless.encoding.DEFAULT_ENCODER` as the body of the
+    response.
+
+    """
+    return _json_response(DEFAULT_ENCODER.encode(dict(*args, **kw)),
+                          status_code)
+
+
+def _json_response(body, status_code=200, mimetype='application/json'):
+    """Returns a response with the specified JSON string (or, if `mimetype`
+    is a MessagePack MIME type, MessagePack bytes) as its body and the
+    specified HTTP status code.
 
     """
-    response = jsonify(*args, **kw)
-    response.status_code = status_code
-    return response
+    return current_app.response_class(body, status=status_code,
+                                      mimetype=mimetype)
 
 
 def _is_date_field(model, fieldname):
@@ -72,7 +151,78 @@ def _is_date_field(model, fieldname):
     return isinstance(fieldtype, Date) or isinstance(fieldtype, DateTime)
 
 
-def _get_or_create(session, model, **kwargs):
+def _encode_cursor(values):
+    """Returns an opaque string which encodes the list `values` of the ordering
+    fields of the last instance on a page, for use with keyset pagination.
+
+    Dates and times are encoded as strings in ISO 8601 format.
+
+    """
+    values = [v.isoformat() if isinstance(v, datetime.date) else v
+              for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values))
+
+
+def _decode_cursor(model, cursor, order_by):
+    """Returns the list of values encoded in `cursor` by
+    :func:`_encode_cursor`.
+
+    `order_by` is the list of :class:`~flask_restless.search.OrderBy` objects
+    to which the values correspond. Strings which are values of date or time
+    fields of `model` are converted back to Python objects.
+
+    Raises :exc:`TypeError` or :exc:`ValueError` if `cursor` is not a valid
+    cursor for `order_by`. Since cursors are provided by clients, this
+    includes cursors containing values which are not scalars, like lists or
+    objects.
+
+    """
+    values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    if not isinstance(values, list) or len(values) != len(order_by):
+        raise ValueError('cursor does not match the ordering of the query')
+    for value in values:
+        if value is not None and \
+                not isinstance(value, (bool, int, long, float, basestring)):
+            raise ValueError('cursor contains a value which is not a scalar')
+    for i, fieldname in enumerate(o.field for o in order_by):
+        if values[i] is not None and _is_date_field(model, fieldname):
+            if not isinstance(values[i], basestring):
+                raise ValueError('cursor contains a date which is not a'
+                                 ' string')
+            value = parse_datetime(values[i])
+            fieldtype = getattr(model, fieldname).property.columns[0].type
+            if not isinstance(fieldtype, DateTime):
+                value = value.date()
+            values[i] = value
+    return values
+
+
+def _batches(iterable, size):
+    """Yields the lists of `size` consecutive items of `iterable`, except the
+    last list, which may be shorter.
+
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _filters_key(filters):
+    """Returns a string which identifies the conjunction of the specified list
+    of :class:`~flask_restless.search.Filter` objects, regardless of the order
+    in which they are given.
+
+    """
+    return json.dumps(sorted([f.fieldname, f.operator, f.argument,
+                              f.otherfield] for f in filters))
+
+
+def _get_or_create(session, model, commit=True, **kwargs):
     """Returns the first instance of the specified model filtered by the
     keyword arguments, or creates a new instance of the model and returns that.
 
@@ -89,6 +239,10 @@ def _get_or_create(session, model, **kwargs):
     `model` is the SQLAlchemy model to get or create (this should be a subclass
     of :class:`~flask.ext.restless.model.Entity`).
 
+    If `commit` is ``False``, a created instance is only flushed to the
+    database instead of committed, so that it is rolled back along with the
+    rest of the transaction in progress.
+
     `kwargs` are the keyword arguments which will be passed to the
     :func:`sqlalchemy.orm.query.Query.filter_by` function.
 
@@ -100,7 +254,10 @@ def _get_or_create(session, model, **kwargs):
     else:
         instance = model(**kwargs)
         session.add(instance)
-        session.commit()
+        if commit:
+            session.commit()
+        else:
+            session.flush()
         return instance, True
 
 
@@ -155,9 +312,7 @@ def _primary_key_name(model_or_instance):
 
 # This code was adapted from :meth:`elixir.entity.Entity.to_dict` and
 # http://stackoverflow.com/q/1958219/108197.
-#
-# TODO should we have an `include` argument also?
-def _to_dict(instance, deep=None, exclude=None):
+def _to_dict(instance, deep=None, exclude=None, include=None):
     """Returns a dictionary representing the fields of the specified `instance`
     of a SQLAlchemy model.
 
@@ -171,12 +326,18 @@ def _to_dict(instance, deep=None, exclude=None):
     `exclude` specifies the columns which will *not* be present in the returned
     dictionary representation of the object.
 
+    `include`, if not ``None``, specifies the only columns which will be
+    present in the returned dictionary. The other columns are not even read
+    from `instance`, so columns which have been deferred (see
+    :meth:`API._column_options`) are not loaded from the database.
+
     """
     deep = deep or {}
     exclude = exclude or ()
     # create the dictionary mapping column name to value
     columns = (p.key for p in object_mapper(instance).iterate_properties
-               if isinstance(p, ColumnProperty))
+               if isinstance(p, ColumnProperty)
+               and (include is None or p.key in include))
     result = dict((col, getattr(instance, col)) for col in columns)
     # Convert datetime and date objects to ISO 8601 format.
     #
@@ -218,7 +379,7 @@ def _to_dict_include(instance, deep=None, exclude=None, include=None):
     of strings, only those keys will be included in the returned dictionary.
 
     """
-    result = _to_dict(instance, deep, exclude)
+    result = _to_dict(instance, deep, exclude, include)
     if include is None:
         return result
     return _include_keys(result, include)
@@ -328,7 +489,7 @@ class ModelView(MethodView):
 
     """
 
-    def __init__(self, session, model, *args, **kw):
+    def __init__(self, session, model, encoder=None, *args, **kw):
         """Calls the constructor of the superclass and specifies the model for
         which this class provides a ReSTful API.
 
@@ -338,10 +499,75 @@ class ModelView(MethodView):
         `model` is the SQLALchemy declarative model class of the database model
         for which this instance of the class is an API.
 
+        `encoder` is the object whose ``encode(obj)`` method returns the JSON
+        string which is the body of each response, like
+        :class:`~flask_restless.encoding.JSONEncoder`. If it is ``None``,
+        :data:`~flask_restless.encoding.DEFAULT_ENCODER` is used.
+
         """
         super(ModelView, self).__init__(*args, **kw)
         self.session = session
         self.model = model
+        self.encoder = DEFAULT_ENCODER if encoder is None else encoder
+
+    def _jsonify(self, *args, **kw):
+        """Returns a :http:statuscode:`200` response whose body is the JSON
+        representation of the dictionary created from the positional and
+        keyword arguments, as encoded by the encoder of this view.
+
+        """
+        return self._jsonify_status_code(200, *args, **kw)
+
+    def _jsonify_status_code(self, status_code, *args, **kw):
+        """Returns a response with the specified HTTP status code, whose body
+        is the JSON representation of the dictionary created from the
+        positional and keyword arguments, as encoded by the encoder of this
+        view, or its MessagePack representation if the client requested it
+        (see :meth:`_negotiate`).
+
+        """
+        encoder, mimetype = self._negotiate()
+        response = _json_response(encoder.encode(dict(*args, **kw)),
+                                  status_code, mimetype)
+        response.vary.add('Accept')
+        return response
+
+    def _negotiate(self):
+        """Returns a two-tuple containing the encoder of the body of the
+        response to the current request and the MIME type of that body.
+
+        If :mod:`msgpack` is installed and the client gives one of
+        :data:`~flask_restless.encoding.MSGPACK_MIMETYPES` a higher quality
+        than JSON in the :http:header:`Accept` header, the body is encoded as
+        MessagePack. Otherwise it is encoded as JSON by the encoder of this
+        view.
+
+        """
+        if MSGPACK_ENCODER is not None:
+            # JSON wins if it has the same quality as MessagePack
+            mimetypes = ('application/json', ) + MSGPACK_MIMETYPES
+            if request.accept_mimetypes.best_match(mimetypes) \
+                    in MSGPACK_MIMETYPES:
+                return MSGPACK_ENCODER, MSGPACK_MIMETYPES[0]
+        return self.encoder, 'application/json'
+
+    def _load_body(self):
+        """Returns the object represented by the body of the current request,
+        decoded from MessagePack if the :http:header:`Content-Type` of the
+        request is one of :data:`~flask_restless.encoding.MSGPACK_MIMETYPES`,
+        and from JSON otherwise.
+
+        Raises :exc:`ValueError` (or :exc:`TypeError` or
+        :exc:`OverflowError`) if the body cannot be decoded, and responds with
+        :http:statuscode:`415` if it is MessagePack but :mod:`msgpack` is not
+        installed.
+
+        """
+        if request.mimetype in MSGPACK_MIMETYPES:
+            if MSGPACK_ENCODER is None:
+                abort(415)
+            return MSGPACK_ENCODER.decode(request.data)
+        return json.loads(request.data)
 
     def query(self, model=None):
         """Returns either a SQLAlchemy query or Flask-SQLAlchemy query object
@@ -374,21 +600,22 @@ class FunctionAPI(ModelView):
 
         """
         try:
-            data = json.loads(request.data)
+            data = self._load_body()
         except (TypeError, ValueError, OverflowError):
-            return jsonify_status_code(400, message='Unable to decode data')
+            return self._jsonify_status_code(
+                400, message='Unable to decode data')
         try:
             result = _evaluate_functions(self.session, self.model,
                                          data.get('functions'))
             if not result:
-                return jsonify_status_code(204)
-            return jsonify(result)
+                return self._jsonify_status_code(204)
+            return self._jsonify(result)
         except AttributeError, exception:
             message = 'No such field "%s"' % exception.field
-            return jsonify_status_code(400, message=message)
+            return self._jsonify_status_code(400, message=message)
         except OperationalError, exception:
             message = 'No such function "%s"' % exception.function
-            return jsonify_status_code(400, message=message)
+            return self._jsonify_status_code(400, message=message)
 
 
 class API(ModelView):
@@ -410,7 +637,17 @@ class API(ModelView):
                  delete_form_preprocessor=None,
                  delete_form_postprocessor=None,
                  get_result_postprocessor=None,
-                 get_request_preprocessor=None, *args, **kw):
+                 get_request_preprocessor=None, keyset_pagination=False,
+                 count_strategy=None, count_cache=None,
+                 stream_results=False, plan_cache=None,
+                 relation_strategy='exists', normalize_filters=False,
+                 index_advisor=None, cost_guard=None, relation_loading=None,
+                 shallow=False, response_cache=None, response_caches=None,
+                 version_column=None, last_modified_column=None,
+                 serializer=None, read_mode='orm', encoder=None,
+                 compressor=None, allow_post_many=False,
+                 post_chunk_size=None, response_cache_key=None,
+                 paginate_related_collections=False, *args, **kw):
         """Instantiates this view with the specified attributes.
 
         `session` is the SQLAlchemy session in which all database transactions
@@ -498,6 +735,129 @@ class API(ModelView):
         `get_request_preprocessor` is a callback function which takes
         GET input and enhances it as required.
 
+        If `keyset_pagination` is ``True``, pages of search results are
+        selected by a filter on the ordering fields and the primary key instead
+        of an ``OFFSET`` clause. Clients request the next page by providing the
+        ``next_cursor`` value from the previous response as the ``cursor``
+        query parameter. For more information, see :ref:`keysetpagination`.
+
+        `count_strategy` specifies how the total number of results of a search
+        is computed for the ``num_results`` and ``total_pages`` mappings of
+        paginated responses. If it is ``'query'``, a separate ``COUNT(*)``
+        query is made over the filtered query. If it is ``'window'``, the count
+        is computed by ``COUNT(*) OVER ()`` in the same statement which fetches
+        the page (this requires a database which supports window
+        functions). If it is ``None`` (the default), results are not counted
+        and these mappings are omitted from responses.
+
+        `count_cache` is an object with ``get(key)`` and ``set(key, value)``
+        methods, like :class:`~flask_restless.cache.TTLCache`, in which counts
+        are stored keyed on the filters of the search, or ``None`` if counts
+        should not be cached.
+
+        If `stream_results` is ``True`` and pagination is disabled, search
+        results are fetched and sent to the client incrementally instead of
+        building the whole response in memory.
+
+        `plan_cache` is an object with ``get(key)`` and ``set(key, value)``
+        methods, like :class:`~flask_restless.cache.LRUCache`, in which
+        queries built for searches are stored and reused for subsequent
+        searches of the same shape (see
+        :meth:`~flask_restless.search.QueryBuilder.create_cached_query`), or
+        ``None`` if queries should be built from scratch for each search.
+
+        `relation_strategy` is one of
+        :data:`~flask_restless.search.RELATION_STRATEGIES`, and determines
+        whether filters on fields of related models are translated into
+        ``EXISTS`` subqueries or joins.
+
+        If `normalize_filters` is ``True``, redundant filters in searches are
+        combined before the query is created (see
+        :func:`~flask_restless.search.normalize_filters`), and searches whose
+        filters contradict one another are answered with an empty result
+        without querying the database.
+
+        `index_advisor` is an :class:`~flask_restless.advisor.IndexAdvisor` on
+        which the columns filtered and sorted on by each search are recorded,
+        or ``None`` if they should not be recorded.
+
+        `cost_guard` is a :class:`~flask_restless.guard.CostGuard` which checks
+        the plan of each search query before it is executed, or ``None`` if
+        searches should not be checked. Searches it rejects receive a
+        :http:statuscode:`400` response.
+
+        `relation_loading` is a dictionary mapping the name of a relation of
+        `model` to the name of the strategy with which it is loaded when it is
+        included in a response, one of the keys of :data:`RELATION_LOADERS`.
+        Relations which are not in this dictionary are loaded with the
+        :data:`DEFAULT_RELATION_LOADING` strategy.
+
+        If `shallow` is ``True``, the JSON representations of instances include
+        only the relations which the client names in the ``include`` query
+        parameter. Otherwise they include all relations unless the client
+        names some of them.
+
+        `response_cache` is a :class:`~flask_restless.cache.ResponseCache` in
+        which the bodies of successful responses to :http:method:`get`
+        requests are stored and from which identical requests are answered, or
+        ``None`` if responses should not be cached.
+
+        `response_caches` is the list of all
+        :class:`~flask_restless.cache.ResponseCache` objects which must be
+        invalidated when this API writes to the database, so that no API
+        serves responses made stale by the write.
+
+        `response_cache_key` is a function which takes no arguments and
+        returns a string identifying the variant of the response to the
+        current request which is not determined by the request itself (for
+        example, the name of the current user, if the
+        ``get_result_postprocessor`` removes the fields which that user may
+        not see). The string is part of the keys of responses in
+        `response_cache`. If it is ``None``, the response to a request is the
+        same for all users.
+
+        `version_column` is the name of a column of `model` whose value changes
+        whenever an instance is updated, like a version counter, and
+        `last_modified_column` is the name of a column of `model` holding the
+        date and time at which an instance was last updated. If either is
+        specified, the entity tag (and the ``Last-Modified`` header, for
+        `last_modified_column`) of a response containing a single instance
+        without related instances is computed from those columns alone, so
+        conditional requests for an unmodified instance are answered without
+        loading the whole instance. Otherwise, entity tags are computed from
+        the body of the response.
+
+        `serializer` is the :class:`~flask_restless.serializer.Serializer`
+        which converts instances of `model` to dictionaries. If it is
+        ``None``, the serializer returned by
+        :func:`~flask_restless.serializer.serializer_for` is used.
+
+        `read_mode` is one of :data:`READ_MODES`, and determines whether the
+        results of searches which include no relations are read as instances
+        of `model` or as rows of only the needed columns.
+
+        `encoder` is the object whose ``encode(obj)`` method returns the JSON
+        string which is the body of each response, like
+        :class:`~flask_restless.encoding.JSONEncoder`. If it is ``None``,
+        :data:`~flask_restless.encoding.DEFAULT_ENCODER` is used.
+
+        `compressor` is the :class:`~flask_restless.compression.Compressor`
+        which compresses the bodies of responses to :http:method:`get`
+        requests made to this API, before their entity tags are computed and,
+        if `response_cache` is specified, before they are stored in the cache.
+        If it is ``None``, responses are not compressed by this view.
+
+        If `allow_post_many` is ``True``, the body of a :http:method:`post`
+        request may be a list of objects, each of which creates an instance
+        (see :meth:`_post_many`). If `post_chunk_size` is not ``None``, such a
+        request commits the created instances in chunks of that many instances
+        instead of in a single transaction.
+
+        If `paginate_related_collections` is ``True``, the related instances
+        requested from the endpoint of a one-to-many relation are searched and
+        paginated like the instances of the collection (see
+        :meth:`_get_child_relation`).
+
         .. versionadded:: 0.6
            Added the `results_per_page` keyword argument.
 
@@ -510,7 +870,7 @@ class API(ModelView):
            `authentication_function` keyword arguments.
 
         """
-        super(API, self).__init__(session, model, *args, **kw)
+        super(API, self).__init__(session, model, encoder, *args, **kw)
         self.authentication_required_for = authentication_required_for or ()
         self.authentication_function = authentication_function
         # convert HTTP method names to uppercase
@@ -530,8 +890,51 @@ class API(ModelView):
         self.delete_form_postprocessor = delete_form_postprocessor
         self.get_result_postprocessor = get_result_postprocessor
         self.get_request_preprocessor = get_request_preprocessor
+        self.keyset_pagination = keyset_pagination
+        self.count_strategy = count_strategy
+        self.count_cache = count_cache
+        self.stream_results = stream_results
+        self.plan_cache = plan_cache
+        self.relation_strategy = relation_strategy
+        self.normalize_filters = normalize_filters
+        self.index_advisor = index_advisor
+        self.cost_guard = cost_guard
+        self.relation_loading = relation_loading or {}
+        self.shallow = shallow
+        self.response_cache = response_cache
+        self.response_caches = response_caches or ()
+        self.response_cache_key = response_cache_key
+        self.version_column = version_column
+        self.last_modified_column = last_modified_column
+        self.serializer = serializer or serializer_for(model)
+        self.read_mode = read_mode
+        self.compressor = compressor
+        self.allow_post_many = allow_post_many
+        self.post_chunk_size = post_chunk_size
+        self.paginate_related_collections = paginate_related_collections
+        # the names of the columns of the rows selected by the search of the
+        # current request, if it reads rows instead of instances
+        self._row_columns = None
+
+    def _get_child_relation(self, instid, relation, search_data=None):
+        """Returns a JSONified response containing the instances related to
+        the instance of the model with the specified primary key by the
+        one-to-many relation named `relation`.
+
+        The related model is queried directly, with a filter selecting the
+        children of the parent instance. By default, the response contains
+        all of them, without their relations, as ``objects``.
+
+        If `paginate_related_collections` was specified in the constructor of
+        this class, the client can instead search, sort, and page through the
+        children with the same query parameters as the collection endpoint
+        (see :meth:`_search`), and only the rows on the requested page are
+        loaded. In that case, the response is a page of results, and the
+        foreign key columns which refer to the parent are not included in it.
+
+        `search_data` is as described in :meth:`_search`.
 
-    def _get_child_relation(self, instid, relation):
+        """
         instance = self._get_by(instid)
         if instance is None:
             abort(404)
@@ -541,13 +944,33 @@ class API(ModelView):
         if not isinstance(relationproperty, RelationshipProperty) \
            or not relationproperty.direction == ONETOMANY:
             abort(404)
-        newexclude = (key.name for key in relationproperty.remote_side)
-        # get the related value so we can see if it is None or a list
-        relatedvalue = getattr(instance, relation)
-        if relatedvalue is None:
-            abort(404)
-        result = [_to_dict(inst, exclude=newexclude) for inst in relatedvalue]
-        return jsonify(objects=result)
+        childmodel = relationproperty.mapper.class_
+        if not self.paginate_related_collections:
+            query = self.query(childmodel)
+            query = query.filter(with_parent(instance, relation))
+            if relationproperty.order_by:
+                query = query.order_by(*relationproperty.order_by)
+            result = serializer_for(childmodel).many(query)
+            return self._jsonify(objects=result)
+        parentkeys = [key.name for key in relationproperty.remote_side]
+        include = [name for name in _get_columns(childmodel)
+                   if name not in parentkeys]
+        # the settings of this API which concern searching also apply to the
+        # search of the related instances, but the counts of the related
+        # instances are not cached, since they depend on the parent instance
+        childview = API(self.session, childmodel, include_columns=include,
+                        results_per_page=self.results_per_page,
+                        keyset_pagination=self.keyset_pagination,
+                        count_strategy=self.count_strategy,
+                        stream_results=self.stream_results,
+                        plan_cache=self.plan_cache,
+                        relation_strategy=self.relation_strategy,
+                        normalize_filters=self.normalize_filters,
+                        index_advisor=self.index_advisor,
+                        cost_guard=self.cost_guard, shallow=True,
+                        read_mode=self.read_mode, encoder=self.encoder)
+        return childview._search(search_data,
+                                 with_parent(instance, relation))
 
     def _add_to_relation(self, query, relationname, toadd=None):
         """Adds a new or existing related model to each model specified by
@@ -663,11 +1086,13 @@ class API(ModelView):
             self._remove_from_relation(query, columnname, toremove=toremove)
         return tochange
 
-    def _handle_validation_exception(self, exception):
+    def _handle_validation_exception(self, exception, **kw):
         """Rolls back the session, extracts validation error messages, and
-        returns a :func:`flask.jsonify` response with :http:statuscode:`400`
+        returns a JSON response with :http:statuscode:`400`
         containing the extracted validation error messages.
 
+        Any keyword arguments are included in the response as well.
+
         Again, *this method calls
         :meth:`sqlalchemy.orm.session.Session.rollback`*.
 
@@ -675,7 +1100,7 @@ class API(ModelView):
         self.session.rollback()
         errors = self._extract_error_messages(exception) or \
             'Could not determine specific validation errors'
-        return jsonify_status_code(400, validation_errors=errors)
+        return self._jsonify_status_code(400, validation_errors=errors, **kw)
 
     def _extract_error_messages(self, exception):
         """Tries to extract a dictionary mapping field name to validation error
@@ -732,7 +1157,108 @@ class API(ModelView):
                 result[fieldname] = value
         return result
 
-    def _search(self, search_data):
+    def _fields(self):
+        """Returns the list of names of the fields of the model which will be
+        included in the JSON representations of instances in the response to
+        the current request, or ``None`` if all of them will be included.
+
+        If the client has specified a comma-separated list of field names in
+        the ``fields`` query parameter, this is that list, restricted to the
+        ``include_columns`` specified in the constructor of this class (if
+        any). Otherwise it is ``include_columns`` itself.
+
+        """
+        fields = request.args.get('fields')
+        if fields is None:
+            return self.include_columns
+        fields = [field.strip() for field in fields.split(',')]
+        if self.include_columns is not None:
+            fields = [f for f in fields if f in self.include_columns]
+        return fields
+
+    def _deep(self, include):
+        """Returns the dictionary defining the depth of submodels to output in
+        the JSON representations of instances of the model (see
+        :func:`_to_dict`), following only the relations named in `include` if
+        it is not ``None``.
+
+        If the client has specified a comma-separated list of relation names in
+        the ``include`` query parameter, only those relations are followed.
+        Otherwise, all relations are followed unless `shallow` was specified in
+        the constructor of this class, in which case none are.
+
+        """
+        relations = _get_relations(self.model)
+        # do no follow relations that will not be included in the response
+        if include is not None:
+            relations = [r for r in relations if r in include]
+        requested = request.args.get('include')
+        if requested is not None:
+            requested = [name.strip() for name in requested.split(',')]
+            relations = [r for r in relations if r in requested]
+        elif self.shallow:
+            relations = []
+        return dict((r, {}) for r in relations)
+
+    def _column_options(self, include, deep, keep=()):
+        """Returns a list of query options which defer loading each column of
+        the model which will not be included in the response.
+
+        `include` is the list of names of the fields to include, as returned
+        by :meth:`_fields`. If it is ``None``, no column is deferred.
+
+        `deep` is the dictionary of relations to follow, as returned by
+        :meth:`_deep`. The columns on which those relations depend are not
+        deferred, since loading the related instances requires them.
+
+        `keep` is an iterable of names of additional columns which must not be
+        deferred. Primary key columns are never deferred.
+
+        """
+        if include is None:
+            return []
+        mapper = class_mapper(self.model)
+        needed = set(include) | set(keep)
+        needed.update(mapper.get_property_by_column(column).key
+                      for column in mapper.primary_key)
+        for relation in deep:
+            # the local side of a many-to-many relation also includes columns
+            # of the related table, which are not mapped by this model
+            for column in mapper.get_property(relation).local_side:
+                if column in mapper._columntoproperty:
+                    needed.add(mapper.get_property_by_column(column).key)
+        return [defer(prop.key) for prop in mapper.iterate_properties
+                if isinstance(prop, ColumnProperty) and prop.key not in needed]
+
+    def _relation_options(self, deep):
+        """Returns a list of query options which load the relations in `deep`
+        along with the instances of the model, as specified by the
+        `relation_loading` argument to the constructor of this class.
+
+        Dynamic relations are always loaded when they are accessed, so no
+        option is returned for them.
+
+        """
+        return [RELATION_LOADERS[strategy](relation)
+                for relation, strategy in self._relation_strategies(deep)]
+
+    def _relation_strategies(self, deep):
+        """Returns the list of pairs of names of the relations in `deep` which
+        are loaded along with the instances of the model and the strategies
+        with which they are loaded (see :meth:`_relation_options`).
+
+        """
+        mapper = class_mapper(self.model)
+        strategies = []
+        for relation in deep:
+            if mapper.get_property(relation).lazy == 'dynamic':
+                continue
+            strategy = self.relation_loading.get(relation,
+                                                 DEFAULT_RELATION_LOADING)
+            strategies.append((relation, strategy))
+        return strategies
+
+    def _search(self, search_data, criterion=None):
         """Defines a generic search function for the database model.
 
         If the query string is empty, or if the specified query is invalid for
@@ -799,6 +1325,10 @@ class API(ModelView):
 
         `search_data` parameter is used to override user entered search
         criteria in get_request_preprocessor.
+
+        `criterion` is an optional SQLAlchemy expression which is applied as
+        an additional filter to the search, regardless of the search
+        parameters.
         """
         if search_data:
             data = search_data
@@ -807,41 +1337,130 @@ class API(ModelView):
             try:
                 data = json.loads(request.args.get('q', '{}'))
             except (TypeError, ValueError, OverflowError):
-                return jsonify_status_code(400, message='Unable to decode data')
+                return self._jsonify_status_code(
+                    400, message='Unable to decode data')
+
+        # columns of collections may be written in formats other than JSON
+        fmt = None
+        if not data.get('single'):
+            fmt = requested_format(request)
+        if fmt is not None:
+            response = self._format_error(fmt)
+            if response is not None:
+                return response
+        # the page number is ignored by keyset pagination, except for formats
+        pages = fmt is not None or not self.keyset_pagination
+        if not data.get('single') and self.paginate and pages and \
+                self._page_number() is None:
+            return self._jsonify_status_code(400,
+                                             message='Invalid page number')
 
         # perform a filtered search
         try:
-            result = search(self.session, self.model, data)
+            search_params = SearchParameters.from_dictionary(data)
+            # the client's limit and offset are applied after all filters,
+            # together with the page window in _paginated or below for a
+            # single result, so strip them from the query here
+            queryparams = SearchParameters(search_params.filters,
+                                           order_by=search_params.order_by)
+            query = create_query(self.session, self.model, queryparams,
+                                 self.plan_cache, self.relation_strategy,
+                                 self.normalize_filters, self.index_advisor)
+            if criterion is not None:
+                query = query.filter(criterion)
+            include = self._fields()
+            # tabular formats contain no relations
+            deep = self._deep(include) if fmt is None else {}
+            # the ordering fields are needed to create keyset cursors
+            keep = [o.field for o in search_params.order_by]
+            if self.read_mode == 'core' and not deep:
+                query = self._select_columns(query, include, keep)
+            else:
+                options = self._column_options(include, deep, keep)
+                query = query.options(*options)
+            # eager loading cannot be combined with fetching rows in batches
+            if self._row_columns is None and \
+                    (self.paginate or not self.stream_results):
+                query = query.options(*self._relation_options(deep))
+                # the query which loads relations by subquery repeats the
+                # limited query, so the order of its rows must be unique for
+                # it to select the same page (keyset pagination does this)
+                strategies = dict(self._relation_strategies(deep))
+                pk_name = _primary_key_name(self.model)
+                if 'subquery' in strategies.values() and \
+                        pk_name not in keep and \
+                        not (self.paginate and self.keyset_pagination):
+                    pk = getattr(self.model, pk_name)
+                    query = query.order_by(pk.asc())
+            if self.cost_guard is not None:
+                self.cost_guard.check(self.session, self.model, query,
+                                      queryparams)
+            if data.get('single'):
+                if search_params.offset:
+                    query = query.offset(search_params.offset)
+                if search_params.limit:
+                    query = query.limit(search_params.limit)
+                result = query.one()
+                if self._row_columns is not None:
+                    result = self.serializer.rows([result],
+                                                  self._row_columns)[0]
+                else:
+                    result = self.serializer(result, deep, include)
+        except ContradictionError:
+            # no instance can match, so there is no need to query the database
+            if data.get('single'):
+                return self._jsonify(message='No result found')
+            query = None
+        except QueryTooExpensive, exception:
+            message = 'Query too expensive'
+            return self._jsonify_status_code(400, message=message,
+                                             tables=exception.tables)
+        except ExplainError:
+            # the search may be valid, but its cost cannot be checked
+            message = 'Unable to check the cost of the query'
+            return self._jsonify_status_code(500, message=message)
         except NoResultFound:
-            return jsonify(message='No result found')
+            return self._jsonify(message='No result found')
         except MultipleResultsFound:
-            return jsonify(message='Multiple results found')
+            return self._jsonify(message='Multiple results found')
         except:
-            return jsonify_status_code(400,
-                                       message='Unable to construct query')
-
-        # create a placeholder for the relations of the returned models
-        relations = _get_relations(self.model)
-        deep = dict((r, {}) for r in relations)
+            return self._jsonify_status_code(
+                400, message='Unable to construct query')
 
         # for security purposes, don't transmit list as top-level JSON
-        if isinstance(result, list):
-            return self._paginated(result, deep)
+        if not data.get('single'):
+            if fmt is not None:
+                return self._tabulated(query, fmt, search_params)
+            if query is None:
+                return self._empty()
+            return self._paginated(query, deep, search_params)
         else:
-            result = _to_dict_include(result, deep,
-                                      include=self.include_columns)
-            return jsonify(result)
+            return self._jsonify(result)
 
     # TODO it is ugly to have `deep` as an arg here; can we remove it?
-    def _paginated(self, instances, deep):
-        """Returns a paginated JSONified response from the specified list of
+    def _paginated(self, query, deep, search_params):
+        """Returns a paginated JSONified response from the specified query of
         model instances.
 
-        `instances` is a list of model instances.
+        `query` is a SQLAlchemy query which has no limit or offset applied.
+        Only the rows on the requested page are fetched from the database,
+        since the page window is applied to `query` as a ``LIMIT`` and
+        ``OFFSET`` clause.
 
         `deep` is the dictionary which defines the depth of submodels to output
-        in the JSON format of the model instances in `instances`; it is passed
-        directly to :func:`_to_dict_include`.
+        in the JSON format of the model instances in `query`; it is passed
+        directly to the serializer of the model.
+
+        `search_params` is the :class:`~flask_restless.search.SearchParameters`
+        object from which `query` was created. Its `limit` and `offset`, if not
+        ``None``, are the maximum number of results and the number of initial
+        results to skip as requested by the client. Pages are counted from the
+        beginning of the result set restricted in this way.
+
+        If keyset pagination is enabled, this method returns the response
+        created by :meth:`_keyset_paginated` instead, or a
+        :http:statuscode:`400` response if the client specified a limit or an
+        offset, which cannot be combined with cursors.
 
         The response data is JSON of the form:
 
@@ -849,24 +1468,461 @@ class API(ModelView):
 
            {
              "page": 2,
+             "num_results": 42,
+             "total_pages": 5,
              "objects": [{"id": 1, "name": "Jeffrey", "age": 24}, ...]
            }
 
+        The ``num_results`` and ``total_pages`` mappings are present unless
+        counting has been disabled (see the constructor of this class). If the
+        requested page is the last one, they are computed without any
+        additional query.
+
+        If the client requested the column-oriented layout, ``objects`` is
+        replaced by ``columns`` and ``rows`` (see :meth:`_page`).
+
+        """
+        if self.paginate and self.keyset_pagination:
+            if search_params.limit or search_params.offset:
+                message = 'Unable to use limit or offset with cursors'
+                return self._jsonify_status_code(400, message=message)
+            return self._keyset_paginated(query, deep, search_params.filters,
+                                          search_params.order_by)
+        if not self.paginate and self.stream_results:
+            return self._streamed(query, deep, search_params)
+        limit, offset = search_params.limit, search_params.offset
+        page_num, start, end = self._window(limit)
+        # the total number of matching rows, if it is computed along the way
+        total = None
+        if end is not None and end <= start:
+            instances = []
+        else:
+            pagequery = query.offset((offset or 0) + start or None)
+            if end is not None:
+                pagequery = pagequery.limit(end - start)
+            if self.count_strategy == 'window':
+                count = func.count().over()
+                rows = self._fetch(pagequery.add_columns(count))
+                instances = rows
+                if self._row_columns is None:
+                    instances = [row[0] for row in rows]
+                if rows:
+                    # rows read without the ORM cannot be indexed from the end
+                    total = tuple(rows[0])[-1]
+            else:
+                instances = self._fetch(pagequery)
+        result = self._page(instances, deep)
+        result['page'] = page_num
+        if self.count_strategy:
+            # if this is the last page, there is no need to count the results
+            num_results = None
+            if end is None or start + len(instances) < end:
+                if instances or start == 0:
+                    num_results = start + len(instances)
+            if num_results is None:
+                if total is None:
+                    total = self._count(query, search_params.filters)
+                num_results = max(total - (offset or 0), 0)
+                if limit:
+                    num_results = min(num_results, limit)
+            result.update(self._totals(num_results))
+        return self._jsonify(result)
+
+    def _window(self, limit):
+        """Returns a three-tuple containing the number of the page requested by
+        the client (the first page is page 1), and the indices of the first
+        result on that page and of the result after the last one, or ``None``
+        if there is no last one.
+
+        The indices are counted from the beginning of the results of the
+        search, after its offset, and the page window is restricted to the
+        first `limit` results if `limit` is not ``None``.
+
         """
         if self.paginate:
-            # get the page number (first page is page 1)
-            page_num = int(request.args.get('page', 1))
+            page_num = self._page_number()
             start = (page_num - 1) * self.results_per_page
-            end = min(len(instances), start + self.results_per_page)
+            end = start + self.results_per_page
         else:
             page_num = 1
             start = 0
-            end = len(instances)
-        objects = [_to_dict_include(x, deep, include=self.include_columns)
-                   for x in instances[start:end]]
+            end = None
+        # restrict the page window to the limit specified by the client
+        if limit:
+            end = limit if end is None else min(end, limit)
+        return page_num, start, end
+
+    def _page_number(self):
+        """Returns the number of the page requested by the client in the
+        ``page`` query parameter (the first page is page 1), or ``None`` if
+        the parameter is not a positive integer.
+
+        """
+        try:
+            page_num = int(request.args.get('page', 1))
+        except ValueError:
+            return None
+        return page_num if page_num > 0 else None
+
+    def _format_error(self, name):
+        """Returns a :http:statuscode:`406` response if the format with the
+        specified name cannot be written by this API, or ``None`` if it can.
+
+        Formats are refused if they are unknown or unavailable (see
+        :func:`~flask_restless.formats.writer`), or if a
+        ``get_result_postprocessor`` was specified in the constructor of this
+        class, since the postprocessor, which may remove fields which clients
+        must not see, expects dictionaries rather than columns.
+
+        """
+        try:
+            writer(name)
+        except FormatError, exception:
+            return self._jsonify_status_code(406, message=str(exception))
+        if self.get_result_postprocessor:
+            message = 'The %s format is not available' % name
+            return self._jsonify_status_code(406, message=message)
+        return None
+
+    def _tabulated(self, query, name, search_params=None):
+        """Returns a response which streams the columns of the instances (or
+        rows) selected by `query` in the format with the specified name (see
+        :mod:`flask_restless.formats`), or only the header of that format if
+        `query` is ``None``.
+
+        If `search_params` is not ``None``, only the instances on the page
+        requested by the client are written, as for :meth:`_paginated`.
+        Otherwise, `query` is written in full.
+
+        The columns are those which would be included in the JSON
+        representations of the instances; relations are never included. This
+        is never called if there is a ``get_result_postprocessor`` (see
+        :meth:`_format_error`).
+
+        """
+        write = writer(name)
+        if query is not None and search_params is not None:
+            offset = search_params.offset
+            page_num, start, end = self._window(search_params.limit)
+            if end is not None and end <= start:
+                query = None
+            else:
+                query = query.offset((offset or 0) + start or None)
+                if end is not None:
+                    query = query.limit(end - start)
+        rows = self._row_columns is not None
+        if rows:
+            columns = self._row_columns
+        else:
+            include = self._fields()
+            columns = [column for column in self.serializer.columns
+                       if include is None or column in include]
+
+        def generate():
+            if query is None:
+                results = []
+            elif rows:
+                results = self._execute(query)
+            else:
+                results = query.yield_per(FORMAT_BATCH_SIZE)
+            batches = (self.serializer.columnar(batch, columns, rows)
+                       for batch in _batches(results, FORMAT_BATCH_SIZE))
+            for chunk in write(self.model, columns, batches):
+                yield chunk
+
+        if stream_with_context is not None:
+            generate = stream_with_context(generate)
+        response = current_app.response_class(generate(),
+                                              mimetype=FORMATS[name])
+        # the format may have been negotiated from the Accept header
+        response.vary.add('Accept')
+        return response
+
+    def _empty(self):
+        """Returns a JSONified response to a search which matches no
+        instances, of the same form as the one returned by :meth:`_paginated`,
+        without querying the database.
+
+        """
+        result = self._page([], self._deep(self._fields()))
+        if self.paginate and self.keyset_pagination:
+            result['next_cursor'] = None
+        else:
+            result['page'] = self._page_number() if self.paginate else 1
+        if self.count_strategy:
+            result.update(self._totals(0))
+        return self._jsonify(result)
+
+    def _streamed(self, query, deep, search_params):
+        """Returns a response which streams the JSON representation of all the
+        model instances in `query`, for use when pagination is disabled.
+
+        Instances are fetched from the database in batches of
+        :data:`STREAM_BATCH_SIZE` rows and each batch is serialized and sent
+        to the client before the next one is fetched, so memory usage does not
+        grow with the number of results. If a ``get_result_postprocessor``
+        was specified in the constructor of this class, it is called on the
+        list of dictionaries of each batch.
+
+        `query`, `deep`, and `search_params` are as described in
+        :meth:`_paginated`, and the response data has the same form. The
+        response is always JSON, even if the client requested MessagePack,
+        since the length of the list of objects, which MessagePack writes
+        before the objects, is not known until they have all been sent.
+
+        """
+        query = query.offset(search_params.offset or None)
+        if search_params.limit:
+            query = query.limit(search_params.limit)
+        if self._row_columns is None:
+            query = query.yield_per(STREAM_BATCH_SIZE)
+        else:
+            # rows are fetched from the cursor as they are iterated over
+            query = self._execute(query)
+        postprocessor = self.get_result_postprocessor
+        encode = self.encoder.encode
+        columnar = self._columnar()
+        if columnar:
+            header = self._table([], deep)[0]
+            start = '{"page":1,"columns":%s,"rows":[' % encode(header)
+        else:
+            start = '{"page":1,"objects":['
+
+        def serialize(batch):
+            if columnar:
+                return self._table(batch, deep)[1]
+            objects = self._serialize(batch, deep)
+            if postprocessor:
+                postprocessor(objects)
+            return objects
+
+        def generate():
+            yield start
+            # the postprocessor may remove objects, so only those which are
+            # actually sent are counted
+            num_results = 0
+            for batch in _batches(query, STREAM_BATCH_SIZE):
+                objects = serialize(batch)
+                if not objects:
+                    continue
+                separator = ',' if num_results else ''
+                yield separator + ','.join(encode(x) for x in objects)
+                num_results += len(objects)
+            if self.count_strategy:
+                totals = self._totals(num_results)
+                yield '],%s}' % encode(totals)[1:-1]
+            else:
+                yield ']}'
+
+        if stream_with_context is not None:
+            generate = stream_with_context(generate)
+        response = current_app.response_class(generate(),
+                                              mimetype='application/json')
+        # clients may ask for tabular formats instead in the Accept header
+        response.vary.add('Accept')
+        return response
+
+    def _select_columns(self, query, include, keep=()):
+        """Returns `query` changed to select only the columns of the model
+        needed for the response, instead of instances of the model, so that
+        the results are read as rows (see :meth:`_fetch`).
+
+        `include` is the list of names of the fields to include, as returned
+        by :meth:`_fields`, or ``None`` to include all columns. `keep` is an
+        iterable of names of additional columns which must be selected, after
+        the included ones. The primary key is always selected.
+
+        """
+        columns = self.serializer.columns
+        if include is not None:
+            columns = [name for name in columns if name in include]
+        extra = [name for name in keep if name not in columns]
+        extra.append(_primary_key_name(self.model))
+        self._row_columns = columns
+        selected = columns + [name for name in self.serializer.columns
+                              if name in extra and name not in columns]
+        # label the columns with the names of their attributes, so that the
+        # attributes of the rows are named as those of the instances are
+        labels = [getattr(self.model, name).label(name) for name in selected]
+        return query.with_entities(*labels)
+
+    def _execute(self, query):
+        """Executes the SQL statement of `query` in the session of this view,
+        bypassing the ORM, and returns the result.
+
+        """
+        return self.session.execute(query.statement,
+                                    mapper=class_mapper(self.model))
+
+    def _fetch(self, query):
+        """Returns the list of instances of the model selected by `query`,
+        or the list of rows selected by it if the search of the current
+        request reads rows (see :meth:`_select_columns`).
+
+        """
+        if self._row_columns is None:
+            return query.all()
+        return self._execute(query).fetchall()
+
+    def _serialize(self, instances, deep):
+        """Returns the list of dictionary representations of `instances`,
+        the instances or rows returned by :meth:`_fetch`, following the
+        relations specified by `deep`.
+
+        """
+        if self._row_columns is None:
+            return self.serializer.many(instances, deep, self._fields())
+        return self.serializer.rows(instances, self._row_columns)
+
+    def _columnar(self):
+        """Returns ``True`` if the client requested the column-oriented layout
+        of pages of results, by setting the ``layout`` query parameter to
+        ``columns``.
+
+        Pages are never laid out in columns if a ``get_result_postprocessor``
+        was specified in the constructor of this class, since it expects the
+        list of dictionary representations of the instances.
+
+        """
+        return request.args.get('layout') == 'columns' and \
+            not self.get_result_postprocessor
+
+    def _table(self, instances, deep):
+        """Returns the table representation of `instances`, the instances or
+        rows returned by :meth:`_fetch`, following the relations specified by
+        `deep`, as described in
+        :meth:`~flask_restless.serializer.Serializer.table`.
+
+        """
+        if self._row_columns is None:
+            return self.serializer.table(instances, deep, self._fields())
+        return self.serializer.row_table(instances, self._row_columns)
+
+    def _page(self, instances, deep):
+        """Returns the dictionary containing the representations of
+        `instances`, the instances or rows on a page of results returned by
+        :meth:`_fetch`, following the relations specified by `deep`.
+
+        The dictionary maps ``objects`` to the list of the dictionary
+        representations of the instances, after the
+        ``get_result_postprocessor`` (if any) has been called on it. If the
+        client requested the column-oriented layout (see :meth:`_columnar`),
+        it instead maps ``columns`` and ``rows`` to the header and rows of the
+        table representation of the instances (see :meth:`_table`).
+
+        """
+        if self._columnar():
+            columns, rows = self._table(instances, deep)
+            return dict(columns=columns, rows=rows)
+        objects = self._serialize(instances, deep)
         if self.get_result_postprocessor:
             self.get_result_postprocessor(objects)
-        return jsonify(page=page_num, objects=objects)
+        return dict(objects=objects)
+
+    def _count(self, query, filters):
+        """Returns the number of instances matched by `query`, which has no
+        limit or offset applied.
+
+        If a count cache was specified in the constructor of this class, the
+        count is stored there, keyed on `filters`, and subsequent searches with
+        the same filters return the stored count until it expires.
+
+        `filters` is the list of :class:`~flask_restless.search.Filter`
+        objects from which `query` was created.
+
+        """
+        if self.count_cache is None:
+            return query.order_by(None).count()
+        key = _filters_key(filters)
+        total = self.count_cache.get(key)
+        if total is None:
+            total = query.order_by(None).count()
+            self.count_cache.set(key, total)
+        return total
+
+    def _totals(self, num_results):
+        """Returns a dictionary containing the ``num_results`` and
+        ``total_pages`` mappings for a paginated response over `num_results`
+        instances.
+
+        """
+        if self.paginate:
+            per_page = float(self.results_per_page)
+            total_pages = int(math.ceil(num_results / per_page))
+        else:
+            total_pages = 1
+        return dict(num_results=num_results, total_pages=total_pages)
+
+    def _keyset_paginated(self, query, deep, filters, order_by):
+        """Returns a JSONified response containing the page of model instances
+        from `query` which follows the position given by the ``cursor`` query
+        parameter of the request.
+
+        Instead of skipping the instances on previous pages with an ``OFFSET``
+        clause, the page is selected by a filter on the ordering fields (see
+        :func:`~flask_restless.search.create_keyset_filter`), so each page
+        costs the same regardless of how deep into the result set it is. The
+        primary key is appended to `order_by` to make the ordering unique.
+
+        `query` is a SQLAlchemy query which has no limit or offset applied.
+
+        `deep` is passed directly to the serializer of the model.
+
+        `filters` is the list of :class:`~flask_restless.search.Filter`
+        objects which were applied to `query`.
+
+        `order_by` is the list of :class:`~flask_restless.search.OrderBy`
+        objects which were applied to `query`.
+
+        The response data is JSON of the form:
+
+        .. sourcecode:: javascript
+
+           {
+             "next_cursor": "WzEwXQ==",
+             "num_results": 42,
+             "total_pages": 5,
+             "objects": [{"id": 1, "name": "Jeffrey", "age": 24}, ...]
+           }
+
+        where ``next_cursor`` is ``null`` on the last page. The
+        ``num_results`` and ``total_pages`` mappings are present unless
+        counting has been disabled (see the constructor of this class).
+
+        """
+        countquery = query
+        pk_name = _primary_key_name(self.model)
+        order_by = list(order_by)
+        if pk_name not in [o.field for o in order_by]:
+            order_by.append(OrderBy(pk_name))
+            query = query.order_by(getattr(self.model, pk_name).asc())
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                values = _decode_cursor(self.model, cursor, order_by)
+            except (TypeError, ValueError, OverflowError):
+                return self._jsonify_status_code(
+                    400, message='Unable to decode cursor')
+            bind = self.session.get_bind(mapper=class_mapper(self.model))
+            nulls_last = bind.dialect.name in NULLS_LAST_DIALECTS
+            keyset = create_keyset_filter(self.model, order_by, values,
+                                          nulls_last)
+            query = query.filter(keyset)
+        # fetch one extra row to find out whether there is a next page
+        instances = self._fetch(query.limit(self.results_per_page + 1))
+        next_cursor = None
+        if len(instances) > self.results_per_page:
+            instances = instances[:self.results_per_page]
+            last = instances[-1]
+            next_cursor = _encode_cursor([getattr(last, o.field)
+                                          for o in order_by])
+        result = self._page(instances, deep)
+        result['next_cursor'] = next_cursor
+        if self.count_strategy:
+            # the keyset filter must not be counted, so use the original query
+            total = self._count(countquery, filters)
+            result.update(self._totals(total))
+        return self._jsonify(result)
 
     def _check_authentication(self):
         """If the specified HTTP method requires authentication (see the
@@ -918,21 +1974,259 @@ class API(ModelView):
         search_data = None
         if self.get_request_preprocessor:
             instid, relation, search_data = self.get_request_preprocessor(instid, relation, request)
+        etag = last_modified = None
+        # the columns of an instance do not change when its related instances
+        # change, so they identify only representations without relations
+        if instid is not None and relation is None and \
+                (self.version_column or self.last_modified_column) and \
+                not self._deep(self._fields()):
+            etag, last_modified = self._instance_version(instid)
+            if self._unmodified(etag, last_modified):
+                response = current_app.response_class(status=304)
+                response.vary.update(('Accept', 'Accept-Encoding'))
+                return self._conditional(response, etag, last_modified)
+        key = encoded_key = None
+        # responses in other formats are streamed, so they are not cached
+        if self.response_cache is not None and \
+                requested_format(request) is None:
+            mimetype = self._negotiate()[1]
+            key = self._response_key(relation, search_data, mimetype)
+            # compressed bodies are stored along with uncompressed ones, so
+            # that they are not compressed again for each request
+            encoding = None
+            if self.compressor is not None:
+                encoding = self.compressor.encoding()
+            if encoding is not None:
+                encoded_key = self._response_key(relation, search_data,
+                                                 mimetype, encoding)
+                body = self.response_cache.get(encoded_key)
+                if body is not None:
+                    response = current_app.response_class(body,
+                                                          mimetype=mimetype)
+                    response.headers['Content-Encoding'] = encoding
+                    response.vary.update(('Accept', 'Accept-Encoding'))
+                    return self._conditional(response, etag, last_modified)
+            body = self.response_cache.get(key)
+            if body is not None:
+                response = current_app.response_class(body, mimetype=mimetype)
+                response.vary.add('Accept')
+                response = self._compress(response, encoded_key)
+                return self._conditional(response, etag, last_modified)
         if instid and relation:
-            return self._get_child_relation(instid, relation)
-        if instid is None:
-            return self._search(search_data)
-        inst = self._get_by(instid)
+            response = self._get_child_relation(instid, relation, search_data)
+        elif instid is None:
+            response = self._search(search_data)
+        else:
+            response = self._get_instance(instid)
+        # streamed responses cannot be stored without consuming them
+        if key is not None and response.status_code == 200 \
+                and response.is_sequence:
+            self.response_cache.set(key, response.data)
+        response = self._compress(response, encoded_key)
+        return self._conditional(response, etag, last_modified)
+
+    def _compress(self, response, key=None):
+        """Returns `response` with its body compressed by the compressor
+        specified in the constructor of this class, if any, as negotiated with
+        the client.
+
+        If `key` is not ``None`` and the complete body of the response was
+        compressed, the compressed body is stored under `key` in the response
+        cache of this view.
+
+        Responses to :http:method:`get` requests are compressed before their
+        entity tags are computed, so that representations with different
+        content codings have different entity tags.
+
+        """
+        if self.compressor is None:
+            return response
+        response = self.compressor.compress(response)
+        compressed = 'Content-Encoding' in response.headers
+        if key is not None and compressed and response.status_code == 200 \
+                and response.is_sequence:
+            self.response_cache.set(key, response.data)
+        return response
+
+    def _instance_version(self, instid):
+        """Returns a two-tuple containing the entity tag and the date of last
+        modification of the representation of the instance with the specified
+        primary key, computed from the version and last modified columns
+        specified in the constructor of this class, or responds with
+        :http:statuscode:`404` if there is no such instance.
+
+        Only those columns are selected from the database. The entity tag also
+        depends on the query parameters of the request, the negotiated MIME
+        type, and the negotiated content coding, since they determine the
+        representation. The date of last modification is ``None`` unless a
+        last modified column was specified.
+
+        """
+        names = [name for name in (self.version_column,
+                                   self.last_modified_column) if name]
+        columns = [getattr(self.model, name) for name in names]
+        query = self._query_by_primary_key(instid).with_entities(*columns)
+        row = query.first()
+        if row is None:
+            abort(404)
+        args = sorted(request.args.iteritems(multi=True))
+        mimetype = self._negotiate()[1]
+        encoding = None
+        if self.compressor is not None:
+            encoding = self.compressor.encoding()
+        variant = (tuple(row), args, mimetype, encoding)
+        etag = hashlib.sha1(repr(variant)).hexdigest()
+        last_modified = None
+        if self.last_modified_column:
+            last_modified = row[-1]
+            if not isinstance(last_modified, datetime.datetime):
+                last_modified = datetime.datetime.combine(last_modified,
+                                                          datetime.time())
+            elif last_modified.tzinfo is not None:
+                last_modified = last_modified.astimezone(tzutc())
+                last_modified = last_modified.replace(tzinfo=None)
+        return etag, last_modified
+
+    def _conditional(self, response, etag=None, last_modified=None):
+        """Adds a weak entity tag and, if `last_modified` is not ``None``, a
+        ``Last-Modified`` header to `response`, and changes it to a
+        :http:statuscode:`304` response if the client already has the current
+        representation, according to the ``If-None-Match`` and
+        ``If-Modified-Since`` headers of the request.
+
+        If `etag` is ``None``, the entity tag is computed from the body of
+        `response`. Responses to requests other than :http:method:`get`
+        requests, responses other than :http:statuscode:`200` and
+        :http:statuscode:`304` responses, and streamed responses are returned
+        unchanged.
+
+        """
+        if request.method not in ('GET', 'HEAD') or \
+                response.status_code not in (200, 304):
+            return response
+        if etag is None:
+            if not response.is_sequence:
+                return response
+            etag = hashlib.sha1(response.data).hexdigest()
+        if last_modified is not None:
+            # date headers have a resolution of one second
+            last_modified = last_modified.replace(microsecond=0)
+        if self._unmodified(etag, last_modified):
+            # the 304 response varies on the same headers as the full one
+            vary = response.vary
+            response = current_app.response_class(status=304)
+            response.vary.update(vary)
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        return response
+
+    def _unmodified(self, etag, last_modified):
+        """Returns ``True`` if and only if the client already has the
+        representation with the specified (unquoted) weak entity tag and date
+        of last modification, according to the conditional headers of the
+        current request.
+
+        As required by :rfc:`2616`, the ``If-Modified-Since`` header is ignored
+        if the ``If-None-Match`` header is present.
+
+        """
+        # this does not use werkzeug.http.is_resource_modified, which ignores
+        # If-None-Match headers containing only weak entity tags
+        if 'If-None-Match' in request.headers:
+            return request.if_none_match.contains_weak(etag)
+        since = request.if_modified_since
+        return since is not None and last_modified is not None and \
+            last_modified.replace(microsecond=0) <= since
+
+    def _get_instance(self, instid):
+        """Returns a JSONified response containing the representation of the
+        instance of the model with the specified primary key, or responds with
+        :http:statuscode:`404` if there is no such instance.
+
+        """
+        return self._jsonify(self._instance_dict(instid))
+
+    def _instance_dict(self, instid):
+        """Returns the dictionary representation of the instance of the model
+        with the specified primary key, as modified by the
+        ``get_result_postprocessor`` (if any), or responds with
+        :http:statuscode:`404` if there is no such instance.
+
+        """
+        include = self._fields()
+        deep = self._deep(include)
+        query = self._query_by_primary_key(instid)
+        options = self._column_options(include, deep)
+        options.extend(self._relation_options(deep))
+        inst = query.options(*options).first()
         if inst is None:
             abort(404)
-        relations = _get_relations(self.model)
-        # do no follow relations that will not be included in the response
-        followed_relations = relations if self.include_columns == None else set(relations) & set(self.include_columns)
-        deep = dict((r, {}) for r in followed_relations)
-        result = _to_dict_include(inst, deep, include=self.include_columns)
+        result = self.serializer(inst, deep, include)
         if self.get_result_postprocessor:
             self.get_result_postprocessor(result)
-        return jsonify(result)
+        return result
+
+    def _cached_tables(self, model=None):
+        """Returns the names of the tables on which responses of this API
+        concerning `model` (or ``self.model`` if not specified) depend: the
+        table of the model and the tables of its related models.
+
+        """
+        model = model or self.model
+        tables = set([class_mapper(model).mapped_table.name])
+        for relation in _get_relations(model):
+            related = _get_related_model(model, relation)
+            tables.add(class_mapper(related).mapped_table.name)
+        return tables
+
+    def _response_key(self, relation=None, search_data=None,
+                      mimetype='application/json', encoding=None):
+        """Returns the key under which the response to the current
+        :http:method:`get` request is stored in the response cache.
+
+        The key depends on `mimetype`, the MIME type of the body of the
+        response, on `encoding`, the content coding with which the body is
+        compressed (or ``None`` if it is not compressed), on the path and the
+        query parameters of the request, with the search parameters in ``q``
+        normalized so that equivalent searches share a key, on
+        `search_data`, the search parameters returned by the
+        ``get_request_preprocessor`` (if any), and on the string returned by
+        the `response_cache_key` function given in the constructor of this
+        class (if any). If `relation` is the name of a relation of the model,
+        the key also depends on the tables related to the model of that
+        relation.
+
+        """
+        args = []
+        for name, value in sorted(request.args.iteritems(multi=True)):
+            if name == 'q':
+                try:
+                    value = json.dumps(json.loads(value), sort_keys=True)
+                except (TypeError, ValueError, OverflowError):
+                    pass
+            args.append((name, value))
+        search_data = json.dumps(search_data, sort_keys=True)
+        variant = None
+        if self.response_cache_key is not None:
+            variant = self.response_cache_key()
+        tables = self._cached_tables()
+        if relation in _get_relations(self.model):
+            related = _get_related_model(self.model, relation)
+            tables |= self._cached_tables(related)
+        return self.response_cache.key(tables, mimetype, encoding,
+                                       request.path, args, search_data,
+                                       variant)
+
+    def _invalidate_responses(self):
+        """Invalidates the cached responses of all APIs which depend on the
+        tables this API writes to.
+
+        """
+        if self.response_caches:
+            tables = self._cached_tables()
+            for cache in self.response_caches:
+                cache.invalidate(tables)
 
     def delete(self, instid):
         """Removes the specified instance of the model with the specified name
@@ -950,15 +2244,16 @@ class API(ModelView):
                 self.delete_form_preprocessor(inst)
             self.session.delete(inst)
             self.session.commit()
+            self._invalidate_responses()
 
         result = None
         if self.delete_form_postprocessor:
             result = self.delete_form_postprocessor(instid)
 
         if result:
-            return jsonify_status_code(200, result)
+            return self._jsonify_status_code(200, result)
         else:
-            return jsonify_status_code(204)
+            return self._jsonify_status_code(204)
 
     def post(self):
         """Creates a new instance of a given model based on request data.
@@ -983,14 +2278,47 @@ class API(ModelView):
         self._check_authentication()
         # try to read the parameters for the model from the body of the request
         try:
-            params = json.loads(request.data)
+            params = self._load_body()
         except (TypeError, ValueError, OverflowError):
-            return jsonify_status_code(400, message='Unable to decode data')
+            return self._jsonify_status_code(
+                400, message='Unable to decode data')
+        if isinstance(params, list):
+            return self._post_many(params)
 
         # If post_form_preprocessor is specified, call it
         if self.post_form_preprocessor:
             self.post_form_preprocessor(params)
 
+        try:
+            instance = self._create(params)
+
+            # add the created model to the session
+            self.session.add(instance)
+            self.session.commit()
+            self._invalidate_responses()
+
+            pk_name = str(_primary_key_name(instance))
+            pk_value = getattr(instance, pk_name)
+            result = {pk_name: pk_value}
+            if self.post_form_postprocessor:
+                self.post_form_postprocessor(result)
+            return self._jsonify_status_code(201, **result)
+        except self.validation_exceptions, exception:
+            return self._handle_validation_exception(exception)
+
+    def _create(self, params, commit=True):
+        """Returns a new instance of the model initialized from the dictionary
+        `params`, which maps field names to values, as read from the body of
+        a :http:method:`post` request. The instance is not added to the
+        session.
+
+        Related instances are found, or created if they do not exist, from
+        the lists of dictionaries which `params` maps relation names to. This
+        happens only at the first level of nesting. Created related instances
+        are committed, unless `commit` is ``False``, in which case they are
+        only flushed (see :func:`_get_or_create`).
+
+        """
         # Getting the list of relations that will be added later
         cols = _get_columns(self.model)
         relations = _get_relations(self.model)
@@ -1004,32 +2332,96 @@ class API(ModelView):
         # date into an instance of the Python ``datetime`` object.
         params = self._strings_to_dates(params)
 
-        try:
-            # Instantiate the model with the parameters.
-            modelargs = dict([(i, params[i]) for i in props])
-            # HACK Python 2.5 requires __init__() keywords to be strings.
-            instance = self.model(**unicode_keys_to_strings(modelargs))
-
-            # Handling relations, a single level is allowed
-            for col in set(relations).intersection(paramkeys):
-                submodel = cols[col].mapper.class_
-                for subparams in params[col]:
-                    kw = unicode_keys_to_strings(subparams)
-                    subinst = _get_or_create(self.session, submodel, **kw)[0]
-                    getattr(instance, col).append(subinst)
+        # Instantiate the model with the parameters.
+        modelargs = dict([(i, params[i]) for i in props])
+        # HACK Python 2.5 requires __init__() keywords to be strings.
+        instance = self.model(**unicode_keys_to_strings(modelargs))
+
+        # Handling relations, a single level is allowed
+        for col in set(relations).intersection(paramkeys):
+            submodel = cols[col].mapper.class_
+            for subparams in params[col]:
+                kw = unicode_keys_to_strings(subparams)
+                subinst = _get_or_create(self.session, submodel, commit,
+                                         **kw)[0]
+                getattr(instance, col).append(subinst)
+        return instance
+
+    def _post_many(self, paramslist):
+        """Creates an instance of the model for each of the dictionaries in
+        `paramslist`, read from the body of a :http:method:`post` request,
+        and returns a :http:statuscode:`201` response containing the list of
+        their primary keys, in order, as ``objects``.
+
+        Each dictionary is passed to the ``post_form_preprocessor`` (if any)
+        and used to create an instance as described in :meth:`_create`, and
+        each result is passed to the ``post_form_postprocessor`` (if any), as
+        for a single instance.
+
+        The instances are written to the database in batches of
+        :data:`POST_BATCH_SIZE` instances (or `post_chunk_size`, if it was
+        specified in the constructor of this class), so that SQLAlchemy can
+        send the rows of a batch together, and instances which have been
+        written are removed from the session, so that the memory used does
+        not grow with the number of instances. All instances are committed in
+        a single transaction, unless `post_chunk_size` was specified, in which
+        case each batch is committed in its own transaction.
+
+        If a validation error occurs, the transaction in progress is rolled
+        back and the response contains the validation errors as for a single
+        instance, along with the primary keys of the instances which have
+        already been committed as ``objects``. These are the instances at the
+        start of `paramslist`, so the client can retry the remaining ones.
 
-            # add the created model to the session
-            self.session.add(instance)
-            self.session.commit()
+        """
+        if not self.allow_post_many:
+            return self._jsonify_status_code(
+                400, message='Unable to create multiple instances')
+        if not all(isinstance(params, dict) for params in paramslist):
+            return self._jsonify_status_code(
+                400, message='Unable to decode data')
+        pk_name = str(_primary_key_name(self.model))
+        batch_size = self.post_chunk_size or POST_BATCH_SIZE
+        # the primary keys of the committed instances, and of the instances
+        # written to the database in the transaction in progress
+        committed = []
+        written = []
+        batch = []
+
+        def write():
+            self.session.flush()
+            for instance in batch:
+                written.append({pk_name: getattr(instance, pk_name)})
+                self.session.expunge(instance)
+            del batch[:]
 
-            pk_name = str(_primary_key_name(instance))
-            pk_value = getattr(instance, pk_name)
-            result = {pk_name: pk_value}
-            if self.post_form_postprocessor:
-                self.post_form_postprocessor(result)
-            return jsonify_status_code(201, **result)
+        try:
+            for params in paramslist:
+                if self.post_form_preprocessor:
+                    self.post_form_preprocessor(params)
+                # related instances must not be committed before the batch
+                instance = self._create(params, commit=False)
+                self.session.add(instance)
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    write()
+                    if self.post_chunk_size:
+                        self.session.commit()
+                        committed.extend(written)
+                        del written[:]
+            write()
+            self.session.commit()
+            committed.extend(written)
         except self.validation_exceptions, exception:
-            return self._handle_validation_exception(exception)
+            if committed:
+                self._invalidate_responses()
+            return self._handle_validation_exception(exception,
+                                                     objects=committed)
+        self._invalidate_responses()
+        if self.post_form_postprocessor:
+            for result in committed:
+                self.post_form_postprocessor(result)
+        return self._jsonify_status_code(201, objects=committed)
 
     def patch(self, instid):
         """Updates the instance specified by ``instid`` of the named model, or
@@ -1051,10 +2443,11 @@ class API(ModelView):
 
         # try to load the fields/values to update from the body of the request
         try:
-            data = json.loads(request.data)
+            data = self._load_body()
         except (TypeError, ValueError, OverflowError):
             # this also happens when request.data is empty
-            return jsonify_status_code(400, message='Unable to decode data')
+            return self._jsonify_status_code(
+                400, message='Unable to decode data')
 
         # Remove data attributes which are not allowed to be set
         if self.patch_columns:
@@ -1070,8 +2463,8 @@ class API(ModelView):
                 # create a SQLALchemy Query from the query parameter `q`
                 query = create_query(self.session, self.model, data)
             except:
-                return jsonify_status_code(400,
-                                           message='Unable to construct query')
+                return self._jsonify_status_code(
+                    400, message='Unable to construct query')
         else:
             # create a SQLAlchemy Query which has exactly the specified row
             query = self._query_by_primary_key(instid)
@@ -1091,20 +2484,188 @@ class API(ModelView):
             if params:
                 num_modified = query.update(params, False)
             self.session.commit()
+            self._invalidate_responses()
         except self.validation_exceptions, exception:
             return self._handle_validation_exception(exception)
 
         if patchmany:
-            return jsonify(num_modified=num_modified)
+            return self._jsonify(num_modified=num_modified)
         else:
-            result = self.get(instid)
-            if result.data and self.patch_form_postprocessor:
-                # nasty solution but cleaner solution would require heavy refactoring of the code
-                data = json.loads(result.data)
-                self.patch_form_postprocessor(data)
-                result.data = json.dumps(data)
-            return result
+            result = self._instance_dict(instid)
+            if self.patch_form_postprocessor:
+                self.patch_form_postprocessor(result)
+            return self._jsonify(result)
 
     def put(self, instid):
         """Alias for :meth:`patch`."""
         return self.patch(instid)
+
+
+class ExportAPI(API):
+    """Provides a :http:method:`get` endpoint which streams all the instances
+    of a model matching a search, one JSON object per line.
+
+    This view takes the same arguments as :class:`API`. Relations are
+    included only if the client names them in the ``include`` query
+    parameter.
+
+    """
+
+    def __init__(self, *args, **kw):
+        """Calls the constructor of the superclass with the specified
+        arguments.
+
+        """
+        super(ExportAPI, self).__init__(*args, **kw)
+        self.shallow = True
+
+    def _checkpoint(self, column):
+        """Returns the value of the ``after`` query parameter of the request,
+        converted to an integer if `column` (the primary key column) is an
+        integer column, or ``None`` if there is no such parameter.
+
+        Raises :exc:`ValueError` if the value cannot be converted.
+
+        """
+        after = request.args.get('after')
+        if after is not None and isinstance(column.type, Integer):
+            after = int(after)
+        return after
+
+    def get(self):
+        """Returns a response which streams the JSON representation of each
+        instance of the model matching the search specified in the ``q`` query
+        parameter, as newline-delimited JSON.
+
+        Instances are sent in order of their primary key, so the ordering and
+        offset of the search are ignored. If the ``after`` query parameter is
+        specified, only instances whose primary key is greater than its value
+        are sent, so a client whose export was interrupted can resume it from
+        the primary key of the last instance it received. Instances are
+        fetched from the database in batches of :data:`STREAM_BATCH_SIZE` rows
+        through a server-side cursor, where the database supports one.
+
+        If the client requests a tabular format with the ``format`` query
+        parameter or the :http:header:`Accept` header, the columns of the
+        instances are written in that format instead (see :meth:`_tabulated`).
+
+        As for searches of the collection, if a ``get_request_preprocessor``
+        was specified in the constructor of this class, the search parameters
+        it returns (if any) replace those in the ``q`` query parameter, and if
+        a cost guard was specified, searches which it rejects receive an error
+        response before anything is sent.
+
+        """
+        self._check_authentication()
+        search_data = None
+        if self.get_request_preprocessor:
+            search_data = self.get_request_preprocessor(None, None,
+                                                        request)[2]
+        fmt = requested_format(request)
+        if fmt is not None:
+            response = self._format_error(fmt)
+            if response is not None:
+                return response
+        if search_data:
+            data = search_data
+        else:
+            try:
+                data = json.loads(request.args.get('q', '{}'))
+            except (TypeError, ValueError, OverflowError):
+                return self._jsonify_status_code(
+                    400, message='Unable to decode data')
+        pk_name = _primary_key_name(self.model)
+        column = getattr(self.model, pk_name)
+        try:
+            after = self._checkpoint(column.property.columns[0])
+        except ValueError:
+            return self._jsonify_status_code(
+                400, message='Unable to decode checkpoint')
+        try:
+            search_params = SearchParameters.from_dictionary(data)
+            queryparams = SearchParameters(search_params.filters)
+            query = create_query(self.session, self.model, queryparams,
+                                 self.plan_cache, self.relation_strategy,
+                                 self.normalize_filters, self.index_advisor)
+        except ContradictionError:
+            query = None
+        except:
+            return self._jsonify_status_code(
+                400, message='Unable to construct query')
+        if query is not None:
+            if after is not None:
+                query = query.filter(column > after)
+            query = query.order_by(column.asc())
+            if search_params.limit:
+                query = query.limit(search_params.limit)
+        include = self._fields()
+        # tabular formats contain no relations
+        deep = self._deep(include) if fmt is None else {}
+        if query is not None:
+            if self.read_mode == 'core' and not deep:
+                query = self._select_columns(query, include)
+            else:
+                query = query.options(*self._column_options(include, deep))
+        if query is not None and self.cost_guard is not None:
+            try:
+                self.cost_guard.check(self.session, self.model, query,
+                                      queryparams)
+            except QueryTooExpensive, exception:
+                message = 'Query too expensive'
+                return self._jsonify_status_code(400, message=message,
+                                                 tables=exception.tables)
+            except ExplainError:
+                message = 'Unable to check the cost of the query'
+                return self._jsonify_status_code(500, message=message)
+        if fmt is not None:
+            return self._tabulated(query, fmt)
+        return self._export(query, deep)
+
+    def _export(self, query, deep):
+        """Returns a streamed response containing the newline-delimited JSON
+        representations of the instances (or rows) selected by `query`, or an
+        empty response if `query` is ``None``.
+
+        If the client requested MessagePack (see :meth:`_negotiate`), the
+        response instead contains the MessagePack representations of the
+        instances, one after the other.
+
+        `deep` is passed directly to the serializer of the model.
+
+        """
+        encoder, mimetype = self._negotiate()
+        encode = encoder.encode
+        if encoder is self.encoder:
+            mimetype = 'application/x-ndjson'
+            separator = '\n'
+        else:
+            # MessagePack objects need no separator
+            separator = ''
+        postprocessor = self.get_result_postprocessor
+
+        def serialize(batch):
+            objects = self._serialize(batch, deep)
+            if postprocessor:
+                postprocessor(objects)
+            return ''.join(encode(x) + separator for x in objects)
+
+        def generate():
+            if query is None:
+                return
+            if self._row_columns is None:
+                # this also sets the stream_results execution option
+                results = query.yield_per(STREAM_BATCH_SIZE)
+            else:
+                statement = query.statement
+                statement = statement.execution_options(stream_results=True)
+                results = self.session.execute(
+                    statement, mapper=class_mapper(self.model))
+            for batch in _batches(results, STREAM_BATCH_SIZE):
+                yield serialize(batch)
+
+        if stream_with_context is not None:
+            generate = stream_with_context(generate)
+        response = current_app.response_class(generate(), mimetype=mimetype)
+        # clients may ask for other formats in the Accept header
+        response.vary.add('Accept')
+        return response
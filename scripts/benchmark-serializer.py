@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark-serializer
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Compares the time taken to convert a page of model instances to
+    dictionaries by the reflective
+    :func:`flask_restless.views._to_dict_include` function and by the
+    generated :class:`flask_restless.serializer.Serializer`.
+
+    Run it from the root of the repository::
+
+        python scripts/benchmark-serializer.py [number of instances]
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+"""
+import os
+import sys
+import timeit
+from datetime import date
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import Column
+from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy import create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from flask_restless.serializer import serializer_for
+from flask_restless.views import _to_dict_include
+
+Base = declarative_base()
+
+
+class Person(Base):
+    __tablename__ = 'person'
+    id = Column(Integer, primary_key=True)
+    name = Column(Unicode)
+    email = Column(Unicode)
+    age = Column(Integer)
+    height = Column(Float)
+    birth_date = Column(Date)
+    created = Column(DateTime)
+
+
+def main(count):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(Person(name=u'person%d' % i, email=u'%d@example.com' % i,
+                           age=i % 90, height=1.5 + i % 50 / 100.0,
+                           birth_date=date(1950 + i % 50, 1, 1),
+                           created=datetime(2012, 1, 1, i % 24))
+                    for i in xrange(count))
+    session.commit()
+    instances = session.query(Person).all()
+    serializer = serializer_for(Person)
+    include = ['id', 'name', 'birth_date']
+    cases = [('all columns', None), ('three columns', include)]
+    print('%d instances, best of 5 runs' % count)
+    for label, fields in cases:
+        reflective = min(timeit.repeat(
+            lambda: [_to_dict_include(x, include=fields) for x in instances],
+            number=1, repeat=5))
+        generated = min(timeit.repeat(
+            lambda: serializer.many(instances, include=fields),
+            number=1, repeat=5))
+        print('%-14s _to_dict_include: %7.1f ms  Serializer: %7.1f ms  '
+              '(%.1fx)' % (label, reflective * 1000, generated * 1000,
+                           reflective / generated))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
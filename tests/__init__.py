@@ -28,8 +28,15 @@
 from unittest2 import TestSuite
 from unittest2 import defaultTestLoader
 
+from . import test_advisor
+from . import test_cache
+from . import test_compression
+from . import test_encoding
+from . import test_formats
+from . import test_guard
 from . import test_manager
 from . import test_search
+from . import test_serializer
 from . import test_validation
 from . import test_views
 
@@ -37,8 +44,15 @@ def suite():
     """Returns the test suite for this module."""
     result = TestSuite()
     loader = defaultTestLoader
+    result.addTest(loader.loadTestsFromModule(test_advisor))
+    result.addTest(loader.loadTestsFromModule(test_cache))
+    result.addTest(loader.loadTestsFromModule(test_compression))
+    result.addTest(loader.loadTestsFromModule(test_encoding))
+    result.addTest(loader.loadTestsFromModule(test_formats))
+    result.addTest(loader.loadTestsFromModule(test_guard))
     result.addTest(loader.loadTestsFromModule(test_manager))
     result.addTest(loader.loadTestsFromModule(test_search))
+    result.addTest(loader.loadTestsFromModule(test_serializer))
     result.addTest(loader.loadTestsFromModule(test_validation))
     result.addTest(loader.loadTestsFromModule(test_views))
     return result
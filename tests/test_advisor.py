@@ -0,0 +1,89 @@
+"""
+    tests.test_advisor
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.advisor` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from unittest2 import TestSuite
+
+from flask import json
+
+from flask.ext.restless.advisor import IndexAdvisor
+from flask.ext.restless.search import SearchParameters
+
+from .helpers import setUpModule
+from .helpers import tearDownModule
+from .helpers import TestSupport
+
+
+__all__ = ['IndexAdvisorTest']
+
+
+dumps = json.dumps
+
+
+class IndexAdvisorTest(TestSupport):
+    """Unit tests for the :class:`flask_restless.advisor.IndexAdvisor`
+    class.
+
+    """
+
+    def test_report(self):
+        """Tests that the report lists the unindexed columns used in searches,
+        most used first.
+
+        """
+        advisor = IndexAdvisor()
+        searches = [{'filters': [{'name': 'age', 'op': 'gt', 'val': 1},
+                                 {'name': 'age', 'op': 'lt', 'val': 9},
+                                 {'name': 'name', 'op': '==', 'val': u'x'}],
+                     'order_by': [{'field': 'other'}]},
+                    {'filters': [{'name': 'age', 'op': 'gt', 'val': 2},
+                                 {'name': 'computers__vendor', 'op': 'any',
+                                  'val': u'foo'}]},
+                    {'order_by': [{'field': 'age'}, {'field': 'id'}]}]
+        for search in searches:
+            params = SearchParameters.from_dictionary(search)
+            advisor.record(self.Person, params)
+        report = advisor.report()
+        self.assertEqual([(r['table'], r['column']) for r in report],
+                         [('person', 'age'), ('computer', 'vendor'),
+                          ('person', 'other')])
+        self.assertEqual(report[0], dict(table='person', column='age',
+                                         indexed=False, filter_count=2,
+                                         order_by_count=1,
+                                         operators=dict(gt=2, lt=1)))
+        self.assertEqual(report[1]['operators'], dict(any=1))
+        # the unique column and the primary key are indexed
+        report = advisor.report(self.Person, unindexed_only=False)
+        indexed = dict((r['column'], r['indexed']) for r in report)
+        self.assertEqual(indexed, dict(age=False, other=False, name=True,
+                                       id=True))
+        self.assertIn('person.name (indexed)',
+                      advisor.format_report(unindexed_only=False))
+        advisor.clear()
+        self.assertEqual(advisor.report(), [])
+
+    def test_api(self):
+        """Tests that searches on an API are recorded on its advisor."""
+        advisor = IndexAdvisor()
+        self.manager.create_api(self.Person, index_advisor=advisor)
+        search = {'filters': [{'name': 'birth_date', 'op': 'is_null'}]}
+        for i in range(3):
+            response = self.app.get('/api/person?q=%s' % dumps(search))
+            self.assertEqual(response.status_code, 200)
+        report = advisor.report(self.Person)
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['column'], 'birth_date')
+        self.assertEqual(report[0]['operators'], dict(is_null=3))
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(IndexAdvisorTest))
+    return suite
@@ -0,0 +1,150 @@
+"""
+    tests.test_cache
+    ~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.cache` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import time
+
+from unittest2 import TestCase
+from unittest2 import TestSuite
+
+from flask.ext.restless.cache import LRUCache
+from flask.ext.restless.cache import ResponseCache
+from flask.ext.restless.cache import TTLCache
+
+
+__all__ = ['LRUCacheTest', 'ResponseCacheTest', 'TTLCacheTest']
+
+
+class TTLCacheTest(TestCase):
+    """Unit tests for the :class:`flask_restless.cache.TTLCache` class."""
+
+    def test_get_and_set(self):
+        """Tests that stored values are returned until they are deleted."""
+        cache = TTLCache(60)
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('foo', 0), 0)
+        cache.set('foo', 1)
+        self.assertEqual(cache.get('foo'), 1)
+        cache.set('foo', 2)
+        self.assertEqual(cache.get('foo'), 2)
+        cache.delete('foo')
+        self.assertIsNone(cache.get('foo'))
+        cache.set('foo', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_expiration(self):
+        """Tests that values expire after the timeout."""
+        cache = TTLCache(0.01)
+        cache.set('foo', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(len(cache), 0)
+
+    def test_maxsize(self):
+        """Tests that the oldest value is discarded when the cache is full."""
+        cache = TTLCache(60, maxsize=2)
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+        cache.set('baz', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('bar'), 2)
+        self.assertEqual(cache.get('baz'), 3)
+
+
+class LRUCacheTest(TestCase):
+    """Unit tests for the :class:`flask_restless.cache.LRUCache` class."""
+
+    def test_get_and_set(self):
+        """Tests that stored values are returned until they are deleted."""
+        cache = LRUCache()
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('foo', 0), 0)
+        cache.set('foo', 1)
+        self.assertEqual(cache.get('foo'), 1)
+        cache.set('foo', 2)
+        self.assertEqual(cache.get('foo'), 2)
+        cache.delete('foo')
+        self.assertIsNone(cache.get('foo'))
+        cache.set('foo', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_maxsize(self):
+        """Tests that the least recently used value is discarded when the
+        cache is full.
+
+        """
+        cache = LRUCache(maxsize=2)
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+        cache.get('foo')
+        cache.set('baz', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('bar'))
+        self.assertEqual(cache.get('foo'), 1)
+        self.assertEqual(cache.get('baz'), 3)
+
+
+class ResponseCacheTest(TestCase):
+    """Unit tests for the :class:`flask_restless.cache.ResponseCache`
+    class.
+
+    """
+
+    def test_invalidate(self):
+        """Tests that invalidating a table invalidates exactly the stored
+        bodies which depend on it.
+
+        """
+        cache = ResponseCache()
+        key1 = cache.key(['person'], '/api/person')
+        key2 = cache.key(['person', 'computer'], '/api/person')
+        key3 = cache.key(['computer'], '/api/computer')
+        self.assertEqual(len(set([key1, key2, key3])), 3)
+        self.assertEqual(key1, cache.key(['person'], '/api/person'))
+        for key in key1, key2, key3:
+            cache.set(key, 'body')
+        cache.invalidate(['person'])
+        self.assertIsNone(cache.get(cache.key(['person'], '/api/person')))
+        key = cache.key(['person', 'computer'], '/api/person')
+        self.assertIsNone(cache.get(key))
+        key = cache.key(['computer'], '/api/computer')
+        self.assertEqual(cache.get(key), 'body')
+
+    def test_backend(self):
+        """Tests that bodies and generations are stored in the specified
+        backend, so that caches sharing a backend share invalidations.
+
+        """
+        backend = LRUCache()
+        cache1 = ResponseCache(backend)
+        cache2 = ResponseCache(backend)
+        key = cache1.key(['person'], '/api/person')
+        cache1.set(key, 'body')
+        self.assertEqual(cache2.get(cache2.key(['person'], '/api/person')),
+                         'body')
+        cache2.invalidate(['person'])
+        key = cache1.key(['person'], '/api/person')
+        self.assertIsNone(cache1.get(key))
+        # if the generation is discarded, the stored bodies are invalidated
+        cache1.set(key, 'body')
+        backend.clear()
+        backend.set(key, 'body')
+        self.assertIsNone(cache1.get(cache1.key(['person'], '/api/person')))
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(LRUCacheTest))
+    suite.addTest(loader.loadTestsFromTestCase(ResponseCacheTest))
+    suite.addTest(loader.loadTestsFromTestCase(TTLCacheTest))
+    return suite
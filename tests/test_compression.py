@@ -0,0 +1,136 @@
+"""
+    tests.test_compression
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.compression` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+import zlib
+
+from flask import Flask
+from unittest2 import skipUnless
+from unittest2 import TestCase
+from unittest2 import TestSuite
+
+from flask.ext.restless.compression import brotli
+from flask.ext.restless.compression import Compressor
+
+
+__all__ = ['CompressorTest']
+
+
+def decompress(encoding, data):
+    """Returns the decompressed data of `data`, compressed with the specified
+    content coding.
+
+    """
+    if encoding == 'br':
+        return brotli.decompress(data)
+    if encoding == 'gzip':
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return zlib.decompress(data)
+
+
+class CompressorTest(TestCase):
+    """Unit tests for the :class:`flask_restless.compression.Compressor`
+    class.
+
+    """
+
+    def setUp(self):
+        """Creates the :class:`~flask.Flask` application in whose request
+        contexts responses are compressed.
+
+        """
+        self.app = Flask(__name__)
+        self.compressor = Compressor(min_size=100)
+        self.body = '{"objects":[%s]}' % ','.join(['{"id":1}'] * 100)
+
+    def compress(self, response, encoding):
+        """Returns `response` compressed in the context of a request which
+        accepts the specified content coding.
+
+        """
+        headers = {}
+        if encoding is not None:
+            headers['Accept-Encoding'] = encoding
+        with self.app.test_request_context('/', headers=headers):
+            return self.compressor.compress(response)
+
+    def test_compress(self):
+        """Tests that bodies are compressed with the content coding accepted
+        by the client, unless they are too small.
+
+        """
+        for encoding in 'gzip', 'deflate':
+            response = self.compress(self.app.response_class(self.body),
+                                     encoding)
+            self.assertEqual(response.headers['Content-Encoding'], encoding)
+            self.assertIn('Accept-Encoding', response.headers['Vary'])
+            self.assertLess(len(response.data), len(self.body))
+            self.assertEqual(int(response.headers['Content-Length']),
+                             len(response.data))
+            self.assertEqual(decompress(encoding, response.data), self.body)
+            # the compressed bytes are always the same
+            again = self.compress(self.app.response_class(self.body),
+                                  encoding)
+            self.assertEqual(again.data, response.data)
+        response = self.compress(self.app.response_class(self.body),
+                                 'deflate;q=0.5, gzip')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        for encoding in None, 'identity', 'compress':
+            response = self.compress(self.app.response_class(self.body),
+                                     encoding)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual(response.data, self.body)
+        response = self.compress(self.app.response_class('{}'), 'gzip')
+        self.assertNotIn('Content-Encoding', response.headers)
+        response = self.compress(self.app.response_class(status=304), 'gzip')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_stream(self):
+        """Tests that streamed bodies are compressed as they are generated,
+        regardless of their size.
+
+        """
+        chunks = ['{"id":%s}\n' % i for i in range(3)]
+        received = []
+
+        def generate():
+            for chunk in chunks:
+                yield chunk
+                received.append(chunk)
+
+        response = self.compress(self.app.response_class(generate()),
+                                 'gzip')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        iterator = iter(response.response)
+        # each chunk can be decompressed as soon as it is received
+        data = decompressor.decompress(next(iterator))
+        self.assertEqual(data, chunks[0])
+        self.assertEqual(received, [])
+        for compressed in iterator:
+            data += decompressor.decompress(compressed)
+        self.assertEqual(data, ''.join(chunks))
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Tests that brotli is preferred to the other content codings."""
+        response = self.compress(self.app.response_class(self.body),
+                                 'gzip, deflate, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(decompress('br', response.data), self.body)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(CompressorTest))
+    return suite
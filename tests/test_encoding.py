@@ -0,0 +1,88 @@
+"""
+    tests.test_encoding
+    ~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.encoding` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+import json
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+
+from unittest2 import skipUnless
+from unittest2 import TestCase
+from unittest2 import TestSuite
+
+from flask.ext.restless.encoding import JSONEncoder
+from flask.ext.restless.encoding import msgpack
+from flask.ext.restless.encoding import MsgPackEncoder
+
+
+__all__ = ['JSONEncoderTest', 'MsgPackEncoderTest']
+
+
+class JSONEncoderTest(TestCase):
+    """Unit tests for the :class:`flask_restless.encoding.JSONEncoder`
+    class.
+
+    """
+
+    def test_encode(self):
+        """Tests that dates, datetimes, and decimals are encoded as compact
+        JSON by the default and the standard library modules.
+
+        """
+        obj = dict(d=date(2012, 1, 2), dt=datetime(2012, 1, 2, 3, 4, 5),
+                   n=Decimal('1.5'), l=[1, 2])
+        for encoder in JSONEncoder(), JSONEncoder(json):
+            encoded = encoder.encode(obj)
+            self.assertNotIn(' ', encoded)
+            self.assertEqual(json.loads(encoded),
+                             dict(d='2012-01-02', dt='2012-01-02T03:04:05',
+                                  n=1.5, l=[1, 2]))
+        self.assertRaises(TypeError, JSONEncoder().encode, object())
+
+
+@skipUnless(msgpack, 'msgpack is not installed')
+class MsgPackEncoderTest(TestCase):
+    """Unit tests for the :class:`flask_restless.encoding.MsgPackEncoder`
+    class.
+
+    """
+
+    def test_encode(self):
+        """Tests that objects are encoded as MessagePack and decoded back, with
+        dates, datetimes, and decimals encoded as for JSON.
+
+        """
+        encoder = MsgPackEncoder()
+        obj = dict(d=date(2012, 1, 2), dt=datetime(2012, 1, 2, 3, 4, 5),
+                   n=Decimal('1.5'), s=u'L\xe9o', l=[1, 2])
+        self.assertEqual(encoder.decode(encoder.encode(obj)),
+                         dict(d='2012-01-02', dt='2012-01-02T03:04:05',
+                              n=1.5, s=u'L\xe9o', l=[1, 2]))
+        self.assertRaises(ValueError, encoder.decode, '\xc1')
+
+    def test_str_type(self):
+        """Tests that byte strings, like the keys of dictionaries and the
+        representations of dates, are written with the MessagePack ``str``
+        type instead of the ``bin`` type.
+
+        """
+        encoder = MsgPackEncoder()
+        # 0x81 is a map of one item, 0xa0 to 0xbf are strings of up to 31 bytes
+        self.assertEqual(encoder.encode({'page': 1}), '\x81\xa4page\x01')
+        self.assertEqual(encoder.encode(date(2012, 1, 2)), '\xaa2012-01-02')
+        self.assertEqual(encoder.encode(u'L\xe9o'), '\xa4L\xc3\xa9o')
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(JSONEncoderTest))
+    suite.addTest(loader.loadTestsFromTestCase(MsgPackEncoderTest))
+    return suite
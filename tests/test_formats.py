@@ -0,0 +1,130 @@
+"""
+    tests.test_formats
+    ~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.formats` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+from datetime import date
+
+from flask import Flask
+from flask import request
+from sqlalchemy import Column
+from sqlalchemy import Date
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.ext.declarative import declarative_base
+from unittest2 import skipUnless
+from unittest2 import TestCase
+from unittest2 import TestSuite
+
+from flask.ext.restless.formats import FormatError
+from flask.ext.restless.formats import pyarrow
+from flask.ext.restless.formats import requested_format
+from flask.ext.restless.formats import write_arrow
+from flask.ext.restless.formats import write_csv
+from flask.ext.restless.formats import write_parquet
+from flask.ext.restless.formats import writer
+
+
+__all__ = ['FormatsTest']
+
+
+Base = declarative_base()
+
+
+class Person(Base):
+    __tablename__ = 'person'
+    id = Column(Integer, primary_key=True)
+    name = Column(Unicode)
+    birth_date = Column(Date)
+
+
+# the columns of two batches of people
+BATCHES = [[[1, 2], [u'Jeffrey', u'L\xe9o'], [date(1990, 1, 2), None]],
+           [[3], [None], [date(1991, 3, 4)]]]
+
+
+class FormatsTest(TestCase):
+    """Unit tests for the functions of the :mod:`flask_restless.formats`
+    module.
+
+    """
+
+    def test_requested_format(self):
+        """Tests that the format is read from the ``format`` query parameter
+        or negotiated from the :http:header:`Accept` header.
+
+        """
+        app = Flask(__name__)
+        cases = [('/', {}, None),
+                 ('/?format=csv', {}, 'csv'),
+                 ('/?format=json', {'Accept': 'text/csv'}, None),
+                 ('/?format=bogus', {}, 'bogus'),
+                 ('/', {'Accept': 'text/csv'}, 'csv'),
+                 ('/', {'Accept': '*/*'}, None),
+                 ('/', {'Accept': 'application/json, text/csv;q=0.5'}, None),
+                 ('/', {'Accept': 'text/html, text/csv;q=0.5'}, 'csv')]
+        for url, headers, expected in cases:
+            with app.test_request_context(url, headers=headers):
+                self.assertEqual(requested_format(request), expected)
+
+    def test_writer(self):
+        """Tests that unknown or unavailable formats are rejected."""
+        self.assertIs(writer('csv'), write_csv)
+        self.assertRaises(FormatError, writer, 'bogus')
+        if pyarrow is None:
+            self.assertRaises(FormatError, writer, 'arrow')
+            self.assertRaises(FormatError, writer, 'parquet')
+
+    def test_csv(self):
+        """Tests that batches of columns are written as the rows of a CSV
+        file, with a header.
+
+        """
+        columns = ['id', 'name', 'birth_date']
+        data = ''.join(write_csv(Person, columns, BATCHES))
+        self.assertEqual(data.splitlines(),
+                         ['id,name,birth_date', '1,Jeffrey,1990-01-02',
+                          u'2,L\xe9o,'.encode('utf-8'), '3,,1991-03-04'])
+        data = ''.join(write_csv(Person, columns, []))
+        self.assertEqual(data.splitlines(), ['id,name,birth_date'])
+
+    @skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_arrow(self):
+        """Tests that batches of columns are written as the record batches of
+        an Arrow IPC stream.
+
+        """
+        columns = ['id', 'name', 'birth_date']
+        data = ''.join(write_arrow(Person, columns, BATCHES))
+        table = pyarrow.ipc.open_stream(data).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column_names, columns)
+        self.assertEqual(table.to_pydict()['name'], [u'Jeffrey', u'L\xe9o',
+                                                     None])
+
+    @skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_parquet(self):
+        """Tests that batches of columns are written as the row groups of a
+        Parquet file.
+
+        """
+        columns = ['id', 'name', 'birth_date']
+        data = ''.join(write_parquet(Person, columns, BATCHES))
+        parquetfile = pyarrow.parquet.ParquetFile(pyarrow.BufferReader(data))
+        self.assertEqual(parquetfile.num_row_groups, 2)
+        table = parquetfile.read()
+        self.assertEqual(table.to_pydict()['id'], [1, 2, 3])
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(FormatsTest))
+    return suite
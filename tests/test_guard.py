@@ -0,0 +1,169 @@
+"""
+    tests.test_guard
+    ~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.guard` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from __future__ import with_statement
+
+from unittest2 import TestSuite
+
+from flask import json
+from sqlalchemy import event
+
+from flask.ext.restless import guard as guardmodule
+from flask.ext.restless.guard import CostGuard
+from flask.ext.restless.guard import ExplainError
+from flask.ext.restless.guard import QueryTooExpensive
+from flask.ext.restless.search import create_query
+from flask.ext.restless.search import SearchParameters
+
+from .helpers import setUpModule
+from .helpers import tearDownModule
+from .helpers import TestSupportPrefilled
+
+
+__all__ = ['CostGuardTest']
+
+
+dumps = json.dumps
+loads = json.loads
+
+
+class CostGuardTest(TestSupportPrefilled):
+    """Unit tests for the :class:`flask_restless.guard.CostGuard` class."""
+
+    def _check(self, guard, search, session=None):
+        """Checks the query created from the dictionary `search` on the
+        ``Person`` model with `guard`.
+
+        """
+        params = SearchParameters.from_dictionary(search)
+        query = create_query(self.session, self.Person, params)
+        guard.check(session or self.session, self.Person, query, params)
+
+    def setUp(self):
+        """Computes the statistics from which the guard reads the number of
+        rows in each table.
+
+        """
+        super(CostGuardTest, self).setUp()
+        self.session.execute('ANALYZE')
+
+    def test_check(self):
+        """Tests that searches which scan a large table are rejected, and that
+        checked shapes are remembered.
+
+        """
+        unindexed = {'filters': [{'name': 'age', 'op': 'gt', 'val': 10}]}
+        indexed = {'filters': [{'name': 'name', 'op': '==', 'val': u'Mary'}]}
+        related = {'filters': [{'name': 'computers__vendor', 'op': 'any',
+                                'val': u'foo'}]}
+        guard = CostGuard(len(self.people) - 1)
+        with self.assertRaises(QueryTooExpensive) as context:
+            self._check(guard, unindexed)
+        self.assertEqual(context.exception.tables, ['person'])
+        self._check(guard, indexed)
+        # a search of the same shape is accepted without using the session
+        self._check(guard, indexed, session=object())
+        # the computer table is empty, but the person table is scanned
+        self.assertRaises(QueryTooExpensive, self._check, guard, related)
+        # a search of the same shape is rejected without using the session
+        unindexed['filters'][0]['val'] = 20
+        self.assertRaises(QueryTooExpensive, self._check, guard, unindexed,
+                          session=object())
+        # small tables may be scanned
+        self._check(CostGuard(len(self.people)), unindexed)
+        # searches without filters or ordering are not checked
+        self._check(guard, {})
+
+    def test_statistics(self):
+        """Tests that the sizes of tables are read from the statistics of the
+        database, and that tables without statistics are never rejected.
+
+        """
+        unindexed = {'filters': [{'name': 'age', 'op': 'gt', 'val': 10}]}
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+
+        event.listen(self.Base.metadata.bind, 'before_cursor_execute', record)
+        self.assertRaises(QueryTooExpensive, self._check, CostGuard(1),
+                          unindexed)
+        self.assertFalse(any('count(' in statement.lower()
+                             for statement in statements))
+        self.session.execute('DELETE FROM sqlite_stat1')
+        self.session.commit()
+        self._check(CostGuard(1), unindexed)
+
+    def test_explain_error(self):
+        """Tests that a failure to explain a query is reported as an error of
+        the guard, both by the guard and by the API.
+
+        """
+        self.manager.create_api(self.Person, max_scan_rows=2)
+        search = {'filters': [{'name': 'age', 'op': 'gt', 'val': 10}]}
+
+        def fail(rows, names):
+            raise ValueError('unreadable plan')
+
+        original = guardmodule._SCANS['sqlite']
+        guardmodule._SCANS['sqlite'] = fail
+        try:
+            self.assertRaises(ExplainError, self._check, CostGuard(1), search)
+            response = self.app.get('/api/person?q=%s' % dumps(search))
+        finally:
+            guardmodule._SCANS['sqlite'] = original
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(loads(response.data)['message'],
+                         'Unable to check the cost of the query')
+
+    def test_api(self):
+        """Tests that searches rejected by the guard receive an error
+        response.
+
+        """
+        self.manager.create_api(self.Person, max_scan_rows=2)
+        search = {'filters': [{'name': 'age', 'op': 'gt', 'val': 10}]}
+        response = self.app.get('/api/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['tables'], ['person'])
+        search = {'filters': [{'name': 'name', 'op': 'like', 'val': u'Mary'}]}
+        search['single'] = True
+        response = self.app.get('/api/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 400)
+        search = {'filters': [{'name': 'name', 'op': '==', 'val': u'Mary'}]}
+        response = self.app.get('/api/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(loads(response.data)['objects']), 1)
+
+    def test_export(self):
+        """Tests that exports of searches rejected by the guard receive an
+        error response.
+
+        """
+        self.manager.create_api(self.Person, max_scan_rows=2,
+                                allow_export=True)
+        search = {'filters': [{'name': 'age', 'op': 'gt', 'val': 10}]}
+        response = self.app.get('/api/person/export?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['tables'], ['person'])
+        response = self.app.get('/api/person/export?q=%s&format=csv'
+                                % dumps(search))
+        self.assertEqual(response.status_code, 400)
+        search = {'filters': [{'name': 'name', 'op': '==', 'val': u'Mary'}]}
+        response = self.app.get('/api/person/export?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data.splitlines()), 1)
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(CostGuardTest))
+    return suite
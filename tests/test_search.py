@@ -16,8 +16,16 @@ from unittest2 import TestCase
 from sqlalchemy.orm.exc import MultipleResultsFound
 from sqlalchemy.orm.exc import NoResultFound
 
+from flask.ext.restless.cache import LRUCache
+from flask.ext.restless.search import ContradictionError
+from flask.ext.restless.search import create_keyset_filter
 from flask.ext.restless.search import create_query
 from flask.ext.restless.search import Filter
+from flask.ext.restless.search import normalize_filters
+from flask.ext.restless.search import OPERATORS
+from flask.ext.restless.search import OrderBy
+from flask.ext.restless.search import register_operator
+from flask.ext.restless.search import RELATION_STRATEGIES
 from flask.ext.restless.search import search
 from flask.ext.restless.search import SearchParameters
 
@@ -26,7 +34,8 @@ from .helpers import tearDownModule
 from .helpers import TestSupportPrefilled
 
 
-__all__ = ['OperatorsTest', 'QueryCreationTest', 'SearchTest']
+__all__ = ['NormalizationTest', 'OperatorsTest', 'QueryCreationTest',
+           'SearchTest']
 
 
 class QueryCreationTest(TestSupportPrefilled):
@@ -99,6 +108,77 @@ class QueryCreationTest(TestSupportPrefilled):
         self.assertEqual(results[0].other, 10)
         self.assertEqual(results[1].other, 19)
 
+    def test_keyset_filter(self):
+        """Tests that a keyset filter selects exactly the instances which
+        follow the given values in the given ordering.
+
+        """
+        order_by = [OrderBy('other', 'desc'), OrderBy('id')]
+        d = {'order_by': [{'field': 'other', 'direction': 'desc'},
+                          {'field': 'id'}]}
+        query = create_query(self.session, self.Person, d)
+        everyone = query.all()
+        # Katy and John share the same value of "other", so the ordering is
+        # broken by the primary key
+        for i, person in enumerate(everyone):
+            keyset = create_keyset_filter(self.Person, order_by,
+                                          [person.other, person.id])
+            query = create_query(self.session, self.Person, d)
+            self.assertEqual(query.filter(keyset).all(), everyone[i + 1:])
+
+    def test_keyset_filter_nulls(self):
+        """Tests that a keyset filter places ``NULL`` values where the database
+        sorts them, both when they are on the last instance and when they
+        follow it.
+
+        """
+        # SQLite sorts NULL before all other values in ascending order
+        for person in self.people[1:3]:
+            person.other = None
+        self.session.commit()
+        for direction in 'asc', 'desc':
+            order_by = [OrderBy('other', direction), OrderBy('id')]
+            d = {'order_by': [{'field': 'other', 'direction': direction},
+                              {'field': 'id'}]}
+            everyone = create_query(self.session, self.Person, d).all()
+            for i, person in enumerate(everyone):
+                keyset = create_keyset_filter(self.Person, order_by,
+                                              [person.other, person.id])
+                query = create_query(self.session, self.Person, d)
+                self.assertEqual(query.filter(keyset).all(),
+                                 everyone[i + 1:])
+
+    def test_plan_cache(self):
+        """Tests that a query built for a search is reused for subsequent
+        searches of the same shape with different values.
+
+        """
+        cache = LRUCache()
+        d1 = dict(filters=[dict(name='age', op='in', val=[19, 23]),
+                           dict(name='name', op='like', val=u'%y%')])
+        d2 = dict(filters=[dict(name='age', op='in', val=[7, 25]),
+                           dict(name='name', op='like', val=u'%a%')])
+        expected1 = create_query(self.session, self.Person, d1).all()
+        expected2 = create_query(self.session, self.Person, d2).all()
+        query1 = create_query(self.session, self.Person, d1, cache)
+        self.assertEqual(len(cache), 1)
+        query2 = create_query(self.session, self.Person, d2, cache)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(query1.all(), expected1)
+        self.assertEqual(query2.all(), expected2)
+        # a list argument of a different length is a different shape
+        d3 = dict(filters=[dict(name='age', op='in', val=[7, 19, 25]),
+                           dict(name='name', op='like', val=u'%a%')])
+        expected3 = create_query(self.session, self.Person, d3).all()
+        self.assertEqual(create_query(self.session, self.Person, d3,
+                                      cache).all(), expected3)
+        self.assertEqual(len(cache), 2)
+        # limit and offset are applied after the cached query is retrieved
+        d4 = dict(d3, limit=1, offset=1)
+        self.assertEqual(create_query(self.session, self.Person, d4,
+                                      cache).all(), expected3[1:2])
+        self.assertEqual(len(cache), 2)
+
 
 class OperatorsTest(TestSupportPrefilled):
     """Tests for each of the query operators defined in
@@ -153,6 +233,24 @@ class OperatorsTest(TestSupportPrefilled):
         result = search(self.session, self.Person, d)
         self.assertEqual(len(result), 1)
 
+    def test_register_operator(self):
+        """Tests that custom operators can be registered and used in searches,
+        and that operators with an invalid arity are rejected.
+
+        """
+        register_operator('startswith', lambda f, a: f.like(a + u'%'))
+        try:
+            self.assertEqual(OPERATORS['startswith'].arity, 2)
+            d = dict(filters=[dict(name='name', op='startswith', val=u'Li')])
+            result = search(self.session, self.Person, d)
+            self.assertEqual([p.name for p in result], [u'Lincoln'])
+        finally:
+            del OPERATORS['startswith']
+        self.assertRaises(ValueError, register_operator, 'bogus', lambda: None)
+        self.assertRaises(ValueError, register_operator, 'bogus',
+                          lambda f, a: f == a, arity=4)
+        self.assertNotIn('bogus', OPERATORS)
+
     def test_desc_and_asc(self):
         """Tests for the ``"desc"`` and ``"asc"`` operators."""
         # TODO Not yet implemented because I don't understand these operators.
@@ -192,6 +290,51 @@ class OperatorsTest(TestSupportPrefilled):
         result = search(self.session, self.Computer, d)
         self.assertEqual(len(result), 3)
 
+    def test_relation_paths(self):
+        """Tests that filters on paths through several relationships return
+        the same results under each strategy in
+        :data:`flask_restless.search.RELATION_STRATEGIES`.
+
+        """
+        computer1 = self.Computer(name=u'c1', vendor=u'foo')
+        computer2 = self.Computer(name=u'c2', vendor=u'bar')
+        computer3 = self.Computer(name=u'c3', vendor=u'bar')
+        computer4 = self.Computer(name=u'c4', vendor=u'foo')
+        person1, person2 = self.people[:2]
+        person1.computers = [computer1, computer2]
+        person2.computers = [computer3]
+        self.session.add(computer4)
+        self.session.commit()
+        # computers whose owner owns a computer made by "foo"
+        d1 = dict(filters=[dict(name='owner__computers__vendor', op='==',
+                                val=u'foo')],
+                  order_by=[dict(field='name')])
+        # computers owned by Lincoln, through a scalar relationship
+        d2 = dict(filters=[dict(name='owner__name', op='==', val=u'Lincoln')],
+                  order_by=[dict(field='name')])
+        # people who own a computer whose owner owns a computer named "c3"
+        d3 = dict(filters=[dict(name='computers__owner__computers__name',
+                                op='in', val=[u'c3'])])
+        # computers whose owner owns a computer made by "bar", using "any"
+        d4 = dict(filters=[dict(name='owner__computers__vendor', op='any',
+                                val=u'bar')],
+                  order_by=[dict(field='name')])
+        for strategy in RELATION_STRATEGIES:
+            result = search(self.session, self.Computer, d1,
+                            relation_strategy=strategy)
+            self.assertEqual([c.name for c in result], [u'c1', u'c2'])
+            result = search(self.session, self.Computer, d2,
+                            relation_strategy=strategy)
+            self.assertEqual([c.name for c in result], [u'c1', u'c2'])
+            result = search(self.session, self.Person, d3,
+                            relation_strategy=strategy)
+            self.assertEqual(result, [person2])
+            result = search(self.session, self.Computer, d4,
+                            relation_strategy=strategy)
+            self.assertEqual([c.name for c in result], [u'c1', u'c2', u'c3'])
+        with self.assertRaises(ValueError):
+            search(self.session, self.Computer, d1, relation_strategy='bogus')
+
 
 class SearchTest(TestSupportPrefilled):
     """Unit tests for the :func:`flask_restless.search.search` function.
@@ -227,9 +370,107 @@ class SearchTest(TestSupportPrefilled):
         self.assertEqual(result.name, u'Lincoln')
 
 
+class NormalizationTest(TestSupportPrefilled):
+    """Unit tests for the :func:`flask_restless.search.normalize_filters`
+    function.
+
+    """
+
+    def _normalize(self, *filters):
+        """Returns the normalized form of `filters`, given as three-tuples of
+        field name, operator, and argument, as a list of three-tuples.
+
+        """
+        filters = [Filter(*f) for f in filters]
+        return [(f.fieldname, f.operator, f.argument)
+                for f in normalize_filters(filters)]
+
+    def test_equalities(self):
+        """Tests that equalities and ``in`` lists on the same field are
+        intersected.
+
+        """
+        self.assertEqual(self._normalize(('age', 'in', [3, 1, 2, 3, 1]),
+                                         ('age', 'ne', 2)),
+                         [('age', 'in', [1, 3])])
+        self.assertEqual(self._normalize(('age', 'eq', 3),
+                                         ('age', 'in', [1, 2, 3]),
+                                         ('age', 'lt', 10)),
+                         [('age', '==', 3)])
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'eq', 3), ('age', '==', 4))
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'in', [1, 2]), ('age', 'gt', 2))
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'in', [1, 2]), ('age', 'not_in', [2, 1]))
+
+    def test_ranges(self):
+        """Tests that ranges on the same field are collapsed to their tightest
+        bounds.
+
+        """
+        self.assertEqual(self._normalize(('age', 'ge', 10), ('age', 'gt', 20),
+                                         ('age', 'gt', 20), ('age', 'lt', 30),
+                                         ('age', 'le', 30), ('age', 'ne', 5),
+                                         ('age', 'ne', 25)),
+                         [('age', '>', 20), ('age', '<', 30),
+                          ('age', '!=', 25)])
+        self.assertEqual(self._normalize(('age', 'ge', 10), ('age', 'le', 10)),
+                         [('age', '==', 10)])
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'gt', 10), ('age', 'le', 10))
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'gt', 10), ('age', 'lt', 5))
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('age', 'ge', 10), ('age', 'le', 10),
+                          ('age', 'not_in', [10]))
+
+    def test_other_filters(self):
+        """Tests that filters which cannot be combined are left as they are,
+        and that only duplicates are removed from non-numeric filters.
+
+        """
+        self.assertEqual(self._normalize(('name', 'like', u'%y%'),
+                                         ('age', 'gt', 1),
+                                         ('name', 'eq', u'Mary'),
+                                         ('name', 'in', [u'a', u'b', u'a']),
+                                         ('name', 'eq', u'Mary'),
+                                         ('birth_date', 'is_null', None),
+                                         ('computers__name', '==', u'c'),
+                                         ('age', 'gt', 2)),
+                         [('name', 'like', u'%y%'), ('age', '>', 2),
+                          ('name', '==', u'Mary'),
+                          ('name', 'in', [u'a', u'b']),
+                          ('birth_date', 'is_null', None),
+                          ('computers__name', '==', u'c')])
+        self.assertRaises(ContradictionError, self._normalize,
+                          ('name', 'in', []))
+
+    def test_search(self):
+        """Tests that normalized searches return the same results as the
+        original ones, and that contradictory searches do not query the
+        database.
+
+        """
+        d = dict(filters=[dict(name='age', op='in', val=[7, 19, 23, 19]),
+                          dict(name='age', op='ge', val=10),
+                          dict(name='age', op='gt', val=5)])
+        expected = search(self.session, self.Person, d)
+        self.assertEqual(search(self.session, self.Person, d, normalize=True),
+                         expected)
+        d = dict(filters=[dict(name='age', op='lt', val=10),
+                          dict(name='age', op='gt', val=20)])
+        # the session is not used, since the filters contradict each other
+        self.assertEqual(search(None, self.Person, d, normalize=True), [])
+        d['single'] = True
+        with self.assertRaises(NoResultFound):
+            search(None, self.Person, d, normalize=True)
+
+
 def load_tests(loader, standard_tests, pattern):
     """Returns the test suite for this module."""
     suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(NormalizationTest))
     suite.addTest(loader.loadTestsFromTestCase(OperatorsTest))
     suite.addTest(loader.loadTestsFromTestCase(QueryCreationTest))
     suite.addTest(loader.loadTestsFromTestCase(SearchTest))
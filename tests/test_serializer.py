@@ -0,0 +1,178 @@
+"""
+    tests.test_serializer
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Provides unit tests for the :mod:`flask_restless.serializer` module.
+
+    :copyright: 2012 Jeffrey Finkelstein <jeffrey.finkelstein@gmail.com>
+    :license: GNU AGPLv3+ or BSD
+
+"""
+from datetime import date
+
+from sqlalchemy import Column
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import Unicode
+from sqlalchemy.orm import relationship
+from unittest2 import TestSuite
+
+from flask.ext.restless.serializer import serializer_for
+from flask.ext.restless.views import _to_dict_include
+
+from .helpers import setUpModule
+from .helpers import tearDownModule
+from .helpers import TestSupport
+
+
+__all__ = ['SerializerTest']
+
+
+def untable(header, rows):
+    """Returns the list of dictionaries represented by the specified header
+    and rows of a table returned by
+    :meth:`flask_restless.serializer.Serializer.table`.
+
+    """
+    result = []
+    for row in rows:
+        dictionary = {}
+        for column, value in zip(header, row):
+            if isinstance(column, dict):
+                (column, subheader), = column.items()
+                if isinstance(value, list) and value and \
+                        isinstance(value[0], list):
+                    value = untable(subheader, value)
+                elif value == []:
+                    pass
+                elif value is not None:
+                    value = untable(subheader, [value])[0]
+            dictionary[column] = value
+        result.append(dictionary)
+    return result
+
+
+class SerializerTest(TestSupport):
+    """Unit tests for the :class:`flask_restless.serializer.Serializer`
+    class.
+
+    """
+
+    def test_same_as_to_dict(self):
+        """Tests that the serializer returns the same dictionaries as
+        :func:`flask_restless.views._to_dict_include`.
+
+        """
+        person = self.Person(name=u'foo', age=20, other=1.5,
+                             birth_date=date(1990, 1, 2))
+        person.computers = [self.Computer(name=u'c1', vendor=u'Dell'),
+                            self.Computer(name=u'c2', vendor=u'HP')]
+        nobody = self.Person(name=u'bar')
+        self.session.add_all([person, nobody])
+        self.session.commit()
+        serializer = serializer_for(self.Person)
+        self.assertIs(serializer, serializer_for(self.Person))
+        for instance in person, nobody:
+            for deep in None, {}, dict(computers={}):
+                for include in None, [], ['name', 'birth_date', 'computers']:
+                    expected = _to_dict_include(instance, deep,
+                                                include=include)
+                    self.assertEqual(serializer(instance, deep, include),
+                                     expected)
+        result = serializer(person, include=['birth_date', 'bogus'])
+        self.assertEqual(result, dict(birth_date='1990-01-02'))
+        deep = dict(computers={})
+        self.assertEqual(serializer.many([person, nobody], deep),
+                         [serializer(person, deep), serializer(nobody, deep)])
+
+    def test_inheritance(self):
+        """Tests that instances of subclasses of a model, mapped by single
+        table or joined table inheritance, are serialized with the columns of
+        the subclasses.
+
+        """
+        class Employee(self.Base):
+            __tablename__ = 'employee'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            kind = Column(Unicode)
+            team_id = Column(Integer, ForeignKey('team.id'))
+            __mapper_args__ = dict(polymorphic_on=kind,
+                                   polymorphic_identity=u'employee')
+
+        class Manager(Employee):
+            level = Column(Integer)
+            __mapper_args__ = dict(polymorphic_identity=u'manager')
+
+        class Engineer(Employee):
+            __tablename__ = 'engineer'
+            id = Column(Integer, ForeignKey('employee.id'), primary_key=True)
+            language = Column(Unicode)
+            __mapper_args__ = dict(polymorphic_identity=u'engineer')
+
+        class Team(self.Base):
+            __tablename__ = 'team'
+            id = Column(Integer, primary_key=True)
+            members = relationship(Employee)
+
+        self.Base.metadata.create_all()
+        team = Team()
+        team.members = [Employee(name=u'foo'), Manager(name=u'bar', level=2),
+                        Engineer(name=u'baz', language=u'Python')]
+        self.session.add(team)
+        self.session.commit()
+        employees = self.session.query(Employee).order_by(Employee.id).all()
+        serializer = serializer_for(Employee)
+        expected = [_to_dict_include(employee) for employee in employees]
+        self.assertEqual(serializer.many(employees), expected)
+        self.assertEqual([serializer(employee) for employee in employees],
+                         expected)
+        self.assertEqual(expected[1]['level'], 2)
+        self.assertEqual(expected[2]['language'], u'Python')
+        result = serializer.many(employees, include=['name', 'level'])
+        self.assertEqual(result, [dict(name=u'foo'),
+                                  dict(name=u'bar', level=2),
+                                  dict(name=u'baz')])
+        deep = dict(members={})
+        members = serializer_for(Team)(team, deep)['members']
+        self.assertEqual(sorted(members, key=lambda member: member['id']),
+                         expected)
+
+    def test_table(self):
+        """Tests that the table representations of instances contain the same
+        values as their dictionary representations.
+
+        """
+        person = self.Person(name=u'foo', age=20, other=1.5,
+                             birth_date=date(1990, 1, 2))
+        person.computers = [self.Computer(name=u'c1', vendor=u'Dell'),
+                            self.Computer(name=u'c2', vendor=u'HP')]
+        nobody = self.Person(name=u'bar')
+        self.session.add_all([person, nobody])
+        self.session.commit()
+        serializer = serializer_for(self.Person)
+        people = [person, nobody]
+        for deep in None, {}, dict(computers={}):
+            for include in None, [], ['name', 'birth_date', 'computers']:
+                header, rows = serializer.table(people, deep, include)
+                self.assertEqual(header, serializer.header(deep, include))
+                self.assertEqual(untable(header, rows),
+                                 serializer.many(people, deep, include))
+        header, rows = serializer.table([person], dict(computers={}),
+                                        ['name', 'computers'])
+        computers = serializer_for(self.Computer).header()
+        self.assertEqual(header, ['name', dict(computers=computers)])
+        self.assertEqual(len(rows[0][1]), 2)
+        self.assertEqual(rows[0][1][0][computers.index('name')], u'c1')
+        serializer = serializer_for(self.Computer)
+        columns = ['name', 'vendor']
+        rows = [(u'c1', u'Dell', 1), (u'c2', None, 2)]
+        self.assertEqual(serializer.row_table(rows, columns),
+                         (columns, [[u'c1', u'Dell'], [u'c2', None]]))
+
+
+def load_tests(loader, standard_tests, pattern):
+    """Returns the test suite for this module."""
+    suite = TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(SerializerTest))
+    return suite
@@ -17,8 +17,10 @@ import re
 
 from flask import json
 from sqlalchemy import Column
+from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
 from sqlalchemy import Unicode
+from sqlalchemy.orm import relationship
 from sqlalchemy.orm import validates
 from unittest2 import TestSuite
 from unittest2 import skipUnless
@@ -64,6 +66,12 @@ class SimpleValidationTest(TestSupport):
         class CoolValidationError(Exception):
             pass
 
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            test_id = Column(Integer, ForeignKey('test.id'))
+
         # create the validated class
         # NOTE: don't name this `Person`, as in self.Person
         class Test(self.Base):
@@ -72,6 +80,7 @@ class SimpleValidationTest(TestSupport):
             name = Column(Unicode(30), nullable=False, index=True)
             email = Column(Unicode, nullable=False)
             age = Column(Integer, nullable=False)
+            tags = relationship(Tag)
 
             @validates('email')
             def validate_email(self, key, string):
@@ -100,6 +109,14 @@ class SimpleValidationTest(TestSupport):
         self.Base.metadata.create_all()
         self.manager.create_api(Test, methods=['GET', 'POST', 'PATCH'],
                                 validation_exceptions=[CoolValidationError])
+        self.manager.create_api(Test, methods=['GET', 'POST'],
+                                url_prefix='/api/v2', allow_post_many=True,
+                                post_chunk_size=2,
+                                validation_exceptions=[CoolValidationError])
+        self.manager.create_api(Test, methods=['GET', 'POST'],
+                                url_prefix='/api/v3', allow_post_many=True,
+                                validation_exceptions=[CoolValidationError])
+        self.Tag = Tag
 
     def test_validations(self):
         """Test SQLAlchemy's built-in simple validations."""
@@ -138,6 +155,43 @@ class SimpleValidationTest(TestSupport):
             self.assertNotIn('format', errors['email'].lower())
 
 
+    def test_post_many_validations(self):
+        """Tests that a validation error in a :http:method:`post` request for
+        many instances rolls back the chunk in progress, and that the response
+        contains the primary keys of the instances already committed.
+
+        """
+        people = [dict(name='John', email='foo@example.com', age=1,
+                       tags=[dict(name='t1')]),
+                  dict(name='Mary', email='bar@example.com', age=2),
+                  dict(name='Jeffrey', email='baz@example.com', age=3,
+                       tags=[dict(name='t3')]),
+                  dict(name='Bob', email='bogus!!!email', age=4)]
+        response = self.app.post('/api/v2/test', data=dumps(people))
+        self.assertEqual(response.status_code, 400)
+        data = loads(response.data)
+        self.assertIn('email', data['validation_errors'])
+        self.assertEqual(data['objects'], [dict(id=1), dict(id=2)])
+        response = self.app.get('/api/test')
+        names = [person['name'] for person in loads(response.data)['objects']]
+        self.assertEqual(names, ['John', 'Mary'])
+        # related instances of the chunk in progress are rolled back too
+        tags = self.session.query(self.Tag).all()
+        self.assertEqual([tag.name for tag in tags], ['t1'])
+        # without chunks, nothing is committed
+        people = [dict(name='Lucy', email='lucy@example.com', age=5,
+                       tags=[dict(name='t5')]),
+                  dict(name='Katy', email='bogus!!!email', age=6)]
+        response = self.app.post('/api/v3/test', data=dumps(people))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['objects'], [])
+        response = self.app.get('/api/test')
+        names = [person['name'] for person in loads(response.data)['objects']]
+        self.assertEqual(names, ['John', 'Mary'])
+        tags = self.session.query(self.Tag).all()
+        self.assertEqual([tag.name for tag in tags], ['t1'])
+
+
 class SAVTest(TestSupport):
     """Tests for validation errors raised by the ``savalidation`` package. For
     more information about this package, see `its PyPI page
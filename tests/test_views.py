@@ -11,24 +11,39 @@
 """
 from __future__ import with_statement
 
+import base64
+import zlib
 from datetime import date
 from datetime import datetime
+from unittest2 import skipIf
+from unittest2 import skipUnless
 from unittest2 import TestSuite
 
 from flask import json, abort
+from flask import request
+from sqlalchemy import Column
+from sqlalchemy import event
+from sqlalchemy import ForeignKey
+from sqlalchemy import Integer
+from sqlalchemy import Table
+from sqlalchemy import Unicode
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import relationship
 
 from flask.ext.restless.views import _evaluate_functions as evaluate_functions
 from flask.ext.restless.views import _get_columns
 from flask.ext.restless.views import _get_or_create
 from flask.ext.restless.views import _get_relations
 from flask.ext.restless.views import _to_dict
+from flask.ext.restless import JSONEncoder
+from flask.ext.restless.encoding import msgpack
 from flask.ext.restless.manager import IllegalArgumentError
 
 from .helpers import setUpModule
 from .helpers import tearDownModule
 from .helpers import TestSupport
 from .helpers import TestSupportPrefilled
+from .test_serializer import untable
 
 
 __all__ = ['ModelTestCase', 'FunctionEvaluationTest', 'FunctionAPITestCase',
@@ -287,6 +302,49 @@ class APITestCase(TestSupport):
         inst = _to_dict(person, deep)
         self.assertEqual(loads(response.data), inst)
 
+    def test_post_many(self):
+        """Tests for creating many instances in a single :http:method:`post`
+        request.
+
+        """
+        self.manager.create_api(self.Person, methods=['GET', 'POST'],
+                                url_prefix='/api/v2', allow_post_many=True)
+        self.manager.create_api(self.Person, methods=['POST'],
+                                url_prefix='/api/v3', allow_post_many=True,
+                                post_chunk_size=2)
+        people = [dict(name=u'Lincoln', age=23), dict(name=u'Mary'),
+                  dict(name=u'Lucy', computers=[dict(name=u'lixeiro')])]
+        # posting many instances must be enabled explicitly
+        response = self.app.post('/api/person', data=dumps(people))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['message'],
+                         'Unable to create multiple instances')
+        response = self.app.post('/api/v2/person', data=dumps([1, 2]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['message'],
+                         'Unable to decode data')
+        self.assertEqual(self.session.query(self.Person).count(), 0)
+
+        response = self.app.post('/api/v2/person', data=dumps(people))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data)['objects'],
+                         [dict(id=1), dict(id=2), dict(id=3)])
+        response = self.app.get('/api/v2/person/3')
+        data = loads(response.data)
+        self.assertEqual(data['name'], u'Lucy')
+        self.assertEqual(data['computers'][0]['name'], u'lixeiro')
+        # an empty list creates nothing
+        response = self.app.post('/api/v2/person', data=dumps([]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data)['objects'], [])
+        # the chunks are committed separately
+        people = [dict(name=u'John'), dict(name=u'Paul'), dict(name=u'Ringo')]
+        response = self.app.post('/api/v3/person', data=dumps(people))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data)['objects'],
+                         [dict(id=4), dict(id=5), dict(id=6)])
+        self.assertEqual(self.session.query(self.Person).count(), 6)
+
     def test_post_with_submodels(self):
         """Tests the creation of a model with a related field."""
         data = {'name': u'John', 'age': 2041,
@@ -853,6 +911,1041 @@ class APITestCase(TestSupport):
         self.assertEqual(loads(response.data)['page'], 1)
         self.assertEqual(len(loads(response.data)['objects']), 25)
 
+        # page numbers must be positive integers
+        for page in '0', '-1', 'abc':
+            response = self.app.get('/api/person?page=' + page)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(loads(response.data)['message'],
+                             'Invalid page number')
+
+    def test_pagination_with_limit_and_offset(self):
+        """Tests that pages are counted from the start of the result set
+        restricted by the ``limit`` and ``offset`` search parameters.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=5)
+        for i in range(25):
+            d = dict(name=unicode('person%s' % i), age=i)
+            response = self.app.post('/api/person', data=dumps(d))
+            self.assertEqual(response.status_code, 201)
+        search = {'order_by': [{'field': 'age', 'direction': 'asc'}],
+                  'limit': 12, 'offset': 3}
+        response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        ages = [p['age'] for p in loads(response.data)['objects']]
+        self.assertEqual(ages, [3, 4, 5, 6, 7])
+        response = self.app.get('/api/v2/person?page=3&q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        ages = [p['age'] for p in loads(response.data)['objects']]
+        self.assertEqual(ages, [13, 14])
+        response = self.app.get('/api/v2/person?page=4&q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['objects'], [])
+
+    def test_stream_results(self):
+        """Tests that unpaginated search results are streamed in batches when
+        streaming is enabled.
+
+        """
+        def postprocess(objects):
+            for obj in objects:
+                obj['postprocessed'] = True
+
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=0, stream_results=True,
+                                get_result_postprocessor=postprocess,
+                                count_strategy='query')
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                results_per_page=0, stream_results=True)
+        response = self.app.get('/api/v2/person')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(page=1, objects=[],
+                                                    num_results=0,
+                                                    total_pages=1))
+        for i in range(250):
+            self.session.add(self.Person(name=unicode('person%s' % i), age=i,
+                                         birth_date=date(1990, 1, 1)))
+        self.session.commit()
+        response = self.app.get('/api/v2/person')
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 250)
+        self.assertEqual(data['total_pages'], 1)
+        self.assertEqual([p['age'] for p in data['objects']], range(250))
+        self.assertTrue(all(p['postprocessed'] for p in data['objects']))
+        self.assertEqual(data['objects'][0]['birth_date'], '1990-01-01')
+        search = {'filters': [{'name': 'age', 'op': 'lt', 'val': 150}],
+                  'limit': 120, 'offset': 10}
+        response = self.app.get('/api/v3/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertNotIn('num_results', data)
+        self.assertEqual([p['age'] for p in data['objects']], range(10, 130))
+        # streamed responses are always JSON
+        response = self.app.get('/api/v3/person',
+                                headers={'Accept': 'application/msgpack'})
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertIn('Accept', response.headers['Vary'])
+        self.assertEqual(len(loads(response.data)['objects']), 250)
+
+    def test_stream_results_postprocessor_removes(self):
+        """Tests that streamed search results are valid and correctly counted
+        when the result postprocessor removes objects from some batches.
+
+        """
+        def postprocess(objects):
+            objects[:] = [obj for obj in objects if 100 <= obj['age'] < 200]
+
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=0, stream_results=True,
+                                get_result_postprocessor=postprocess,
+                                count_strategy='query')
+        # the first and last batches are emptied by the postprocessor
+        for i in range(250):
+            self.session.add(self.Person(name=unicode('person%s' % i), age=i))
+        self.session.commit()
+        response = self.app.get('/api/v2/person')
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual([p['age'] for p in data['objects']], range(100, 200))
+        self.assertEqual(data['num_results'], 100)
+
+    def test_search_plan_cache(self):
+        """Tests that searches of the same shape with different values return
+        the correct results when the search plan cache is enabled.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                search_plan_cache_size=8)
+        for i in range(5):
+            self.session.add(self.Person(name=unicode('person%s' % i), age=i))
+        self.session.commit()
+        for val in 1, 3, 0:
+            search = {'filters': [{'name': 'age', 'op': 'gt', 'val': val}],
+                      'order_by': [{'field': 'age'}]}
+            response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+            self.assertEqual(response.status_code, 200)
+            data = loads(response.data)
+            self.assertEqual([p['age'] for p in data['objects']],
+                             range(val + 1, 5))
+        # dates given as strings are compared as in uncached searches
+        person = self.Person(name=u'foo', birth_date=date(1900, 1, 2))
+        self.session.add(person)
+        self.session.commit()
+        for i in range(2):
+            search = {'filters': [{'name': 'birth_date', 'op': 'eq',
+                                   'val': '1900-01-02'}]}
+            response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+            self.assertEqual(response.status_code, 200)
+            data = loads(response.data)
+            self.assertEqual([p['name'] for p in data['objects']], [u'foo'])
+
+    def test_normalize_filters(self):
+        """Tests that a search whose filters contradict each other returns an
+        empty result when filter normalization is enabled.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                normalize_filters=True, count_strategy='query')
+        self.session.add(self.Person(name=u'foo', age=5))
+        self.session.commit()
+        search = {'filters': [{'name': 'age', 'op': 'ge', 'val': 5},
+                              {'name': 'age', 'op': 'lt', 'val': 5}]}
+        response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data), dict(page=1, objects=[],
+                                                    num_results=0,
+                                                    total_pages=0))
+        search['filters'][1]['op'] = 'le'
+        response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual([p['name'] for p in data['objects']], [u'foo'])
+
+    def test_sparse_fields(self):
+        """Tests that the ``fields`` query parameter restricts the fields in
+        the response, and that the other columns are not selected from the
+        database.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                include_columns=['id', 'name', 'age',
+                                                 'computers'])
+        person = self.Person(name=u'foo', age=5, other=7)
+        person.computers = [self.Computer(name=u'c1', vendor=u'bar')]
+        self.session.add(person)
+        self.session.commit()
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+
+        event.listen(self.Base.metadata.bind, 'before_cursor_execute', record)
+        response = self.app.get('/api/v2/person?fields=name,other')
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['objects'], [dict(name=u'foo')])
+        self.assertNotIn('person.age', statements[0])
+        self.assertNotIn('person.other', statements[0])
+        response = self.app.get('/api/v2/person/%s?fields=age' % person.id)
+        self.assertEqual(loads(response.data), dict(age=5))
+        search = {'order_by': [{'field': 'age'}]}
+        response = self.app.get('/api/v2/person?fields=name,computers&q=%s'
+                                % dumps(search))
+        data = loads(response.data)
+        self.assertEqual(data['objects'][0]['name'], u'foo')
+        self.assertEqual(data['objects'][0]['computers'][0]['name'], u'c1')
+        self.assertNotIn('age', data['objects'][0])
+        # without the parameter, all of the included columns are returned
+        response = self.app.get('/api/v2/person/%s' % person.id)
+        self.assertEqual(sorted(loads(response.data)),
+                         ['age', 'computers', 'id', 'name'])
+
+    def test_sparse_fields_many_to_many(self):
+        """Tests that the ``fields`` query parameter may be used on a model
+        with a many-to-many relation.
+
+        """
+        program_tags = Table('program_tags', self.Base.metadata,
+                             Column('program_id', Integer,
+                                    ForeignKey('program.id')),
+                             Column('tag_id', Integer, ForeignKey('tag.id')))
+
+        class Tag(self.Base):
+            __tablename__ = 'tag'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+
+        class Program(self.Base):
+            __tablename__ = 'program'
+            id = Column(Integer, primary_key=True)
+            name = Column(Unicode)
+            version = Column(Unicode)
+            tags = relationship(Tag, secondary=program_tags)
+
+        self.Base.metadata.create_all()
+        self.manager.create_api(Program, url_prefix='/api/v2')
+        program = Program(name=u'foo', version=u'1.0')
+        program.tags = [Tag(name=u'bar')]
+        self.session.add(program)
+        self.session.commit()
+        response = self.app.get('/api/v2/program/%s?fields=name,tags'
+                                % program.id)
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['name'], u'foo')
+        self.assertEqual(data['tags'][0]['name'], u'bar')
+        self.assertNotIn('version', data)
+        response = self.app.get('/api/v2/program?fields=name,tags')
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['objects'][0]['tags'][0]['name'], u'bar')
+
+    def test_relation_loading(self):
+        """Tests that the relations of the instances in a response are loaded
+        with a constant number of queries, according to the strategy for each
+        relation.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                count_strategy='query')
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                relation_loading={'computers': 'joined'},
+                                count_strategy='window')
+        self.manager.create_api(self.Person, url_prefix='/api/v4',
+                                relation_loading={'computers': 'select'},
+                                count_strategy='query')
+        for i in range(5):
+            person = self.Person(name=unicode('person%s' % i), age=i)
+            person.computers = [self.Computer(name=unicode('c%s%s' % (i, j)))
+                                for j in range(2)]
+            self.session.add(person)
+        self.session.commit()
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            statements.append(statement)
+
+        event.listen(self.Base.metadata.bind, 'before_cursor_execute', record)
+        for prefix, expected in ('/api/v2', 2), ('/api/v3', 1), ('/api/v4', 6):
+            del statements[:]
+            response = self.app.get(prefix + '/person')
+            self.assertEqual(response.status_code, 200)
+            data = loads(response.data)
+            self.assertEqual(len(statements), expected)
+            self.assertEqual(len(data['objects']), 5)
+            self.assertEqual(data['num_results'], 5)
+            for person in data['objects']:
+                self.assertEqual(len(person['computers']), 2)
+        # pages whose relations are loaded by subquery are ordered uniquely,
+        # so that the subquery selects the same page
+        search = {'filters': [{'name': 'age', 'op': 'ge', 'val': 0}]}
+        del statements[:]
+        response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+        self.assertIn('ORDER BY person.id', statements[0])
+        for person in loads(response.data)['objects']:
+            self.assertEqual([c['name'] for c in person['computers']],
+                             ['c%d0' % person['age'], 'c%d1' % person['age']])
+        del statements[:]
+        response = self.app.get('/api/v2/person/1')
+        self.assertEqual(len(loads(response.data)['computers']), 2)
+        self.assertEqual(len(statements), 2)
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, relation_loading={'computers': 'bogus'})
+
+    def test_include_relations(self):
+        """Tests that the ``include`` query parameter and the `shallow`
+        argument determine which relations are included in responses.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                shallow=True)
+        person = self.Person(name=u'foo')
+        person.computers = [self.Computer(name=u'c1')]
+        self.session.add(person)
+        self.session.commit()
+        response = self.app.get('/api/person')
+        self.assertIn('computers', loads(response.data)['objects'][0])
+        response = self.app.get('/api/person?include=')
+        self.assertNotIn('computers', loads(response.data)['objects'][0])
+        response = self.app.get('/api/v2/person')
+        self.assertNotIn('computers', loads(response.data)['objects'][0])
+        response = self.app.get('/api/v2/person?include=computers,bogus')
+        computers = loads(response.data)['objects'][0]['computers']
+        self.assertEqual([c['name'] for c in computers], [u'c1'])
+        response = self.app.get('/api/v2/person/%s' % person.id)
+        self.assertNotIn('computers', loads(response.data))
+        response = self.app.get('/api/v2/person/%s?include=computers'
+                                % person.id)
+        self.assertIn('computers', loads(response.data))
+
+    def test_related_collection_default(self):
+        """Tests that the endpoint of a one-to-many relation responds with all
+        of the related instances, including their foreign keys, unless
+        pagination of related collections is enabled.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=2)
+        person = self.Person(name=u'foo')
+        person.computers = [self.Computer(name=unicode('c%s' % i))
+                            for i in range(5)]
+        other = self.Person(name=u'bar')
+        other.computers = [self.Computer(name=u'other')]
+        self.session.add_all([person, other])
+        self.session.commit()
+        url = '/api/v2/person/%s/computers/' % person.id
+        search = dict(filters=[dict(name='name', op='eq', val='c1')])
+        response = self.app.get(url, query_string=dict(q=dumps(search)))
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(sorted(data), ['objects'])
+        self.assertEqual(sorted(c['name'] for c in data['objects']),
+                         [u'c0', u'c1', u'c2', u'c3', u'c4'])
+        self.assertTrue(all(c['owner_id'] == person.id
+                            for c in data['objects']))
+        response = self.app.get('/api/v2/person/0/computers/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_related_collection(self):
+        """Tests that the endpoint of a one-to-many relation supports
+        searching, sorting, and paginating the related instances when
+        pagination of related collections is enabled.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=2, count_strategy='query',
+                                paginate_related_collections=True)
+        person = self.Person(name=u'foo')
+        person.computers = [self.Computer(name=unicode('c%s' % i),
+                                          vendor=u'Dell' if i % 2 else u'HP')
+                            for i in range(5)]
+        other = self.Person(name=u'bar')
+        other.computers = [self.Computer(name=u'other', vendor=u'Dell')]
+        self.session.add_all([person, other])
+        self.session.commit()
+        url = '/api/v2/person/%s/computers/' % person.id
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 5)
+        self.assertEqual(data['total_pages'], 3)
+        self.assertEqual(len(data['objects']), 2)
+        self.assertNotIn('owner_id', data['objects'][0])
+        search = dict(filters=[dict(name='vendor', op='eq', val='Dell')],
+                      order_by=[dict(field='name', direction='desc')])
+        response = self.app.get(url, query_string=dict(q=dumps(search)))
+        data = loads(response.data)
+        self.assertEqual(data['num_results'], 2)
+        self.assertEqual([c['name'] for c in data['objects']], [u'c3', u'c1'])
+        search = dict(filters=[dict(name='name', op='eq', val='other')],
+                      single=True)
+        response = self.app.get(url, query_string=dict(q=dumps(search)))
+        self.assertEqual(loads(response.data)['message'], 'No result found')
+        response = self.app.get(url, query_string=dict(q='{'))
+        self.assertEqual(response.status_code, 400)
+        response = self.app.get('/api/v2/person/0/computers/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_response_cache(self):
+        """Tests that responses are cached when the response cache is enabled,
+        and that the cached responses are invalidated by writes to the model or
+        to its related models.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                methods=['GET', 'POST'], response_cache=True)
+        self.manager.create_api(self.Computer, url_prefix='/api/v2',
+                                methods=['POST'])
+        person = self.Person(name=u'foo')
+        self.session.add(person)
+        self.session.commit()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.Base.metadata.bind, 'before_cursor_execute', record)
+        search = '{"filters": [], "order_by": [{"field": "name"}]}'
+        response = self.app.get('/api/v2/person?q=%s' % search)
+        self.assertEqual(len(loads(response.data)['objects']), 1)
+        del statements[:]
+        # the same search with differently ordered keys is also cached
+        search = '{"order_by": [{"field": "name"}], "filters": []}'
+        response = self.app.get('/api/v2/person?q=%s' % search)
+        self.assertEqual(len(loads(response.data)['objects']), 1)
+        self.assertEqual(statements, [])
+        # writes which bypass the API are not noticed
+        self.session.add(self.Person(name=u'bar'))
+        self.session.commit()
+        response = self.app.get('/api/v2/person?q=%s' % search)
+        self.assertEqual(len(loads(response.data)['objects']), 1)
+        response = self.app.post('/api/v2/person',
+                                 data=dumps(dict(name=u'baz')))
+        self.assertEqual(response.status_code, 201)
+        response = self.app.get('/api/v2/person?q=%s' % search)
+        self.assertEqual(len(loads(response.data)['objects']), 3)
+        response = self.app.get('/api/v2/person/%s' % person.id)
+        self.assertEqual(loads(response.data)['computers'], [])
+        # writes to a related model invalidate the cached responses
+        computer = dict(name=u'c1', owner_id=person.id)
+        response = self.app.post('/api/v2/computer', data=dumps(computer))
+        self.assertEqual(response.status_code, 201)
+        response = self.app.get('/api/v2/person/%s' % person.id)
+        self.assertEqual(len(loads(response.data)['computers']), 1)
+
+    def test_response_cache_key(self):
+        """Tests that cached responses which are postprocessed are keyed on the
+        variant returned by the response cache key function.
+
+        """
+        def redact(objects):
+            if request.headers.get('X-User') != 'admin':
+                for obj in objects:
+                    obj.pop('age', None)
+
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, response_cache=True,
+                          get_result_postprocessor=redact)
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                response_cache=True,
+                                get_result_postprocessor=redact,
+                                response_cache_key=lambda:
+                                request.headers.get('X-User', ''))
+        self.session.add(self.Person(name=u'foo', age=20))
+        self.session.commit()
+        for user in 'admin', 'guest', 'admin':
+            response = self.app.get('/api/v2/person',
+                                    headers={'X-User': user})
+            person = loads(response.data)['objects'][0]
+            self.assertEqual('age' in person, user == 'admin')
+
+    def test_conditional_get(self):
+        """Tests that responses carry entity tags and that conditional
+        requests for unmodified representations receive
+        :http:statuscode:`304` responses.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                version_column='age',
+                                last_modified_column='birth_date',
+                                shallow=True)
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, url_prefix='/api/v3',
+                          version_column='computers')
+        person = self.Person(name=u'foo', age=1, birth_date=date(1999, 1, 1))
+        self.session.add(person)
+        self.session.commit()
+        url = '/api/person/%s' % person.id
+        response = self.app.get(url)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.lower().startswith('w/'))
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, '')
+        response = self.app.get('/api/person', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        person.name = u'bar'
+        self.session.commit()
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(loads(response.data)['name'], u'bar')
+        # with a version column, only that column is read for the check
+        url = '/api/v2/person/%s' % person.id
+        response = self.app.get(url)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Last-Modified'],
+                         'Fri, 01 Jan 1999 00:00:00 GMT')
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        # end the transaction of the previous requests, whose connection would
+        # not notify the listener
+        self.session.commit()
+        event.listen(self.Base.metadata.bind, 'before_cursor_execute', record)
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('person.name', statements[0])
+        headers = {'If-Modified-Since': 'Sat, 02 Jan 1999 00:00:00 GMT'}
+        response = self.app.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        response = self.app.get(url + '?fields=name',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        person.age = 2
+        self.session.commit()
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        response = self.app.get('/api/v2/person/0',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 404)
+        # representations with relations change with the related instances
+        response = self.app.get(url + '?include=computers')
+        etag = response.headers['ETag']
+        self.assertNotIn('Last-Modified', response.headers)
+        person.computers.append(self.Computer(name=u'c1'))
+        self.session.commit()
+        response = self.app.get(url + '?include=computers',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(loads(response.data)['computers']), 1)
+
+    def test_conditional_get_variants(self):
+        """Tests that the entity tags computed from the version column differ
+        between representations in different formats and content codings.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                version_column='age', shallow=True,
+                                compress_min_size=0)
+        person = self.Person(name=u'foo', age=1)
+        self.session.add(person)
+        self.session.commit()
+        url = '/api/v2/person/%s' % person.id
+        response = self.app.get(url)
+        etag = response.headers['ETag']
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response.headers['Vary'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        headers = {'If-None-Match': etag, 'Accept-Encoding': 'gzip'}
+        response = self.app.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotEqual(response.headers['ETag'], etag)
+        if msgpack is not None:
+            headers = {'If-None-Match': etag, 'Accept': 'application/msgpack'}
+            response = self.app.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/msgpack')
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_read_mode(self):
+        """Tests that searches which read rows instead of instances return the
+        same responses.
+
+        """
+        core = dict(read_mode='core')
+        for prefix, kw in ('/api/v2', {}), ('/api/v3', core):
+            self.manager.create_api(self.Person, url_prefix=prefix,
+                                    shallow=True, **kw)
+            self.manager.create_api(self.Person, url_prefix=prefix + 'w',
+                                    shallow=True, count_strategy='window',
+                                    **kw)
+            self.manager.create_api(self.Person, url_prefix=prefix + 'k',
+                                    shallow=True, keyset_pagination=True,
+                                    **kw)
+            self.manager.create_api(self.Person, url_prefix=prefix + 's',
+                                    shallow=True, results_per_page=None,
+                                    stream_results=True, **kw)
+        self.assertRaises(IllegalArgumentError, self.manager.create_api,
+                          self.Person, url_prefix='/api/v4', read_mode='bogus')
+        for i in range(15):
+            person = self.Person(name=unicode('person%s' % i), age=i % 4,
+                                 birth_date=date(1990 + i, 1, 1))
+            self.session.add(person)
+        self.session.commit()
+        search = dict(filters=[dict(name='age', op='lt', val=3)],
+                      order_by=[dict(field='age', direction='desc')])
+        single = dict(filters=[dict(name='name', op='eq', val='person3')],
+                      single=True)
+        urls = ['/person', '/person?fields=name,birth_date',
+                '/person?page=2&q=%s' % dumps(search),
+                '/person?q=%s' % dumps(single)]
+        for suffix in '', 'w', 'k', 's':
+            for url in urls:
+                expected = self.app.get('/api/v2' + suffix + url)
+                response = self.app.get('/api/v3' + suffix + url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(loads(response.data), loads(expected.data))
+        # follow the cursor of keyset pagination
+        url = '/person?q=%s' % dumps(search)
+        cursor = loads(self.app.get('/api/v3k' + url).data)['next_cursor']
+        url += '&cursor=' + cursor
+        expected = self.app.get('/api/v2k' + url)
+        response = self.app.get('/api/v3k' + url)
+        self.assertEqual(loads(response.data), loads(expected.data))
+        self.assertEqual(len(loads(response.data)['objects']), 2)
+        # responses including relations read instances
+        response = self.app.get('/api/v3/person?include=computers')
+        self.assertIn('computers', loads(response.data)['objects'][0])
+
+    def test_encoder(self):
+        """Tests that the bodies of responses are encoded exactly once by the
+        specified encoder.
+
+        """
+        encoded = []
+
+        class Encoder(JSONEncoder):
+            def encode(self, obj):
+                encoded.append(obj)
+                return super(Encoder, self).encode(obj)
+
+        def postprocessor(data):
+            data['extra'] = date(2012, 1, 1)
+
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                methods=['GET', 'PATCH'], encoder=Encoder(),
+                                patch_form_postprocessor=postprocessor,
+                                allow_functions=True)
+        person = self.Person(name=u'foo', birth_date=date(1990, 1, 2))
+        self.session.add(person)
+        self.session.commit()
+        response = self.app.get('/api/v2/person/%s' % person.id)
+        self.assertEqual(len(encoded), 1)
+        self.assertEqual(response.data, Encoder().encode(encoded[0]))
+        self.assertEqual(loads(response.data)['birth_date'], '1990-01-02')
+        del encoded[:]
+        response = self.app.patch('/api/v2/person/%s' % person.id,
+                                  data=dumps(dict(name=u'bar')))
+        self.assertEqual(len(encoded), 1)
+        data = loads(response.data)
+        self.assertEqual(data['name'], u'bar')
+        self.assertEqual(data['extra'], '2012-01-01')
+        # the results of evaluating functions are encoded by the same encoder
+        del encoded[:]
+        functions = [{'name': 'count', 'field': 'id'}]
+        response = self.app.get('/api/v2/eval/person',
+                                data=dumps(dict(functions=functions)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(encoded, [dict(count__id=1)])
+
+    def test_export(self):
+        """Tests that the export endpoint streams the instances matching a
+        search as newline-delimited JSON, and resumes after a checkpoint.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                allow_export=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                allow_export=True, read_mode='core')
+        self.manager.create_api(self.Person, url_prefix='/api/v4',
+                                allow_export=True, normalize_filters=True)
+
+        def restrict(instid, relation, request):
+            search = dict(filters=[dict(name='age', op='eq', val=1)])
+            return instid, relation, search
+
+        self.manager.create_api(self.Person, url_prefix='/api/v5',
+                                allow_export=True,
+                                get_request_preprocessor=restrict)
+        response = self.app.get('/api/person/export')
+        self.assertEqual(response.status_code, 404)
+        for i in range(15):
+            person = self.Person(name=unicode('person%s' % i), age=i % 4)
+            self.session.add(person)
+        self.session.commit()
+        for prefix in '/api/v2', '/api/v3':
+            response = self.app.get(prefix + '/person/export')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            lines = response.data.splitlines()
+            self.assertEqual(len(lines), 15)
+            people = [loads(line) for line in lines]
+            self.assertEqual([p['id'] for p in people], range(1, 16))
+            self.assertNotIn('computers', people[0])
+            # the ordering of the search is ignored
+            search = dict(filters=[dict(name='age', op='eq', val=1)],
+                          order_by=[dict(field='id', direction='desc')])
+            url = prefix + '/person/export?q=%s' % dumps(search)
+            people = [loads(line) for line in
+                      self.app.get(url).data.splitlines()]
+            self.assertEqual([p['id'] for p in people], [2, 6, 10, 14])
+            # resume after the second instance
+            response = self.app.get(url + '&after=6')
+            people = [loads(line) for line in response.data.splitlines()]
+            self.assertEqual([p['id'] for p in people], [10, 14])
+            response = self.app.get(prefix + '/person/export?fields=name')
+            self.assertEqual(loads(response.data.splitlines()[0]),
+                             dict(name=u'person0'))
+            response = self.app.get(prefix + '/person/export?after=bogus')
+            self.assertEqual(response.status_code, 400)
+            response = self.app.get(prefix + '/person/export?q=bogus')
+            self.assertEqual(response.status_code, 400)
+        # no instance can match a contradictory search
+        search = dict(filters=[dict(name='age', op='eq', val=1),
+                               dict(name='age', op='eq', val=2)])
+        response = self.app.get('/api/v4/person/export?q=%s' % dumps(search))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, '')
+        response = self.app.get('/api/v2/person/export?include=computers')
+        self.assertEqual(loads(response.data.splitlines()[0])['computers'],
+                         [])
+        # the search returned by the preprocessor replaces that of the client
+        search = dict(filters=[dict(name='age', op='eq', val=2)])
+        for url in '/api/v5/person/export', \
+                '/api/v5/person/export?q=%s' % dumps(search):
+            people = [loads(line) for line in
+                      self.app.get(url).data.splitlines()]
+            self.assertEqual([p['id'] for p in people], [2, 6, 10, 14])
+
+    def test_formats(self):
+        """Tests that search results and exports are written in tabular
+        formats when requested.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                allow_export=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                allow_export=True, read_mode='core')
+
+        def postprocessor(objects):
+            for person in objects:
+                person.pop('name', None)
+
+        self.manager.create_api(self.Person, url_prefix='/api/v4',
+                                allow_export=True,
+                                get_result_postprocessor=postprocessor)
+        for i in range(15):
+            person = self.Person(name=unicode('person%s' % i), age=i % 4,
+                                 birth_date=date(1990 + i, 1, 1))
+            self.session.add(person)
+        self.session.commit()
+        search = dict(filters=[dict(name='age', op='lt', val=3)],
+                      order_by=[dict(field='age', direction='desc')])
+        url = '/person?fields=id,birth_date&q=%s' % dumps(search)
+        for prefix in '/api/v2', '/api/v3':
+            response = self.app.get(prefix + url + '&format=csv')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'text/csv')
+            lines = response.data.splitlines()
+            # the rows of the first page, as in the JSON response
+            expected = loads(self.app.get(prefix + url).data)['objects']
+            self.assertEqual(lines[0], 'id,birth_date')
+            self.assertEqual(lines[1:], ['%(id)s,%(birth_date)s' % person
+                                         for person in expected])
+            response = self.app.get(prefix + url + '&page=2',
+                                    headers={'Accept': 'text/csv'})
+            self.assertEqual(len(response.data.splitlines()), 3)
+            response = self.app.get(prefix + '/person/export?fields=name',
+                                    headers={'Accept': 'text/csv'})
+            lines = response.data.splitlines()
+            self.assertEqual(len(lines), 16)
+            self.assertEqual(lines[:2], ['name', 'person0'])
+            response = self.app.get(prefix + '/person?format=bogus')
+            self.assertEqual(response.status_code, 406)
+            response = self.app.get(prefix + '/person/export?format=bogus')
+            self.assertEqual(response.status_code, 406)
+        for url in '/person', '/person/export':
+            for fmt in '', '&format=csv':
+                response = self.app.get('/api/v2' + url + '?fields=id' + fmt)
+                self.assertIn('Accept', response.headers['Vary'])
+            # tables are refused rather than skipping the postprocessor
+            response = self.app.get('/api/v4' + url + '?format=csv')
+            self.assertEqual(response.status_code, 406)
+            self.assertEqual(response.mimetype, 'application/json')
+            response = self.app.get('/api/v4' + url)
+            self.assertEqual(response.status_code, 200)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        """Tests that request bodies are decoded from MessagePack and response
+        bodies are encoded as MessagePack when the client requests it.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                allow_export=True)
+        mimetype = 'application/msgpack'
+        data = msgpack.packb(dict(name=u'L\xe9o', age=23), use_bin_type=True)
+        response = self.app.post('/api/person', data=data,
+                                 content_type=mimetype)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loads(response.data)['id'], 1)
+        accept = {'Accept': mimetype}
+        response = self.app.get('/api/person/1', headers=accept)
+        self.assertEqual(response.mimetype, mimetype)
+        self.assertIn('Accept', response.headers['Vary'])
+        person = msgpack.unpackb(response.data, raw=False)
+        self.assertEqual(person['name'], u'L\xe9o')
+        data = msgpack.packb(dict(age=24), use_bin_type=True)
+        response = self.app.patch('/api/person/1', data=data,
+                                  content_type=mimetype, headers=accept)
+        self.assertEqual(msgpack.unpackb(response.data, raw=False)['age'], 24)
+        response = self.app.get('/api/person', headers=accept)
+        objects = msgpack.unpackb(response.data, raw=False)['objects']
+        self.assertEqual(len(objects), 1)
+        self.app.post('/api/person', data=dumps(dict(name=u'Bo', age=3)))
+        response = self.app.get('/api/v2/person/export', headers=accept)
+        self.assertEqual(response.mimetype, mimetype)
+        self.assertIn('Accept', response.headers['Vary'])
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(response.data)
+        self.assertEqual([p['name'] for p in unpacker], [u'L\xe9o', u'Bo'])
+        # JSON is preferred when it has the same quality
+        accept = {'Accept': 'application/json, application/msgpack'}
+        response = self.app.get('/api/person/1', headers=accept)
+        self.assertEqual(response.mimetype, 'application/json')
+        response = self.app.post('/api/person', data='\xc1',
+                                 content_type=mimetype)
+        self.assertEqual(response.status_code, 400)
+
+    @skipIf(msgpack, 'msgpack is installed')
+    def test_msgpack_unavailable(self):
+        """Tests that clients requesting MessagePack receive JSON, and that
+        MessagePack request bodies are rejected, when msgpack is not
+        installed.
+
+        """
+        response = self.app.post('/api/person', data=dumps(dict(age=23)))
+        self.assertEqual(response.status_code, 201)
+        response = self.app.get('/api/person/1',
+                                headers={'Accept': 'application/msgpack'})
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(loads(response.data)['age'], 23)
+        response = self.app.post('/api/person', data='\x81\xa3age\x17',
+                                 content_type='application/msgpack')
+        self.assertEqual(response.status_code, 415)
+
+    def test_columns_layout(self):
+        """Tests that pages of results laid out in columns contain the same
+        values as pages of objects.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                read_mode='core', shallow=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                keyset_pagination=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v4',
+                                results_per_page=None, stream_results=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v5',
+                                normalize_filters=True)
+        self.manager.create_api(self.Person, url_prefix='/api/v6',
+                                get_result_postprocessor=lambda objects: None)
+        for i in range(15):
+            person = self.Person(name=unicode('person%s' % i), age=i % 4,
+                                 birth_date=date(1990 + i, 1, 1))
+            if i % 5 == 0:
+                person.computers = [self.Computer(name=u'c%s' % i)]
+            self.session.add(person)
+        self.session.commit()
+        search = dict(filters=[dict(name='age', op='lt', val=3)],
+                      order_by=[dict(field='age', direction='desc')])
+        urls = ['/person?page=2', '/person?fields=name,computers',
+                '/person?q=%s' % dumps(search)]
+        for prefix in '/api', '/api/v2', '/api/v3', '/api/v4':
+            for url in urls:
+                expected = loads(self.app.get(prefix + url).data)
+                response = self.app.get(prefix + url + '&layout=columns')
+                data = loads(response.data)
+                self.assertNotIn('objects', data)
+                objects = untable(data.pop('columns'), data.pop('rows'))
+                self.assertEqual(objects, expected.pop('objects'))
+                self.assertEqual(data, expected)
+        response = self.app.get('/api/person?layout=columns&fields=name')
+        data = loads(response.data)
+        self.assertEqual(data['columns'], ['name'])
+        self.assertEqual(data['rows'][0], ['person0'])
+        # no instance can match a contradictory search
+        search = dict(filters=[dict(name='age', op='eq', val=1),
+                               dict(name='age', op='eq', val=2)])
+        response = self.app.get('/api/v5/person?layout=columns&q=%s'
+                                % dumps(search))
+        data = loads(response.data)
+        self.assertEqual(data['rows'], [])
+        self.assertIn('name', data['columns'])
+        # objects are expected by the postprocessor
+        response = self.app.get('/api/v6/person?layout=columns')
+        self.assertIn('objects', loads(response.data))
+
+    def test_compression(self):
+        """Tests that responses are compressed when the client accepts it, and
+        that compressed bodies are stored in the response cache.
+
+        """
+        stored = []
+
+        class Backend(dict):
+            def set(self, key, value):
+                stored.append(value)
+                self[key] = value
+
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                methods=['GET', 'POST'], allow_export=True,
+                                compress_min_size=200,
+                                response_cache=Backend())
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                compress_min_size=200)
+        for i in range(20):
+            self.session.add(self.Person(name=unicode('person%s' % i)))
+        self.session.commit()
+        gzip = {'Accept-Encoding': 'gzip'}
+        expected = self.app.get('/api/v2/person').data
+        for prefix in '/api/v2', '/api/v3':
+            response = self.app.get(prefix + '/person', headers=gzip)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response.headers['Vary'])
+            data = zlib.decompress(response.data, 16 + zlib.MAX_WBITS)
+            self.assertEqual(data, expected)
+            # entity tags are computed from the compressed body
+            headers = dict(gzip, **{'If-None-Match': response.headers['ETag']})
+            response = self.app.get(prefix + '/person', headers=headers)
+            self.assertEqual(response.status_code, 304)
+            response = self.app.get(prefix + '/person',
+                                    headers={'Accept-Encoding': 'deflate'})
+            self.assertEqual(zlib.decompress(response.data), expected)
+        # the compressed body is read from the cache
+        del stored[:]
+        response = self.app.get('/api/v2/person', headers=gzip)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        data = zlib.decompress(response.data, 16 + zlib.MAX_WBITS)
+        self.assertEqual(data, expected)
+        self.assertEqual(stored, [])
+        # small bodies are not compressed
+        response = self.app.get('/api/v2/person/1?fields=id', headers=gzip)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(loads(response.data), dict(id=1))
+        response = self.app.post('/api/v2/person',
+                                 data=dumps(dict(name=u'foo')), headers=gzip)
+        self.assertNotIn('Content-Encoding', response.headers)
+        # streamed bodies are compressed by the blueprint
+        response = self.app.get('/api/v2/person/export', headers=gzip)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        data = zlib.decompress(response.data, 16 + zlib.MAX_WBITS)
+        self.assertEqual(len(data.splitlines()), 21)
+
+    def test_num_results(self):
+        """Tests that paginated responses include the total number of results
+        and pages, computed with each of the count strategies.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=5, count_strategy='window')
+        self.manager.create_api(self.Person, url_prefix='/api/v3',
+                                results_per_page=5)
+        self.manager.create_api(self.Person, url_prefix='/api/v4',
+                                results_per_page=5, count_strategy='query',
+                                count_cache_timeout=60)
+        self.manager.create_api(self.Person, url_prefix='/api/v5',
+                                results_per_page=5, count_strategy='query')
+        for i in range(12):
+            d = dict(name=unicode('person%s' % i), age=i)
+            response = self.app.post('/api/person', data=dumps(d))
+            self.assertEqual(response.status_code, 201)
+        search = {'filters': [{'name': 'age', 'op': 'ge', 'val': 1}]}
+        for prefix in '/api/v2', '/api/v4', '/api/v5':
+            for page, total_pages in (1, 3), (3, 3), (4, 3):
+                url = '%s/person?page=%s&q=%s' % (prefix, page, dumps(search))
+                response = self.app.get(url)
+                self.assertEqual(response.status_code, 200)
+                data = loads(response.data)
+                self.assertEqual(data['num_results'], 11)
+                self.assertEqual(data['total_pages'], total_pages)
+        search['limit'] = 7
+        response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+        self.assertEqual(loads(response.data)['num_results'], 7)
+        self.assertEqual(loads(response.data)['total_pages'], 2)
+        # results are not counted by default
+        response = self.app.get('/api/v3/person')
+        self.assertNotIn('num_results', loads(response.data))
+        self.assertNotIn('total_pages', loads(response.data))
+
+        # the cached count is returned for the same filters
+        self.session.add(self.Person(name=u'foo', age=20))
+        self.session.commit()
+        search = {'filters': [{'name': 'age', 'op': 'ge', 'val': 1}]}
+        response = self.app.get('/api/v4/person?q=%s' % dumps(search))
+        self.assertEqual(loads(response.data)['num_results'], 11)
+        response = self.app.get('/api/v5/person?q=%s' % dumps(search))
+        self.assertEqual(loads(response.data)['num_results'], 12)
+
+    def test_keyset_pagination(self):
+        """Tests for paging through search results using the cursor tokens
+        provided when keyset pagination is enabled.
+
+        """
+        self.manager.create_api(self.Person, url_prefix='/api/v2',
+                                results_per_page=4, keyset_pagination=True)
+        # some of the ordering values are null
+        for i in range(10):
+            d = dict(name=unicode('person%s' % i), age=i % 3 or None,
+                     birth_date=date(1990, 1, 10 - i).isoformat())
+            response = self.app.post('/api/person', data=dumps(d))
+            self.assertEqual(response.status_code, 201)
+        for search in ({'order_by': [{'field': 'age', 'direction': 'desc'}]},
+                       {'order_by': [{'field': 'age'}]},
+                       {'order_by': [{'field': 'birth_date'}]}):
+            expected = self.app.get('/api/person?q=%s' % dumps(search))
+            expected = [p['id'] for p in loads(expected.data)['objects']]
+            url = '/api/v2/person?q=%s' % dumps(search)
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = loads(response.data)
+            self.assertNotIn('page', data)
+            ids = [p['id'] for p in data['objects']]
+            while data['next_cursor'] is not None:
+                response = self.app.get(url + '&cursor=' + data['next_cursor'])
+                self.assertEqual(response.status_code, 200)
+                data = loads(response.data)
+                self.assertTrue(len(data['objects']) <= 4)
+                ids.extend(p['id'] for p in data['objects'])
+            self.assertEqual(ids, expected)
+        response = self.app.get('/api/v2/person?cursor=bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.data)['message'],
+                         'Unable to decode cursor')
+        # forged cursors may contain values which cannot be compared
+        bydate = {'order_by': [{'field': 'birth_date'}]}
+        for search, values in (({}, [{'a': 1}]), ({}, [[1, 2]]),
+                               (bydate, [5, 1]), (bydate, [[1], 1])):
+            cursor = base64.urlsafe_b64encode(dumps(values))
+            response = self.app.get('/api/v2/person?q=%s&cursor=%s'
+                                    % (dumps(search), cursor))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(loads(response.data)['message'],
+                             'Unable to decode cursor')
+        # limits and offsets cannot be combined with cursors
+        for search in {'limit': 2}, {'offset': 2}:
+            response = self.app.get('/api/v2/person?q=%s' % dumps(search))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(loads(response.data)['message'],
+                             'Unable to use limit or offset with cursors')
+
     def test_alternate_primary_key(self):
         """Tests that models with primary keys which are not ``id`` columns are
         accessible via their primary keys.